@@ -0,0 +1,139 @@
+from array import array
+
+from classes import ASTNode, node_fields
+
+# Kinds for values that are not nodes but hold nodes
+LIST_KIND = "list"
+DICT_KIND = "dict"
+
+
+# Flat, pointer-free copy of an AST. Each node is a row: its kind id and a
+# slice of the refs column, one ref per field. A ref >= 0 is the index of
+# another row, a ref < 0 is -(i + 1) for entry i of the literal pool.
+# Lists and dicts of nodes get rows of their own (LIST_KIND, DICT_KIND; dict
+# rows alternate key and value refs). Rows are stored in preorder, so a
+# parent always comes before its children.
+class NodeArena:
+    def __init__(self):
+        self.kind_names = [LIST_KIND, DICT_KIND]
+        self.kind_classes = [list, dict]
+        self._kind_ids = {list: 0, dict: 1}
+        self.kinds = array("i")
+        self.ref_start = array("i")
+        self.ref_count = array("i")
+        self.refs = array("i")
+        # source position of each row, -1 where unknown
+        self.lines = array("i")
+        self.cols = array("i")
+        self.literals = []
+        self._literal_ids = {}
+        self.root = -1
+
+    @classmethod
+    def from_ast(cls, node):
+        arena = cls()
+        arena.root = arena._add(node)
+        return arena
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, index):
+        return self.kind_names[self.kinds[index]]
+
+    def field_names(self, index):
+        klass = self.kind_classes[self.kinds[index]]
+        if klass is list or klass is dict:
+            return ()
+        return node_fields(klass)
+
+    def refs_of(self, index):
+        start = self.ref_start[index]
+        return self.refs[start:start + self.ref_count[index]]
+
+    def field(self, index, name):
+        return self.refs[self.ref_start[index] + self.field_names(index).index(name)]
+
+    def literal(self, ref):
+        return self.literals[-ref - 1]
+
+    # Row indices directly below index, in field order
+    def children(self, index):
+        return [ref for ref in self.refs_of(index) if ref >= 0]
+
+    # Row indices of every node of the given kind
+    def find(self, kind_name):
+        try:
+            kind = self.kind_names.index(kind_name)
+        except ValueError:
+            return []
+        return [i for i, k in enumerate(self.kinds) if k == kind]
+
+    def to_ast(self, index=None):
+        return self._build(self.root if index is None else index)
+
+    def nbytes(self):
+        arrays = (self.kinds, self.ref_start, self.ref_count, self.refs, self.lines, self.cols)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def __repr__(self):
+        return f"NodeArena({len(self.kinds)} nodes, {len(self.literals)} literals)"
+
+    def _kind_id(self, klass):
+        kind = self._kind_ids.get(klass)
+        if kind is None:
+            kind = len(self.kind_names)
+            self._kind_ids[klass] = kind
+            self.kind_names.append(klass.__name__)
+            self.kind_classes.append(klass)
+        return kind
+
+    def _ref(self, value):
+        if isinstance(value, (ASTNode, list, dict)):
+            return self._add(value)
+        try:
+            key = (type(value), value)
+            literal = self._literal_ids.get(key)
+        except TypeError:
+            key = literal = None
+        if literal is None:
+            literal = len(self.literals)
+            self.literals.append(value)
+            if key is not None:
+                self._literal_ids[key] = literal
+        return -literal - 1
+
+    def _add(self, value):
+        index = len(self.kinds)
+        self.kinds.append(self._kind_id(type(value)))
+        self.ref_start.append(0)
+        self.ref_count.append(0)
+        self.lines.append(getattr(value, "line", -1))
+        self.cols.append(getattr(value, "col", -1))
+        if isinstance(value, list):
+            items = value
+        elif isinstance(value, dict):
+            items = [part for pair in value.items() for part in pair]
+        else:
+            items = [getattr(value, name, None) for name in node_fields(type(value))]
+        # children are added first, so this row's refs go in afterwards
+        refs = [self._ref(item) for item in items]
+        self.ref_start[index] = len(self.refs)
+        self.ref_count[index] = len(refs)
+        self.refs.extend(refs)
+        return index
+
+    def _build(self, index):
+        klass = self.kind_classes[self.kinds[index]]
+        values = [self._build(ref) if ref >= 0 else self.literals[-ref - 1] for ref in self.refs_of(index)]
+        if klass is list:
+            return values
+        if klass is dict:
+            return dict(zip(values[::2], values[1::2]))
+        node = klass.__new__(klass)
+        for name, value in zip(node_fields(klass), values):
+            setattr(node, name, value)
+        if self.lines[index] >= 0:
+            node.line = self.lines[index]
+            node.col = self.cols[index]
+        return node
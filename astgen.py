@@ -0,0 +1,370 @@
+import ast
+
+from classes import *
+from interpreter import PYTHON_OPERATORS
+
+# Operator nodes carry no position, so one instance of each is shared
+BIN_OPS = {
+    "+": ast.Add(), "-": ast.Sub(), "*": ast.Mult(), "/": ast.Div(), "//": ast.FloorDiv(),
+    "%": ast.Mod(), "**": ast.Pow(), "&": ast.BitAnd(), "|": ast.BitOr(), "^": ast.BitXor(),
+    "<<": ast.LShift(), ">>": ast.RShift(),
+}
+COMPARE_OPS = {
+    "==": ast.Eq(), "!=": ast.NotEq(), "<": ast.Lt(), ">": ast.Gt(), "<=": ast.LtE(), ">=": ast.GtE(),
+}
+BOOL_OPS = {"and": ast.And(), "or": ast.Or()}
+UNARY_OPS = {"-": (ast.USub(),), "+": (ast.UAdd(),), "--": (ast.USub(), ast.USub()), "++": (ast.UAdd(), ast.UAdd())}
+LOAD = ast.Load()
+STORE = ast.Store()
+NO_POSITION = {"lineno": 1, "col_offset": 0, "end_lineno": 1, "end_col_offset": 0}
+
+
+# Lowers Origin AST nodes straight to Python ast nodes, so the program can be
+# compiled without Python re-parsing generated source. Every Python node gets
+# the line/col of the Origin node it came from (or of its nearest positioned
+# parent), so tracebacks and profilers point at the Origin file. Produces the
+# same program as Interpreter.generate.
+class ASTGenerator:
+    def __init__(self):
+        self.global_classes = set()
+        self.parallel_count = 0
+        self.task_count = 0
+        self.pipeline_count = 0
+        self.vector_count = 0
+        # statements that must run before the one being lowered, such as
+        # the body function of a parallel for
+        self.before = []
+
+    def module(self, program):
+        return ast.Module(body=self.generate(program), type_ignores=[])
+
+    def compile(self, program, filename="<origin>"):
+        from compiler import TOP_LEVEL_AWAIT
+        return compile(self.module(program), filename, "exec", flags=TOP_LEVEL_AWAIT)
+
+    # Returns a list of statements for statement nodes, an expression
+    # otherwise. pos is the position to use when node has none of its own.
+    def generate(self, node, pos=NO_POSITION):
+        line = getattr(node, "line", None)
+        if line is not None:
+            pos = {"lineno": line, "col_offset": node.col, "end_lineno": line, "end_col_offset": node.col}
+        if isinstance(node, ProgramNode) or isinstance(node, BlockNode):
+            return [stmt for child in node.statements for stmt in self.statement(child, pos)]
+        return self.lower(node, pos)
+
+    def statement(self, node, pos):
+        outer, self.before = self.before, []
+        result = self.generate(node, pos)
+        if not isinstance(result, list):
+            result = [ast.Expr(result, **self.position(node, pos))]
+        before, self.before = self.before, outer
+        return before + result if before else result
+
+    def body(self, block, pos):
+        return self.generate(block, pos) or [ast.Pass(**pos)]
+
+    def lower(self, node, pos):
+        gen = self.generate
+        if isinstance(node, FuncNode):
+            args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=p, **pos) for p in node.params],
+                                 kwonlyargs=[], kw_defaults=[], defaults=[])
+            define = ast.AsyncFunctionDef if isinstance(node, AsyncFuncNode) else ast.FunctionDef
+            return [define(name=node.name, args=args, body=self.body(node.body, pos), decorator_list=[],
+                           returns=None, **pos)]
+
+        elif isinstance(node, AsyncBlockNode):
+            no_args = ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[])
+            statements = []
+            targets = []
+            calls = []
+            for stmt in node.statements:
+                name = f"_origin_task{self.task_count}"
+                self.task_count += 1
+                stmt_pos = self.position(stmt, pos)
+                if isinstance(stmt, AssignNode):
+                    body = self.statement(ReturnNode(stmt.value), stmt_pos)
+                    targets.append(stmt.name)
+                else:
+                    body = self.statement(stmt, stmt_pos)
+                    targets.append("_origin_tmp")
+                statements.append(ast.AsyncFunctionDef(name=name, args=no_args, body=body, decorator_list=[],
+                                                       returns=None, **stmt_pos))
+                calls.append(self.call(name, [], stmt_pos))
+            statements.append(ast.ImportFrom(module="runtime", level=0, **pos, names=[
+                ast.alias(name="run_concurrently", asname="_origin_concurrently", **pos)]))
+            wait = ast.Await(value=self.call("_origin_concurrently", calls, pos), **pos)
+            if all(target == "_origin_tmp" for target in targets):
+                statements.append(ast.Expr(wait, **pos))
+            else:
+                names = [ast.Name(id=target, ctx=STORE, **pos) for target in targets]
+                statements.append(ast.Assign(targets=[ast.Tuple(elts=names, ctx=STORE, **pos)], value=wait, **pos))
+            return statements
+
+        elif isinstance(node, AwaitNode):
+            return ast.Await(value=gen(node.value, pos), **pos)
+
+        elif isinstance(node, PipelineNode):
+            value = gen(node.source, pos)
+            fused = []
+            for stage in node.stages:
+                if isinstance(stage, StageNode):
+                    fused.append(stage)
+                    if stage.kind == "take":
+                        value = self.fuse(value, fused, pos)
+                        fused = []
+                    continue
+                if fused:
+                    value = self.fuse(value, fused, pos)
+                    fused = []
+                if isinstance(stage, CallNode):
+                    args = [value] + [gen(arg, pos) for arg in stage.arg]
+                    value = ast.Call(func=gen(stage.func_name, pos), args=args, keywords=[], **pos)
+                else:
+                    value = ast.Call(func=gen(stage, pos), args=[value], keywords=[], **pos)
+            if fused:
+                value = self.fuse(value, fused, pos)
+            return value
+
+        elif isinstance(node, CallNode):
+            args = [gen(a, pos) for a in node.arg] if node.arg else []
+            return ast.Call(func=gen(node.func_name, pos), args=args, keywords=[], **pos)
+
+        elif isinstance(node, AssignNode):
+            return [ast.Assign(targets=[ast.Name(id=node.name, ctx=STORE, **pos)], value=gen(node.value, pos), **pos)]
+
+        elif isinstance(node, CompoundAssignNode):
+            return [ast.AugAssign(target=ast.Name(id=node.name, ctx=STORE, **pos), op=BIN_OPS[node.op[:-1]],
+                                  value=gen(node.value, pos), **pos)]
+
+        elif isinstance(node, IndexAssignNode):
+            target = ast.Subscript(value=gen(node.collection, pos), slice=gen(node.index, pos), ctx=STORE, **pos)
+            return [ast.Assign(targets=[target], value=gen(node.value, pos), **pos)]
+
+        elif isinstance(node, AttrAssignNode):
+            target = ast.Attribute(value=gen(node.target, pos), attr=node.name, ctx=STORE, **pos)
+            return [ast.Assign(targets=[target], value=gen(node.value, pos), **pos)]
+
+        elif isinstance(node, PrintNode):
+            return [ast.Expr(self.call("print", [gen(node.expr, pos)], pos), **pos)]
+
+        elif isinstance(node, NumberNode) or isinstance(node, StringNode) or isinstance(node, BoolNode):
+            return ast.Constant(value=node.value, **pos)
+
+        elif isinstance(node, VarNode):
+            return ast.Name(id=node.name, ctx=LOAD, **pos)
+
+        elif isinstance(node, StructNode):
+            self.global_classes.add(node.name)
+            base = "Columns" if node.columns else "Struct"
+            slots = ast.Tuple(elts=[ast.Constant(value=f, **pos) for f in node.fields], ctx=LOAD, **pos)
+            body = [ast.Assign(targets=[ast.Name(id="__slots__", ctx=STORE, **pos)], value=slots, **pos)]
+            if not node.columns:
+                args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=p, **pos) for p in ["self"] + node.fields],
+                                     kwonlyargs=[], kw_defaults=[], defaults=[])
+                assigns = [ast.Assign(targets=[ast.Attribute(value=ast.Name(id="self", ctx=LOAD, **pos), attr=f,
+                                                             ctx=STORE, **pos)],
+                                      value=ast.Name(id=f, ctx=LOAD, **pos), **pos) for f in node.fields]
+                body.append(ast.FunctionDef(name="__init__", args=args, body=assigns or [ast.Pass(**pos)],
+                                            decorator_list=[], returns=None, **pos))
+            return [
+                ast.ImportFrom(module="runtime", level=0, **pos, names=[
+                    ast.alias(name=base, asname=f"_origin_{base}", **pos)]),
+                ast.ClassDef(name=node.name, bases=[ast.Name(id=f"_origin_{base}", ctx=LOAD, **pos)], keywords=[],
+                             body=body, decorator_list=[], **pos),
+            ]
+
+        elif isinstance(node, ClassNode):
+            self.global_classes.add(node.name)
+            body = []
+            init_node = node.methods.get("init", None)
+            if init_node is None and node.fields:
+                params = ["self"] + node.fields
+                args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=p, **pos) for p in params],
+                                     kwonlyargs=[], kw_defaults=[], defaults=[])
+                assigns = [ast.Assign(targets=[ast.Attribute(value=ast.Name(id="self", ctx=LOAD, **pos), attr=f,
+                                                             ctx=STORE, **pos)],
+                                      value=ast.Name(id=f, ctx=LOAD, **pos), **pos) for f in node.fields]
+                body.append(ast.FunctionDef(name="__init__", args=args, body=assigns, decorator_list=[],
+                                            returns=None, **pos))
+            else:
+                for method in node.methods.values():
+                    body.extend(gen(method, pos))
+            return [ast.ClassDef(name=node.name, bases=[], keywords=[], body=body or [ast.Pass(**pos)],
+                                 decorator_list=[], **pos)]
+
+        elif isinstance(node, ListNode):
+            return ast.List(elts=[gen(el, pos) for el in node.elements], ctx=LOAD, **pos)
+
+        elif isinstance(node, BinOpNode) or isinstance(node, LogicOpNode):
+            op = PYTHON_OPERATORS.get(node.op, node.op)
+            left = gen(node.left, pos)
+            right = gen(node.right, pos)
+            if op in BIN_OPS:
+                return ast.BinOp(left=left, op=BIN_OPS[op], right=right, **pos)
+            if op in COMPARE_OPS:
+                return ast.Compare(left=left, ops=[COMPARE_OPS[op]], comparators=[right], **pos)
+            if op in BOOL_OPS:
+                return ast.BoolOp(op=BOOL_OPS[op], values=[left, right], **pos)
+            raise RuntimeError(f"Unsupported operator {node.op!r}")
+
+        elif isinstance(node, NotNode):
+            return ast.UnaryOp(op=ast.Not(), operand=gen(node.expr, pos), **pos)
+
+        elif isinstance(node, SpecialOpNode):
+            if node.op == "??":
+                tmp = ast.NamedExpr(target=ast.Name(id="_origin_tmp", ctx=STORE, **pos), value=gen(node.left, pos), **pos)
+                test = ast.Compare(left=tmp, ops=[ast.IsNot()], comparators=[ast.Constant(value=None, **pos)], **pos)
+                return ast.IfExp(test=test, body=ast.Name(id="_origin_tmp", ctx=LOAD, **pos),
+                                 orelse=gen(node.right, pos), **pos)
+            raise RuntimeError(f"Unsupported operator {node.op!r}")
+
+        elif isinstance(node, UnaryOpNode):
+            operand = gen(node.node, pos)
+            for op in reversed(UNARY_OPS[node.op]):
+                operand = ast.UnaryOp(op=op, operand=operand, **pos)
+            return operand
+
+        elif isinstance(node, InputNode):
+            args = [gen(node.prompt, pos)] if node.prompt else []
+            return self.call("input", args, pos)
+
+        elif isinstance(node, IfNode):
+            orelse = self.body(node.else_body, pos) if node.else_body else []
+            for elif_node in reversed(node.elif_nodes):
+                elif_pos = self.position(elif_node, pos)
+                orelse = [ast.If(test=gen(elif_node.condition, elif_pos), body=self.body(elif_node.then_body, elif_pos),
+                                 orelse=orelse, **elif_pos)]
+            return [ast.If(test=gen(node.condition, pos), body=self.body(node.then_body, pos), orelse=orelse, **pos)]
+
+        elif isinstance(node, LenNode):
+            return self.call("len", [gen(node.value, pos)], pos)
+
+        elif isinstance(node, WhileNode):
+            return [ast.While(test=gen(node.condition, pos), body=self.body(node.body, pos), orelse=[], **pos)]
+
+        elif isinstance(node, IndexNode):
+            return ast.Subscript(value=gen(node.collection, pos), slice=gen(node.index, pos), ctx=LOAD, **pos)
+
+        elif isinstance(node, AttrNode):
+            return ast.Attribute(value=gen(node.value, pos), attr=node.name, ctx=LOAD, **pos)
+
+        elif isinstance(node, RangeNode):
+            return self.call("range", [gen(node.start, pos), gen(node.end, pos)], pos)
+
+        elif isinstance(node, ForNode):
+            return [ast.For(target=ast.Name(id=node.var_name, ctx=STORE, **pos), iter=gen(node.iterable, pos),
+                            body=self.body(node.body, pos), orelse=[], **pos)]
+
+        elif isinstance(node, VectorLoopNode):
+            loop = node.loop
+            start = f"_origin_start{self.vector_count}"
+            stop = f"_origin_stop{self.vector_count}"
+            self.vector_count += 1
+            load = lambda id: ast.Name(id=id, ctx=LOAD, **pos)
+            store = lambda id: ast.Name(id=id, ctx=STORE, **pos)
+            bounds = ast.Tuple(elts=[gen(loop.iterable.start, pos), gen(loop.iterable.end, pos)], ctx=LOAD, **pos)
+            no_args = ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[])
+            elements = []
+            for name in node.names:
+                # name or name.field
+                value, *fields = name.split(".")
+                value = load(value)
+                for field in fields:
+                    value = ast.Attribute(value=value, attr=field, ctx=LOAD, **pos)
+                elements.append(value)
+            values = ast.Lambda(args=no_args, body=ast.Tuple(elts=elements, ctx=LOAD, **pos), **pos)
+            test = self.call("_origin_vectorized", [ast.Constant(value=node.spec, **pos), load(start), load(stop),
+                                                    values], pos)
+            last = ast.BinOp(left=load(stop), op=BIN_OPS["-"], right=ast.Constant(value=1, **pos), **pos)
+            scalar = ast.For(target=store(loop.var_name), iter=self.call("range", [load(start), load(stop)], pos),
+                             body=self.body(loop.body, pos), orelse=[], **pos)
+            return [
+                ast.ImportFrom(module="runtime", level=0, **pos, names=[
+                    ast.alias(name="vectorized", asname="_origin_vectorized", **pos)]),
+                ast.Assign(targets=[ast.Tuple(elts=[store(start), store(stop)], ctx=STORE, **pos)], value=bounds,
+                           **pos),
+                ast.If(test=test, body=[ast.Assign(targets=[store(loop.var_name)], value=last, **pos)],
+                       orelse=[scalar], **pos),
+            ]
+
+        elif isinstance(node, CastNode):
+            return self.call(node.cast_type, [gen(node.value, pos)], pos)
+
+        elif isinstance(node, ImportNode):
+            return [ast.Import(names=[ast.alias(name=node.name.value, **pos)], **pos)]
+
+        elif isinstance(node, ReturnNode):
+            value = gen(node.value, pos) if node.value is not None else None
+            return [ast.Return(value=value, **pos)]
+
+        elif isinstance(node, YieldNode):
+            value = gen(node.value, pos) if node.value is not None else None
+            return [ast.Expr(ast.Yield(value=value, **pos), **pos)]
+
+        elif isinstance(node, BreakNode):
+            return [ast.Break(**pos)]
+
+        elif isinstance(node, ContinueNode):
+            return [ast.Continue(**pos)]
+
+        elif isinstance(node, ParallelForNode):
+            name = f"_origin_parallel{self.parallel_count}"
+            self.parallel_count += 1
+            args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=node.var_name, **pos)],
+                                 kwonlyargs=[], kw_defaults=[], defaults=[])
+            body = self.body(node.body, pos)
+            self.before.append(ast.ImportFrom(module="runtime", level=0, **pos, names=[
+                ast.alias(name="parallel_for", asname="_origin_parallel_for", **pos)]))
+            self.before.append(ast.FunctionDef(name=name, args=args, body=body, decorator_list=[], returns=None,
+                                               **pos))
+            workers = gen(node.workers, pos) if node.workers is not None else ast.Constant(value=None, **pos)
+            return self.call("_origin_parallel_for", [
+                ast.Name(id=name, ctx=LOAD, **pos), gen(node.iterable, pos), workers,
+                ast.Constant(value=node.threads, **pos), ast.Constant(value=node.reduce, **pos)], pos)
+
+        else:
+            raise RuntimeError(f"Unknown node type: {node}")
+
+    # The generator function Interpreter._fuse writes, added to self.before,
+    # and the call to it
+    def fuse(self, items, stages, pos):
+        name = f"_origin_pipeline{self.pipeline_count}"
+        self.pipeline_count += 1
+        params = [f"stage{i}" for i in range(len(stages))]
+        load = lambda id: ast.Name(id=id, ctx=LOAD, **pos)
+        store = lambda id: ast.Name(id=id, ctx=STORE, **pos)
+        limit = params[-1] if stages[-1].kind == "take" else None
+        loop = []
+        for stage, param in zip(stages, params):
+            if stage.kind == "map":
+                loop.append(ast.Assign(targets=[store("item")], value=self.call(param, [load("item")], pos), **pos))
+            elif stage.kind == "filter":
+                test = ast.UnaryOp(op=ast.Not(), operand=self.call(param, [load("item")], pos), **pos)
+                loop.append(ast.If(test=test, body=[ast.Continue(**pos)], orelse=[], **pos))
+        loop.append(ast.Expr(ast.Yield(value=load("item"), **pos), **pos))
+        body = []
+        if limit is not None:
+            one = ast.Constant(value=1, **pos)
+            loop.append(ast.AugAssign(target=store("taken"), op=BIN_OPS["+"], value=one, **pos))
+            done = ast.Compare(left=load("taken"), ops=[COMPARE_OPS[">="]], comparators=[load(limit)], **pos)
+            loop.append(ast.If(test=done, body=[ast.Return(value=None, **pos)], orelse=[], **pos))
+            empty = ast.Compare(left=load(limit), ops=[COMPARE_OPS["<="]], comparators=[ast.Constant(value=0, **pos)],
+                                **pos)
+            body.append(ast.If(test=empty, body=[ast.Return(value=None, **pos)], orelse=[], **pos))
+            body.append(ast.Assign(targets=[store("taken")], value=ast.Constant(value=0, **pos), **pos))
+        body.append(ast.For(target=store("item"), iter=load("items"), body=loop, orelse=[], **pos))
+        args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=p, **pos) for p in ["items"] + params],
+                             kwonlyargs=[], kw_defaults=[], defaults=[])
+        self.before.append(ast.FunctionDef(name=name, args=args, body=body, decorator_list=[], returns=None, **pos))
+        return self.call(name, [items] + [self.generate(stage.arg, pos) for stage in stages], pos)
+
+    @staticmethod
+    def call(name, args, pos):
+        return ast.Call(func=ast.Name(id=name, ctx=LOAD, **pos), args=args, keywords=[], **pos)
+
+    @staticmethod
+    def position(node, pos):
+        line = getattr(node, "line", None)
+        if line is None:
+            return pos
+        return {"lineno": line, "col_offset": node.col, "end_lineno": line, "end_col_offset": node.col}
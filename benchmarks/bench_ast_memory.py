@@ -0,0 +1,52 @@
+import argparse
+import tracemalloc
+
+from common import best_of, sample_lines
+from arena import NodeArena
+from classes import iter_child_nodes
+from lexer import lex
+from parser import Parser
+
+
+def traced(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def count_tree(node):
+    stack = [node]
+    count = 0
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(iter_child_nodes(node))
+    return count
+
+
+def main():
+    ap = argparse.ArgumentParser(description="AST memory per 10k source lines")
+    ap.add_argument("--lines", type=int, default=10_000)
+    args = ap.parse_args()
+
+    lines = sample_lines(args.lines)
+    tokens = lex(lines)
+    per = 10_000 / len(lines)
+
+    ast_size, program = traced(lambda: Parser(tokens).program())
+    arena_size, arena = traced(NodeArena.from_ast, program)
+    print(f"{len(lines)} lines, {count_tree(program)} nodes, {len(arena)} arena rows")
+    print(f"object AST : {ast_size * per / 1e6:6.2f} MB per 10k lines")
+    print(f"NodeArena  : {arena_size * per / 1e6:6.2f} MB per 10k lines "
+          f"({arena.nbytes() * per / 1e6:.2f} MB in arrays, {len(arena.literals)} literals)")
+
+    tree_time, _ = best_of(count_tree, program)
+    arena_time, _ = best_of(lambda: sum(1 for k in arena.kinds if k >= 2))
+    print(f"walk object AST : {tree_time * 1000:.1f} ms")
+    print(f"scan arena rows : {arena_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import threading
+import time
+
+import common  # puts the repository root on sys.path
+from compiler import compile_source, execute
+
+SEQUENTIAL = """let total = 0
+for i in range(0, {requests}) {{
+    let total = total + len(await fetch(i))
+}}
+print total
+"""
+
+
+# One `let` task per request, all in one async block
+def concurrent(requests):
+    tasks = "".join(f"    let r{i} = await fetch({i})\n" for i in range(requests))
+    total = " + ".join(f"len(r{i})" for i in range(requests))
+    return f"async {{\n{tasks}}}\nprint {total}\n"
+
+
+# Stand-in for a slow service: answers each line after delay seconds, many
+# connections at once, on an event loop of its own in a background thread
+class StandInServer:
+    def __init__(self, delay):
+        self.delay = delay
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.port = None
+        threading.Thread(target=self._serve, daemon=True).start()
+        self.ready.wait()
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self._answer, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _answer(self, reader, writer):
+        line = await reader.readline()
+        await asyncio.sleep(self.delay)
+        writer.write(b"reply to " + line)
+        await writer.drain()
+        writer.close()
+
+    # The coroutine function Origin programs call as fetch(i); Origin has
+    # no attribute syntax, so it is passed in as a global
+    def fetcher(self):
+        port = self.port
+
+        async def fetch(i):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"{i}\n".encode())
+            await writer.drain()
+            reply = await reader.readline()
+            writer.close()
+            await writer.wait_closed()
+            return reply.decode().strip()
+        return fetch
+
+
+def timed(source, fetch):
+    code = compile_source(source, "<bench>")
+    out = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        execute(code, {"__name__": "__main__", "fetch": fetch})
+    return time.perf_counter() - start, out.getvalue()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sequential awaits against an async block, fetching from a local "
+                                             "server that takes --delay seconds per request")
+    ap.add_argument("--requests", type=int, nargs="+", default=[1, 10, 50])
+    ap.add_argument("--delay", type=float, default=0.02)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    server = StandInServer(args.delay)
+    fetch = server.fetcher()
+    print(f"{args.delay * 1000:.0f} ms per request")
+    for requests in args.requests:
+        sequential = min(timed(SEQUENTIAL.format(requests=requests), fetch) for _ in range(args.repeat))
+        together = min(timed(concurrent(requests), fetch) for _ in range(args.repeat))
+        if sequential[1] != together[1]:
+            raise RuntimeError(f"outputs differ: {sequential[1]!r} != {together[1]!r}")
+        print(f"{requests:4d} requests  sequential {sequential[0]:7.3f} s  async block {together[0]:7.3f} s  "
+              f"{sequential[0] / together[0]:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+
+from common import best_of, sample_lines
+from astgen import ASTGenerator
+from interpreter import Interpreter
+from lexer import lex
+from parser import Parser
+
+
+def string_backend(program):
+    return compile(Interpreter().generate(program), "<origin>", "exec")
+
+
+def ast_backend(program):
+    return ASTGenerator().compile(program, "<origin>")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate + compile time of the two backends")
+    ap.add_argument("--lines", type=int, default=20_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    lines = sample_lines(args.lines)
+    program = Parser(lex(lines)).program()
+    string_time, _ = best_of(string_backend, program, repeat=args.repeat)
+    ast_time, _ = best_of(ast_backend, program, repeat=args.repeat)
+    print(f"{len(lines)} lines")
+    print(f"string source + compile : {string_time * 1000:8.1f} ms")
+    print(f"ast.Module + compile    : {ast_time * 1000:8.1f} ms")
+    print(f"speedup                 : {string_time / ast_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import tempfile
+import time
+
+from common import sample_lines
+from cache import CodeCache
+from compiler import compile_origin
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cold compile vs cached code objects")
+    ap.add_argument("--lines", type=int, default=20_000)
+    args = ap.parse_args()
+
+    lines = [line for line in sample_lines(args.lines) if not line.startswith("print")]
+    source = "\n".join(lines)
+    with tempfile.TemporaryDirectory() as directory:
+        cold = timed(compile_origin, source, "bench.org", CodeCache(directory))
+        memory_cache = CodeCache(directory)
+        disk = timed(compile_origin, source, "bench.org", memory_cache)
+        memory = timed(compile_origin, source, "bench.org", memory_cache)
+
+    print(f"{len(lines)} lines")
+    print(f"cold compile : {cold * 1000:9.2f} ms")
+    print(f"disk hit     : {disk * 1000:9.2f} ms")
+    print(f"memory hit   : {memory * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import sys
+
+from common import best_of, sample_lines
+from classes import iter_child_nodes
+from interpreter import Interpreter
+from lexer import lex
+from parser import Parser
+
+BODY = """let total = total + i * 2
+print total"""
+
+
+# depth nested loops/ifs, alternating, with a couple of statements per level
+def nested_lines(depth):
+    lines = []
+    for level in range(depth):
+        lines.extend(BODY.splitlines())
+        lines.append(f"while i{level} < 10 {{" if level % 2 else f"if i{level} > 0 {{")
+    lines.extend(BODY.splitlines())
+    lines.extend("}" * depth)
+    return lines
+
+
+def count_nodes(program):
+    stack = [program]
+    count = 0
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(iter_child_nodes(node))
+    return count
+
+
+def measure(label, lines, repeat):
+    program = Parser(lex(lines)).program()
+    nodes = count_nodes(program)
+    elapsed, code = best_of(lambda: Interpreter().generate(program), repeat=repeat)
+    print(f"{label:>14}  {nodes:>8} nodes  {len(code):>10} chars  {elapsed * 1000:8.2f} ms  "
+          f"{elapsed / nodes * 1e9:7.0f} ns/node")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Code generation time as programs grow longer and deeper")
+    ap.add_argument("--depths", type=int, nargs="+", default=[25, 50, 100, 200])
+    ap.add_argument("--lines", type=int, nargs="+", default=[10_000, 20_000, 40_000, 80_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    # the parser recurses once per nesting level
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * max(args.depths) + 1000))
+
+    print("nesting depth (ns/node should stay flat)")
+    for depth in args.depths:
+        measure(f"depth {depth}", nested_lines(depth), args.repeat)
+    print("program length (ns/node should stay flat)")
+    for n in args.lines:
+        lines = sample_lines(n)
+        measure(f"{len(lines)} lines", lines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import statistics
+import time
+
+from common import sample_lines
+from incremental import IncrementalDocument
+from interpreter import Interpreter
+from lexer import lex
+from parser import Parser
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental re-parse latency")
+    ap.add_argument("--lines", type=int, default=50_000)
+    ap.add_argument("--edits", type=int, default=500)
+    args = ap.parse_args()
+
+    lines = sample_lines(args.lines)
+    full = timed(lambda: Parser(lex(lines)).program())
+    doc = IncrementalDocument(lines)
+    # edit lines inside the for loop body of each repeated block
+    targets = [n for n, line in enumerate(lines) if line.startswith("    let c = ")]
+    step = max(1, len(targets) // args.edits)
+    targets = targets[::step][:args.edits]
+
+    retype = [timed(doc.edit, n, n + 1, f"    let c = a + {k}") for k, n in enumerate(targets)]
+    insert = []
+    delete = []
+    for n in targets:
+        insert.append(timed(doc.edit, n, n, "    print c"))
+        delete.append(timed(doc.edit, n, n + 1, []))
+
+    if Interpreter().generate(doc.program) != Interpreter().generate(Parser(lex(doc.lines)).program()):
+        raise SystemExit("incremental result differs from a full parse")
+
+    print(f"{len(lines)} lines, {len(doc.program.statements)} top-level statements")
+    print(f"full lex + parse : {full * 1000:8.1f} ms")
+    for name, samples in (("edit line", retype), ("insert line", insert), ("delete line", delete)):
+        samples = sorted(samples)
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        print(f"{name:16} : {statistics.median(samples) * 1000:8.3f} ms median, {p99 * 1000:.3f} ms p99")
+
+
+if __name__ == "__main__":
+    main()
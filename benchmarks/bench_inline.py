@@ -0,0 +1,56 @@
+import argparse
+
+from common import best_of, run
+from compiler import compile_source
+
+# Small helpers -O2 inlines on its own
+SMALL = """def sq(x) {
+    return x * x
+}
+def add(a, b) {
+    return a + b
+}
+let total = 0
+for i in range(0, N) {
+    let total = add(total, sq(i) % 7)
+}
+print total
+"""
+# A function with lets, which only `inline def` inlines, called from a
+# function so its lets become fast locals there
+EXPLICIT = """inline def dist(x, y) {
+    let dx = x - 3
+    let dy = y + 4
+    return dx * dx + dy * dy
+}
+def run(n) {
+    let total = 0
+    for i in range(0, n) {
+        let total = total + dist(i, i % 5)
+    }
+    return total
+}
+print run(N)
+"""
+PROGRAMS = {"small functions": SMALL, "inline def": EXPLICIT}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Call-heavy loops at -O2 with and without inlining")
+    ap.add_argument("--iterations", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    for name, template in PROGRAMS.items():
+        for n in args.iterations:
+            source = template.replace("N", str(n))
+            calls = best_of(run, compile_source(source, "<bench>", optimize=2, inline=False), repeat=args.repeat)
+            inlined = best_of(run, compile_source(source, "<bench>", optimize=2), repeat=args.repeat)
+            if calls[1] != inlined[1]:
+                raise RuntimeError(f"outputs differ: {calls[1]!r} != {inlined[1]!r}")
+            print(f"{name:<16} {n:9d} iterations  calls {calls[0] * 1000:9.2f} ms  "
+                  f"inlined {inlined[0] * 1000:9.2f} ms  {calls[0] / inlined[0]:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
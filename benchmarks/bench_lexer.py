@@ -0,0 +1,28 @@
+import argparse
+
+from common import best_of, sample_lines
+from lexer import lex, lex_sequential
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare lexer throughput")
+    ap.add_argument("--lines", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    lines = sample_lines(args.lines)
+    old_time, old_tokens = best_of(lex_sequential, lines, repeat=args.repeat)
+    new_time, new_tokens = best_of(lex, lines, repeat=args.repeat)
+
+    if [repr(t) for t in old_tokens] != [repr(t) for t in new_tokens]:
+        raise SystemExit("token streams differ")
+
+    n = len(new_tokens)
+    print(f"{len(lines)} lines, {n} tokens")
+    print(f"lex_sequential: {old_time:.3f}s  {n / old_time:,.0f} tokens/s")
+    print(f"lex           : {new_time:.3f}s  {n / new_time:,.0f} tokens/s")
+    print(f"speedup       : {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
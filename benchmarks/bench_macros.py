@@ -0,0 +1,77 @@
+import argparse
+import contextlib
+import io
+
+import common  # puts the repository root on sys.path
+from common import best_of
+from compiler import compile_source, source_lines
+from lexer import lex
+from macros import MacroTable
+from parser import Parser
+
+# Boilerplate a code generator repeats for every value it records
+PASTED = """let checked{n} = {value}
+if checked{n} < 0 {{
+    let checked{n} = 0
+}}
+let total = total + checked{n}
+let count = count + 1
+"""
+MACRO = """macro record(total, count, value) {
+    let checked = value
+    if checked < 0 {
+        let checked = 0
+    }
+    let total = total + checked
+    let count = count + 1
+}
+"""
+USE = "record(total, count, {value})\n"
+HEADER = "let total = 0\nlet count = 0\n"
+FOOTER = "print total\nprint count\n"
+
+
+# Plans every use again, as if expansions were not memoized
+class Unmemoized(MacroTable):
+    def _plan(self, macro, args):
+        self.plans.clear()
+        return super()._plan(macro, args)
+
+
+def parse(source, table=None):
+    parser = Parser(lex(source_lines(source)))
+    if table is not None:
+        parser.macros = table
+    return parser.program()
+
+
+def output(source):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        exec(compile_source(source, "<bench>"), {"__name__": "__main__"})
+    return out.getvalue()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Source size and lex + parse time of pasted boilerplate against "
+                                             "macro uses")
+    ap.add_argument("--uses", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    for uses in args.uses:
+        values = [f"{(i * 37) % 101 - 50}" for i in range(uses)]
+        pasted = HEADER + "".join(PASTED.format(n=i, value=v) for i, v in enumerate(values)) + FOOTER
+        macro = HEADER + MACRO + "".join(USE.format(value=v) for v in values) + FOOTER
+        if output(pasted) != output(macro):
+            raise RuntimeError("pasted and macro programs print different results")
+        pasted_time, _ = best_of(parse, pasted, repeat=args.repeat)
+        macro_time, _ = best_of(parse, macro, repeat=args.repeat)
+        unmemoized_time, _ = best_of(lambda: parse(macro, Unmemoized()), repeat=args.repeat)
+        print(f"{uses:6d} uses  source {len(pasted) / 1024:8.1f} KB -> {len(macro) / 1024:7.1f} KB  "
+              f"lex + parse {pasted_time * 1000:8.2f} ms -> {macro_time * 1000:7.2f} ms  "
+              f"(unmemoized {unmemoized_time * 1000:7.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import common  # puts the repository root on sys.path
+from compiler import compile_source
+
+# A CPU-bound body: each item costs about the same, so the speedup measures
+# the pool rather than load balance
+WORK = """def work(seed) {{
+    let acc = seed
+    for k in range(0, {inner}) {{
+        let acc = (acc * 31 + k) % 1000003
+    }}
+    return acc
+}}
+"""
+SEQUENTIAL = """let results = []
+for x in range(0, {items}) {{
+    let results = results + [work(x)]
+}}
+print len(results)
+"""
+PARALLEL = """let results = parallel {mode} for x in range(0, {items}) {{
+    return work(x)
+}}
+print len(results)
+"""
+
+
+def timed(source):
+    code = compile_source(source, "<bench>")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        exec(code, {"__name__": "__main__"})
+    return time.perf_counter() - start
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    ap = argparse.ArgumentParser(description="Speedup of parallel for over a plain for loop on a CPU-bound body")
+    ap.add_argument("--items", type=int, default=64)
+    ap.add_argument("--inner", type=int, default=200000, help="loop iterations per item")
+    ap.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cpus}))
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    work = WORK.format(inner=args.inner)
+    base = min(timed(work + SEQUENTIAL.format(items=args.items)) for _ in range(args.repeat))
+    print(f"{cpus} CPUs, {args.items} items x {args.inner} iterations")
+    print(f"{'for loop':<28} {base:8.3f} s")
+    for workers in args.workers:
+        for mode in (f"workers {workers}", f"threads workers {workers}"):
+            source = work + PARALLEL.format(mode=mode, items=args.items)
+            seconds = min(timed(source) for _ in range(args.repeat))
+            print(f"{'parallel ' + mode:<28} {seconds:8.3f} s  {base / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
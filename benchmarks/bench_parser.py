@@ -0,0 +1,33 @@
+import argparse
+
+from common import best_of
+from lexer import lex
+from parser import Parser
+
+# Expression statements and assignments dominated by operator chains
+EXPRESSION_BLOCK = """let total = a * b + c * d - e / f + g * (h - i)
+total = total + a * b - c / d * e + f - g
+values[i] = values[i] + scale * offset - bias / 2
+let ok = a < b
+let mixed = (a + b) * (c - d) / (e + f * g) - h
+count += a * b + c
+print total * 2 + ok - mixed / 3
+compute(a + b, c * d, e - f)
+"""
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parse time on expression-heavy code")
+    ap.add_argument("--copies", type=int, default=5_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    lines = EXPRESSION_BLOCK.splitlines() * args.copies
+    tokens = lex(lines)
+    elapsed, program = best_of(lambda: Parser(tokens).program(), repeat=args.repeat)
+    print(f"{len(lines)} lines, {len(tokens)} tokens, {len(program.statements)} statements")
+    print(f"parse: {elapsed:.3f}s  {len(tokens) / elapsed:,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+
+from common import best_of, run
+from compiler import compile_source
+
+STAGES = """def triple(x) {
+    return x * 3
+}
+def odd(x) {
+    return x % 2 == 1
+}
+"""
+PIPELINE = """let first = range(0, {items}) -> map(triple) -> filter(odd) -> take({take}) -> list
+print len(first)
+"""
+# The same stages as loops that each build a list for the next one
+LISTS = """let mapped = []
+for x in range(0, {items}) {{
+    let mapped = mapped + [triple(x)]
+}}
+let kept = []
+for y in mapped {{
+    if odd(y) {{
+        let kept = kept + [y]
+    }}
+}}
+let first = []
+for z in kept {{
+    if len(first) >= {take} {{
+        break
+    }}
+    let first = first + [z]
+}}
+print len(first)
+"""
+
+
+def main():
+    ap = argparse.ArgumentParser(description="A -> pipeline against the loops that build a list per stage")
+    ap.add_argument("--items", type=int, nargs="+", default=[1000, 10000, 30000])
+    ap.add_argument("--take", type=int, default=10, help="items the early-stopping run takes")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    for items in args.items:
+        for take in (items, args.take):
+            pipeline = best_of(run, compile_source(STAGES + PIPELINE.format(items=items, take=take), "<bench>"),
+                               repeat=args.repeat)
+            lists = best_of(run, compile_source(STAGES + LISTS.format(items=items, take=take), "<bench>"),
+                            repeat=args.repeat)
+            if pipeline[1] != lists[1]:
+                raise RuntimeError(f"outputs differ: {pipeline[1]!r} != {lists[1]!r}")
+            print(f"{items:7d} items, take {take:<7d} lists {lists[0] * 1000:9.2f} ms  "
+                  f"pipeline {pipeline[0] * 1000:8.2f} ms  {lists[0] / pipeline[0]:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+
+from common import best_of, run
+import optimizer
+from compiler import compile_source, parse
+from inference import type_errors
+
+# Code that converts values which already have the type, as code written
+# to be safe about input often does
+CASTS = """def mean(n) {
+    let total = 0.0
+    for i in range(0, n) {
+        let x = float(i) * 1.5
+        let total = float(total) + float(x) * 1
+    }
+    return total / float(n)
+}
+print mean(N)
+"""
+# Integer arithmetic with squares and identities left by macros or inlining
+SQUARES = """def dist(n) {
+    let best = 0
+    for i in range(0, n) {
+        let d = int(i) ** 2 + int(i % 7) ** 2 + 0
+        if d % 5 == 0 {
+            let best = best + d // 1
+        }
+    }
+    return best
+}
+print dist(N)
+"""
+PROGRAMS = {"redundant casts": CASTS, "int squares": SQUARES}
+# -O2 without the Specialize pass, added for this benchmark only
+WITHOUT = 3
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Loops at -O2 with and without type specialization")
+    ap.add_argument("--iterations", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    optimizer.LEVELS[WITHOUT] = tuple(p for p in optimizer.LEVELS[2] if p is not optimizer.Specialize)
+    for name, template in PROGRAMS.items():
+        errors = type_errors(parse(template))
+        if errors:
+            raise RuntimeError(f"type errors in {name}: {errors}")
+        for n in args.iterations:
+            source = template.replace("N", str(n))
+            plain = best_of(run, compile_source(source, "<bench>", optimize=WITHOUT), repeat=args.repeat)
+            typed = best_of(run, compile_source(source, "<bench>", optimize=2), repeat=args.repeat)
+            if plain[1] != typed[1]:
+                raise RuntimeError(f"outputs differ: {plain[1]!r} != {typed[1]!r}")
+            print(f"{name:<16} {n:9d} iterations  -O2 untyped {plain[0] * 1000:9.2f} ms  "
+                  f"typed {typed[0] * 1000:9.2f} ms  {plain[0] / typed[0]:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+ORIGIN = os.path.join(ROOT, "origin.py")
+# Modules a cached `origin run` must never import
+FORBIDDEN = ("lexer", "parser", "interpreter", "astgen", "pandas", "numpy")
+
+
+# {module: self microseconds} from `python -X importtime`, for the modules
+# the command imports beyond what a bare interpreter already loads
+def import_times(args):
+    def collect(argv):
+        proc = subprocess.run([sys.executable, "-X", "importtime"] + argv, cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        times = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            own, _, name = line[len("import time:"):].split("|")
+            times[name.strip()] = int(own)
+        return times
+
+    bare = collect(["-c", "pass"])
+    return {name: own for name, own in collect(args).items() if name not in bare}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Import-time budget for `origin run` served from the cache")
+    ap.add_argument("--budget-ms", type=float, default=50.0,
+                    help="fail if the imports beyond a bare interpreter take longer than this")
+    ap.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hello.org")
+        with open(path, "w") as file:
+            file.write('print "hello"\n')
+        # the first run fills the cache, the second is what gets measured
+        subprocess.run([sys.executable, ORIGIN, "run", path], stdout=subprocess.DEVNULL, check=True)
+        times = import_times([ORIGIN, "run", path])
+
+    total_ms = sum(times.values()) / 1000
+    for name, own in sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{own / 1000:8.2f} ms  {name}")
+    print(f"{len(times)} modules, {total_ms:.2f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failures = [f"imports {name}" for name in FORBIDDEN if name in times]
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.2f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print("FAIL: cached `origin run` " + failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+import common  # puts the repository root on sys.path
+import runtime
+from compiler import compile_source
+
+RECORD = "{kind} Rec {{\n    let x\n    let y\n    let z\n}}\n"
+# N records with the same values in each layout: a class or struct
+# instance per record, or one list per field
+ROWS = "def make(i) {\n    return Rec(i, i * 0.5, 0)\n}\nlet rs = range(0, N) -> map(make) -> list\n"
+COLUMNS = ("struct Rec as columns {\n    let x\n    let y\n    let z\n}\nlet rs = Rec(N)\n"
+           "for i in range(0, N) {\n    rs.x[i] = i\n    rs.y[i] = i * 0.5\n}\n")
+LAYOUTS = {
+    "class": (RECORD.format(kind="class") + ROWS,
+              "let total = 0\nfor r in rs {\n    let total = total + r.x * r.y - r.z\n}\n",
+              "for r in rs {\n    r.z = r.x + 1\n}\n"),
+    "struct": (RECORD.format(kind="struct") + ROWS,
+               "let total = 0\nfor r in rs {\n    let total = total + r.x * r.y - r.z\n}\n",
+               "for r in rs {\n    r.z = r.x + 1\n}\n"),
+    "struct as columns": (COLUMNS,
+                          "let total = 0\nfor i in range(0, len(rs)) {\n"
+                          "    let total = total + rs.x[i] * rs.y[i] - rs.z[i]\n}\n",
+                          "for i in range(0, len(rs)) {\n    rs.z[i] = rs.x[i] + 1\n}\n"),
+}
+
+
+# Bytes still allocated after building the records
+def memory(code):
+    gc.collect()
+    tracemalloc.start()
+    namespace = {"__name__": "__main__"}
+    exec(code, namespace)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+# Seconds of the fastest of repeat runs of code on the records
+def timed(code, namespace, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        exec(code, namespace)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Memory and field access of records as classes, structs and "
+                                             "struct columns")
+    ap.add_argument("--records", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("-O", dest="optimize", type=int, choices=(0, 1, 2), default=2)
+    args = ap.parse_args()
+
+    # imported before measuring, so the columns' vectorized loop does not
+    # count NumPy's own allocations
+    runtime._load_numpy()
+    for n in args.records:
+        base = None
+        totals = set()
+        for name, (build, read, write) in LAYOUTS.items():
+            compile_ = lambda source: compile_source(source.replace("N", str(n)), "<bench>", optimize=args.optimize)
+            build, read, write = compile_(build), compile_(read), compile_(write)
+            size = memory(build)
+            namespace = {"__name__": "__main__"}
+            exec(build, namespace)
+            reading = timed(read, namespace, args.repeat)
+            writing = timed(write, namespace, args.repeat)
+            exec(read, namespace)
+            totals.add(namespace["total"])
+            base = base or (size, reading, writing)
+            print(f"{name:<18} {n:8d} records  {size / n:6.1f} bytes each ({base[0] / size:4.1f}x less)  "
+                  f"read {reading * 1000:8.2f} ms ({base[1] / reading:4.2f}x)  "
+                  f"write {writing * 1000:8.2f} ms ({base[2] / writing:5.2f}x)")
+        if len(totals) != 1:
+            raise RuntimeError(f"layouts read different totals: {totals}")
+
+
+if __name__ == "__main__":
+    main()
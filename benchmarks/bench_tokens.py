@@ -0,0 +1,38 @@
+import argparse
+import tracemalloc
+
+from common import best_of, sample_lines
+from lexer import lex, lex_buffer
+
+
+def measure(func, lines):
+    tracemalloc.start()
+    result = func(lines)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare Token lists with TokenBuffer")
+    ap.add_argument("--lines", type=int, default=100_000)
+    args = ap.parse_args()
+
+    lines = sample_lines(args.lines)
+    source_size = sum(len(line) for line in lines)
+
+    list_size, tokens = measure(lex, lines)
+    del tokens
+    buffer_size, buf = measure(lex_buffer, lines)
+    print(f"{len(lines)} lines, {len(buf)} tokens, {source_size:,} source chars")
+    print(f"list[Token] : {list_size / 1e6:8.1f} MB  ({list_size / source_size:.1f}x source)")
+    print(f"TokenBuffer : {buffer_size / 1e6:8.1f} MB  ({buffer_size / source_size:.1f}x source)")
+
+    list_time, _ = best_of(lex, lines, repeat=3)
+    buffer_time, _ = best_of(lex_buffer, lines, repeat=3)
+    print(f"lex         : {list_time:.3f}s")
+    print(f"lex_buffer  : {buffer_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
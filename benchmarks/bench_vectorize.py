@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import common  # puts the repository root on sys.path
+import runtime
+from compiler import compile_source
+
+# The lists, made in Python so building them is not timed
+SETUP = "a = [float(i) for i in range(N)]\nb = list(range(1, N + 1))\nc = [0.0] * N\nk = 0.5\n"
+# Element-wise loops -O2 runs on NumPy arrays
+LOOPS = {
+    "c = a * b + k": "for i in range(0, N) {\n    c[i] = a[i] * b[i] + k\n}\n",
+    "three statements": "for i in range(0, N) {\n    c[i] = a[i] / b[i]\n    a[i] = c[i] - i\n"
+                        "    b[i] = b[i] * 3 % 7\n}\n",
+}
+
+
+# (seconds, lists after) of the fastest of repeat runs, without the setup
+def timed(code, setup, repeat):
+    best = None
+    for _ in range(repeat):
+        namespace = {"__name__": "__main__"}
+        exec(setup, namespace)
+        start = time.perf_counter()
+        exec(code, namespace)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, [namespace[name] for name in ("a", "b", "c")]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Element-wise list loops as written against vectorized by -O2")
+    ap.add_argument("--elements", type=int, nargs="+", default=[1000, 100000, 1000000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if not runtime._load_numpy():
+        print("NumPy is not installed; vectorized loops run as written")
+    for name, loop in LOOPS.items():
+        for n in args.elements:
+            setup = SETUP.replace("N", str(n))
+            source = loop.replace("N", str(n))
+            scalar = timed(compile_source(source, "<bench>", optimize=1), setup, args.repeat)
+            vector = timed(compile_source(source, "<bench>", optimize=2), setup, args.repeat)
+            if scalar[1] != vector[1]:
+                raise RuntimeError("the vectorized loop left different lists")
+            print(f"{name:<18} {n:8d} elements  loop {scalar[0] * 1000:9.2f} ms  "
+                  f"vectorized {vector[0] * 1000:8.2f} ms  {scalar[0] / vector[0]:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+
+import common  # puts the repository root on sys.path
+from compiler import BACKENDS, compile_source, execute
+
+# Origin has no attribute syntax, so asyncio.sleep is handed to the
+# programs as a global. after(n, label) yields to the event loop n times
+# before printing label, which makes the order tasks finish in fixed.
+PRELUDE = """async def after(n, label) {
+    for k in range(0, n) {
+        await sleep(0)
+    }
+    print label
+    return label
+}
+"""
+
+# Programs whose output and errors must not depend on the backend or the
+# optimization level
+CASES = {
+    "top-level await": 'let x = await after(2, "x")\nprint x + "!"',
+    "let tasks await": 'async {\n    let a = await after(3, "a")\n    let b = await after(1, "b")\n}\nprint a + b',
+    "tasks see values from before": 'let x = "old"\nasync {\n    let x = await after(2, "new")\n'
+                                    '    print "saw " + x\n}\nprint x',
+    "constants across the block": 'let c = 1\nasync {\n    let c = 2\n    print c\n}\nprint c',
+    "async def with a block": 'async def both(p) {\n    async {\n        let x = await after(2, p + "x")\n'
+                              '        let y = await after(1, p + "y")\n    }\n    return x + y\n}\n'
+                              'print await both("q")\nprint await both("r")',
+    "first failure cancels the rest": 'async def boom(n) {\n    await after(n, "boom")\n    return 1 / 0\n}\n'
+                                      'print "before"\nasync {\n    let a = await after(5, "never")\n'
+                                      '    let b = await boom(1)\n}\nprint "after"',
+    "loop reads a list another task changes": 'let xs = [1]\nasync def grow() {\n'
+                                              '    for k in range(0, 3) {\n        await sleep(0)\n'
+                                              '        xs[0] = xs[0] + 1\n    }\n}\n'
+                                              'async def watch() {\n    let seen = []\n'
+                                              '    for k in range(0, 4) {\n        let seen = seen + [xs[0] * 2]\n'
+                                              '        await sleep(0)\n    }\n    return seen\n}\n'
+                                              'async {\n    await grow()\n    let seen = await watch()\n}\nprint seen',
+    "hoisted invariants stay in their task": 'let xs = [1, 2, 3]\nlet n = 2\nasync {\n'
+                                             '    for i in range(0, 3) {\n        print len(xs) * n + i\n    }\n'
+                                             '    let z = await after(1, "z")\n}\nprint z',
+    "inlined calls in tasks": 'def twice(x) {\n    return x + x\n}\ninline def both(a, b) {\n    let s = twice(a)\n'
+                              '    return s + b\n}\nasync {\n    let a = twice(await after(2, "a"))\n'
+                              '    let s = both("s", await after(1, "b"))\n}\nprint a + s',
+    "empty block": 'async {\n}\nprint "done"',
+    "await in a plain def": 'def f() {\n    return await after(1, "x")\n}',
+    "async block in a plain def": 'def f() {\n    async {\n        print 1\n    }\n}',
+    "await in a parallel body": 'let r = parallel for x in [1] {\n    return await after(1, "x")\n}',
+    "update in an async block": 'let n = 0\nasync {\n    n += 1\n}',
+    "return in an async block": 'async def g() {\n    for i in range(0, 3) {\n        async {\n'
+                                '            if i == 1 {\n                return 99\n            }\n        }\n    }\n'
+                                '    return 0\n}\nprint await g()',
+    "break in an async block": 'for i in range(0, 3) {\n    async {\n        break\n    }\n}',
+    "jumps inside a task": 'async {\n    for i in range(0, 5) {\n        if i == 1 {\n            continue\n        }\n'
+                           '        if i == 3 {\n            break\n        }\n        print i\n    }\n'
+                           '    let x = await after(1, "x")\n}\nasync def h() {\n    async {\n'
+                           '        let f = await after(1, "f")\n    }\n    return f\n}\nprint await h()',
+}
+
+
+# (stdout, type of the uncaught exception or None) of compiling and running
+# source
+def run(source, backend, level):
+    out = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(out):
+        try:
+            code = compile_source(PRELUDE + source, "<check>", backend, optimize=level)
+            execute(code, {"__name__": "__main__", "sleep": asyncio.sleep})
+        except Exception as exc:
+            error = type(exc).__name__
+    return out.getvalue(), error
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that async programs print the same for every backend and "
+                                             "optimization level")
+    ap.add_argument("--levels", type=int, nargs="+", default=[0, 1, 2])
+    args = ap.parse_args()
+
+    failures = 0
+    for name, source in CASES.items():
+        expected = run(source, BACKENDS[0], 0)
+        for backend in BACKENDS:
+            for level in args.levels:
+                got = run(source, backend, level)
+                if got != expected:
+                    failures += 1
+                    print(f"MISMATCH {name} [{backend}, -O{level}]:\n"
+                          f"  expected {expected!r}\n  got      {got!r}", file=sys.stderr)
+        print(f"{name:<40} {expected[1] or 'ok'}")
+    if failures:
+        print(f"{failures} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print("all backends and levels match")
+
+
+if __name__ == "__main__":
+    main()
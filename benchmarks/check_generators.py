@@ -0,0 +1,76 @@
+import argparse
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+import common  # puts the repository root on sys.path
+from compiler import compile_source, execute
+
+SQUARES = """def squares(n) {
+    for i in range(0, n) {
+        yield i * i
+    }
+}
+"""
+# Streams the sequence through a for loop
+STREAMED = SQUARES + """let total = 0
+for s in squares(N) {
+    let total = total + s % 7
+}
+print total
+"""
+# The same, after building the whole sequence as a list
+MATERIALIZED = SQUARES + """let total = 0
+for s in list(squares(N)) {
+    let total = total + s % 7
+}
+print total
+"""
+# Growth in peak memory between the smallest and largest size that still
+# counts as flat
+FLAT_BYTES = 64 * 1024
+
+
+# (peak traced bytes while running, seconds, output) for template at n
+def measure(template, n):
+    code = compile_source(template.replace("N", str(n)), "<check>")
+    out = io.StringIO()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        execute(code, {"__name__": "__main__"})
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, seconds, out.getvalue()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that a for loop over an Origin generator runs in flat memory")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    ap.add_argument("--list-max", type=int, default=1_000_000, help="largest size to also run as a list")
+    args = ap.parse_args()
+
+    peaks = []
+    for n in args.sizes:
+        peak, seconds, output = measure(STREAMED, n)
+        peaks.append(peak)
+        row = f"{n:>11,} items  generator peak {peak / 1024:9.1f} KB  {seconds:6.2f} s"
+        if n <= args.list_max:
+            list_peak, _, list_output = measure(MATERIALIZED, n)
+            if list_output != output:
+                print(f"MISMATCH at {n}: {output!r} != {list_output!r}", file=sys.stderr)
+                sys.exit(1)
+            row += f"   list peak {list_peak / 1024:11.1f} KB"
+        print(row)
+    growth = max(peaks) - min(peaks)
+    if growth > FLAT_BYTES:
+        print(f"generator peak grew by {growth / 1024:.1f} KB", file=sys.stderr)
+        sys.exit(1)
+    print(f"generator peak flat within {growth / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import sys
+
+from common import SAMPLE_BLOCK, best_of, run
+from compiler import compile_source
+from generate import SHAPES, generate_program
+
+# Programs where a wrong fold or a missing guard would change the output
+CASES = {
+    "arithmetic": "let x = 60 * 60 * 24\nprint x\nprint 7 // 2\nprint -7 // 2\nprint 7 % -3\n"
+                  "print 2 ** -1\nprint 1 / 4",
+    "negative base": "let y = -5\nprint y ** 2\nprint (-5) ** 2\nprint -5 ** 2\nlet n = -2\nprint n ** 3",
+    "strings": 'print "ab" + "cd"\nprint "ab" * 3\nprint len("hello")\nprint str(12) + "!"\nprint int("42") + 1',
+    "logic values": 'print (1 && 2) || 3\nprint 0 || "s"\nprint 0 && 1\nprint not 0\nprint !true\nprint 1 ?? 2',
+    "comparisons": 'print 1 < 2\nprint 1 === 1.0\nprint "a" !== "b"\nprint 2 <> 2\nprint true + 1',
+    "branches": 'let x = 3\nif true {\n    print "then"\n}\nelse {\n    print "else"\n}\n'
+                'if false {\n    print "no"\n}\nelif x > 2 {\n    print "elif"\n}\nelse {\n    print "else"\n}\n'
+                'while false {\n    print "loop"\n}\nfor i in range(5, 1) {\n    print i\n}',
+    "runtime errors kept": 'print "before"\nprint 1 / 0',
+    "bad cast kept": 'print int("x")',
+    "type error kept": 'print "a" + 1',
+    "big results kept": 'print len(str(2 ** 1000))\nprint len("ab" * 5000)\nprint 3 ** 300 > 0',
+    "loop-carried": 'let q = 10\nlet k = 1\nfor i in range(0, 3) {\n    q = q + i * k\n    let k = k + 1\n}\n'
+                    'print q\nprint k\n'
+                    'let w = 0\nwhile w < 3 {\n    w = w + 1\n}\nprint w',
+    "branch merge": 'let c = 1\nlet v = 5\nif c > 0 {\n    let v = 6\n}\nprint v\n'
+                    'let u = 7\nif c > 0 {\n    let u = 7\n}\nprint u',
+    "stores": 'let a = 1\nlet a = 2\nprint a\nlet b = 1\nprint b\nlet b = 3\nprint b\n'
+              'def f(n) {\n    let unused = 5\n    let t = n\n    let t = n * 3\n    print t\n}\nf(4)',
+    "global read by a call": 'def f() {\n    print "in f"\n    return x\n}\nlet x = 1\nlet y = f()\nlet x = 2\nprint y',
+    "globals read by functions": 'def show() {\n    print g\n}\nlet g = 1\nshow()\nlet g = 2\nshow()',
+    "shadowed in function": 'let v = 1\ndef f(v) {\n    print v\n}\nf(5)\nprint v',
+    "counted loops": 'let i = 0\nlet t = 0\nwhile i < 5 {\n    let t = t + i\n    i += 1\n}\nprint i\nprint t\n'
+                     'let j = 7\nwhile j <= 3 {\n    let j = j + 1\n}\nprint j\n'
+                     'let n = 4\nlet k = 1\nwhile n >= k {\n    print k\n    k += 1\n}\nprint k\n'
+                     'let f = 0\nwhile f < 2.5 {\n    f += 1\n}\nprint f\n'
+                     'let g = 0\nlet h = 3\nwhile g < h {\n    let h = h - 1\n    g += 1\n}\nprint g\nprint h',
+    "loop invariants": 'let xs = [3, 1, 2]\nlet s = str(len(xs)) + "0"\nlet a = 0\nlet b = 5\n'
+                       'for i in range(0, len(xs)) {\n    let a = a + len(xs) * int(s) + b * b\n}\nprint a\n'
+                       'for x in xs {\n    if x > 1 {\n        print x + b * 2\n    }\n}\n'
+                       'let c = 0\nwhile c < len(xs) {\n    xs[c] = xs[c] + len(xs)\n    c += 1\n}\nprint xs\n'
+                       'def scale(vals, f) {\n    let acc = 0\n    for v in range(0, 3) {\n'
+                       '        let acc = acc + len(vals) * float(f) + v\n    }\n    print acc\n}\nscale(xs, "2.5")',
+    "invariants that raise": 'let s = "x"\nlet e = 0\nfor i in range(0, e) {\n    print int(s)\n}\n'
+                             'for i in range(0, 3) {\n    print i\n    print int(s)\n}',
+    "invariant after a raise": 'let s = "x"\nlet xs = [1]\nfor i in range(0, 3) {\n    let y = xs[i + 5] + int(s)\n}',
+    "break and continue": 'let a = 0\nfor i in range(0, 5) {\n    let a = i\n    if i == 2 {\n        break\n    }\n'
+                          '    let a = 100\n}\nprint a\nlet t = 0\nlet k = 0\nwhile k < 6 {\n    k += 1\n'
+                          '    if k % 2 == 0 {\n        continue\n    }\n    let t = t + k\n}\nprint t',
+    "generators": 'def evens(n) {\n    for i in range(0, n) {\n        if i % 2 == 0 {\n            yield i\n'
+                  '        }\n    }\n}\nprint list(evens(7))\ndef never() {\n    return\n    yield 1\n}\n'
+                  'print list(never())\ndef hidden() {\n    if false {\n        yield 1\n    }\n'
+                  '    while false {\n        yield 2\n    }\n}\nprint list(hidden())',
+    "pipelines": 'def sq(x) {\n    return x * x\n}\ndef big(x) {\n    return x > 10\n}\nlet n = 3\n'
+                 'print range(0, 20) -> map(sq) -> filter(big) -> take(n) -> list\n'
+                 'for i in range(0, 3) {\n    print range(0, 50) -> take(i + n) -> map(sq) -> sum\n}\n'
+                 'print [2, 1] -> sorted -> take(0) -> list\nprint range(0, 5) -> take(-1) -> list',
+    "inline argument order": 'def show(x) {\n    print x\n    return x\n}\ndef sub(a, b) {\n    return b - a\n}\n'
+                              'def first(a, b) {\n    return a\n}\nprint sub(show(1), show(2))\n'
+                              'let d = sub(show(3), 1) + sub(1, show(4))\nprint first(1, 1 / 0)',
+    "inline shadowed names": 'let k = 10\ndef addk(x) {\n    return x + k\n}\ndef g(k) {\n    return addk(k)\n}\n'
+                             'def h(addk) {\n    return addk * 2\n}\nprint g(1)\nprint h(3)\nprint addk(2)',
+    "inline recursion": 'def even(n) {\n    return n == 0 or odd(n - 1)\n}\ndef odd(n) {\n    return n != 0 and even(n - 1)\n}\n'
+                        'def twice(x) {\n    return x + x\n}\nprint even(10)\nprint twice(twice(3))',
+    "inline def with lets": 'inline def hyp(a, b) {\n    let s = a * a\n    let b = b * b\n    return s + b\n}\n'
+                            'let s = 1\nlet b = 2\nprint hyp(b, s + 2)\nprint s + b\nfor i in range(0, 3) {\n'
+                            '    let s = hyp(i, s)\n}\nprint s',
+    "inline def in expressions": 'def show(x) {\n    print x\n    return x\n}\ninline def mid(a, b) {\n'
+                                 '    let a = a + 1\n    return a * b\n}\nlet a = 2\nprint a + mid(a, show(3))\n'
+                                 'print show(1) + mid(show(2), 1)\nprint a > 5 and mid(a, 1) > 0\n'
+                                 'let a = [a, mid(1, a)]\nprint a',
+    "inline rebound function": 'def f(x) {\n    return x + 1\n}\nprint f(1)\ndef f(x) {\n    return x + 2\n}\nprint f(1)',
+    "macros": 'macro swap(a, b) {\n    let t = a\n    let a = b\n    let b = t\n}\nmacro sq(x) = x * x\n'
+              'let t = 5\nlet u = 7\nswap(t, u)\nprint t - u\nprint sq(t) + sq(sq(2))\n'
+              'for i in range(0, 3) {\n    swap(t, u)\n}\nprint [t, u]',
+    "typed rewrites": 'let z = -0.0\nlet n = 7\nlet b = true\nlet s = "ab"\nprint float(z) * 1\nprint z + 0\n'
+                      'print z / 1\nprint int(b) + 0\nprint b * 1\nprint int(n) ** 2\nprint n // 1 - 0\n'
+                      'print str(s) + "" ?? 1\nprint float(n)\nlet n = n + 0.5\nprint int(n)\n'
+                      'def f(x) {\n    let y = str(x)\n    return str(y) + x\n}\nprint f("q")\nlet big = 10.0 ** 308 * 10\nprint float(big) * 1',
+    "structs": 'struct P {\n    let x\n    let y\n}\nstruct Cols as columns { let a, let b }\nclass C {\n    let n\n}\n'
+               'let p = P(1, 2.5)\np.x = p.x + 4\nprint p\nprint p == P(5, 2.5)\nlet c = C(3)\nc.n = c.n + 1\nprint c.n\n'
+               'let k = 2\nlet cs = Cols(300)\nfor i in range(0, len(cs)) {\n    cs.a[i] = i * k\n    cs.b[i] = cs.a[i] - p.y\n}\n'
+               'cs[0] = [7, 8]\nprint cs[0]\nprint cs[299]\nprint sum(cs.b)\nfor i in range(0, 3) {\n    p.y = p.y * k\n}\nprint p',
+    "float range bounds": 'for i in range(3, 1.5) {\n    print i\n}\nprint "after"',
+    "float range invariant": 'let s = "x"\nfor i in range(0, 2.5) {\n    print int(s)\n}',
+    "float edge": 'print 0.1 + 0.2\nprint 1e300 * 1e300\nprint -0.0\nlet z = -0.0\nprint z ** 3',
+}
+
+
+def programs(sizes, seed):
+    for name, source in CASES.items():
+        yield name, source
+    yield "sample block", SAMPLE_BLOCK
+    for shape in SHAPES:
+        for n in sizes:
+            yield f"{shape}/{n}", "\n".join(generate_program(n, shape, seed))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that every -O level prints the same as -O0")
+    ap.add_argument("--lines", type=int, nargs="+", default=[200, 2000])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--levels", type=int, nargs="+", default=[1, 2])
+    args = ap.parse_args()
+
+    failures = 0
+    for name, source in programs(args.lines, args.seed):
+        expected = run(compile_source(source, "<check>"))
+        cells = []
+        for level in args.levels:
+            code = compile_source(source, "<check>", optimize=level)
+            got = run(code)
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH {name} -O{level}:\n  expected {expected!r}\n  got      {got!r}", file=sys.stderr)
+            seconds, _ = best_of(run, code, repeat=3)
+            cells.append(f"-O{level} {seconds * 1000:8.2f} ms")
+        base, _ = best_of(run, compile_source(source, "<check>"), repeat=3)
+        print(f"{name:<26} -O0 {base * 1000:8.2f} ms  " + "  ".join(cells))
+    if failures:
+        print(f"{failures} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print("all levels match -O0")
+
+
+if __name__ == "__main__":
+    main()
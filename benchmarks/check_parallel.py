@@ -0,0 +1,61 @@
+import argparse
+import sys
+
+from common import run
+from compiler import BACKENDS, compile_source
+
+# Loop headers every case is run with; "workers 1" runs the body in-line,
+# so every other mode must match it
+MODES = ("workers 1", "workers 4", "workers 3", "threads workers 4", "workers 64")
+
+# Programs whose output and errors must not depend on how the items were
+# split between workers. MODE is replaced with each of MODES.
+CASES = {
+    "results in input order": 'let squares = parallel MODE for x in range(0, 500) {\n    return x * x\n}\n'
+                              'print squares\nprint len(squares)',
+    "output in input order": 'parallel MODE for x in range(0, 60) {\n    print "item " + str(x)\n}\nprint "done"',
+    "float sum folds left to right": 'let xs = []\nfor i in range(0, 300) {\n    let xs = xs + [1.0 / (i + 1)]\n}\n'
+                                     'print parallel MODE for x in xs reduce + {\n    return x * 1.1\n}',
+    "reductions": 'print parallel MODE for x in [5, 3, 9, 1] reduce max {\n    return x\n}\n'
+                  'print parallel MODE for x in [5, 3, 9, 1] reduce min {\n    return x\n}\n'
+                  'print parallel MODE for s in ["a", "b", "c", "d"] reduce + {\n    return s\n}\n'
+                  'print parallel MODE for x in range(1, 12) reduce * {\n    return x\n}',
+    "no return": 'print parallel MODE for x in range(0, 5) {\n    let y = x\n}',
+    "closure over function locals": 'def scaled(factor) {\n    let offset = 100\n'
+                                    '    return parallel MODE for x in range(0, 20) {\n'
+                                    '        return x * factor + offset\n    }\n}\nprint scaled(3)',
+    "first error in input order": 'print "before"\nlet r = parallel MODE for x in range(0, 40) {\n'
+                                  '    print x\n    if x == 23 {\n        print int("bad")\n    }\n'
+                                  '    if x == 31 {\n        print 1 / 0\n    }\n    return x\n}\nprint "after"',
+    "empty input": 'print parallel MODE for x in [] {\n    return x\n}\n'
+                   'print parallel MODE for x in [] reduce + {\n    return x\n}',
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that parallel for gives the same results, output and errors "
+                                             "for every worker count, pool kind and backend")
+    ap.add_argument("--levels", type=int, nargs="+", default=[0, 2])
+    args = ap.parse_args()
+
+    failures = 0
+    for name, template in CASES.items():
+        expected = run(compile_source(template.replace("MODE", MODES[0]), "<check>"))
+        for mode in MODES:
+            source = template.replace("MODE", mode)
+            for backend in BACKENDS:
+                for level in args.levels:
+                    got = run(compile_source(source, "<check>", backend, optimize=level))
+                    if got != expected:
+                        failures += 1
+                        print(f"MISMATCH {name} [{mode}, {backend}, -O{level}]:\n"
+                              f"  expected {expected!r}\n  got      {got!r}", file=sys.stderr)
+        print(f"{name:<32} {expected[1] or 'ok'}")
+    if failures:
+        print(f"{failures} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print("all modes match workers 1")
+
+
+if __name__ == "__main__":
+    main()
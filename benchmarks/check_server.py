@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+from load_test import wait_for_socket
+from server import REJECTED_STATUS, Client
+
+ORIGIN = os.path.join(ROOT, "origin.py")
+
+# (job, expected status, expected stdout); each is sent in order on one
+# stream, so a job that ended the worker leaves the ones after it unanswered
+JOBS = [
+    ({"id": 1, "source": "print 1"}, 0, "1\n"),
+    ({"id": 2, "source": "print (1"}, REJECTED_STATUS, ""),
+    ({"id": 3, "source": "print 1 :: 2"}, REJECTED_STATUS, ""),
+    ({"id": 4, "source": "print " + "(" * 5000 + "1" + ")" * 5000}, REJECTED_STATUS, ""),
+    ({"id": 5, "source": "print 2", "timeout": "5"}, REJECTED_STATUS, ""),
+    ({"id": 6, "source": "print 2", "memory_mb": "64"}, REJECTED_STATUS, ""),
+    ({"id": 7, "source": "print 2", "timeout": True}, REJECTED_STATUS, ""),
+    ({"id": 8, "source": "print 2", "timeout": -1}, REJECTED_STATUS, ""),
+    ({"id": 9, "source": "print 2", "timeout": 0}, REJECTED_STATUS, ""),
+    ({"id": 10, "source": "print 4", "memory_mb": 0}, 0, "4\n"),
+    ({"id": 11, "source": "print 3", "timeout": 5, "memory_mb": 256.5}, 0, "3\n"),
+    ({"id": 12, "source": "print 1 / 0"}, 1, ""),
+    ({"id": 13, "source": 'print "last"'}, 0, "last\n"),
+]
+
+
+def check(results, mode):
+    failures = 0
+    for (job, status, stdout), result in zip(JOBS, results):
+        if result.get("id") != job["id"] or result["status"] != status or result["stdout"] != stdout:
+            failures += 1
+            print(f"MISMATCH {mode} job {job['id']}: expected status {status} stdout {stdout!r}, got {result}",
+                  file=sys.stderr)
+    if len(results) != len(JOBS):
+        failures += 1
+        print(f"MISSING {mode}: {len(results)} of {len(JOBS)} jobs answered", file=sys.stderr)
+    return failures
+
+
+def run_stdio():
+    lines = "".join(json.dumps(job) + "\n" for job, _, _ in JOBS)
+    proc = subprocess.run([sys.executable, ORIGIN, "serve", "--stdio", "--no-cache-dir"], input=lines,
+                          capture_output=True, text=True, cwd=ROOT, timeout=60)
+    return [json.loads(line) for line in proc.stdout.splitlines()]
+
+
+def run_socket():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "origin.sock")
+        proc = subprocess.Popen([sys.executable, ORIGIN, "serve", "--socket", path, "--workers", "1",
+                                 "--no-cache-dir"], cwd=ROOT)
+        try:
+            wait_for_socket(path, proc)
+            with Client(path) as client:
+                for job, _, _ in JOBS:
+                    job = dict(job)
+                    try:
+                        results.append(client.run(job.pop("source"), **job))
+                    except ConnectionError:
+                        break
+        finally:
+            proc.terminate()
+            proc.wait()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that `origin serve` answers bad jobs and keeps serving")
+    ap.parse_args()
+
+    failures = check(run_stdio(), "stdio") + check(run_socket(), "socket")
+    if failures:
+        print(f"{failures} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print(f"{len(JOBS)} jobs answered as expected over stdio and a socket")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import random
+import sys
+
+from common import run
+import runtime
+from compiler import BACKENDS, compile_source, translate
+
+# Element-wise loops -O2 vectorizes, over lists the cases fill in
+LOOPS = {
+    "arithmetic": "for i in range(0, n) {\n    c[i] = a[i] * b[i] + k - i\n    d[i] = a[i] - -b[i] * 3\n}",
+    "division": "for i in range(0, n) {\n    c[i] = a[i] / b[i]\n    d[i] = a[i] // b[i] + a[i] % b[i]\n}",
+    "reads a target": "for i in range(0, n) {\n    c[i] = a[i] + 1\n    d[i] = c[i] * c[i]\n    c[i] = d[i] - a[i]\n}",
+    "in place": "for i in range(0, n) {\n    a[i] = a[i] * k\n    b[i] = a[i] % 7 - b[i]\n}",
+    "from the index": "for i in range(s, n) {\n    c[i] = i * i // 3 - k\n    d[i] = 1.5\n}",
+}
+# Values the lists are filled with
+VALUES = {
+    "ints": lambda rng: rng.randint(-1000, 1000),
+    "nonzero ints": lambda rng: rng.choice([-1, 1]) * rng.randint(1, 10 ** 6),
+    "floats": lambda rng: rng.uniform(-1e3, 1e3),
+    "small floats": lambda rng: rng.choice([-0.0, 0.0, 0.5, -2.5, 0.001, 3.0]),
+    "specials": lambda rng: rng.choice([1.0, -0.0, float("inf"), float("-inf"), float("nan"), 2.5]),
+    "zeros": lambda rng: rng.choice([0, 1, -1]),
+    "mixed": lambda rng: rng.choice([1, 2.5, -3]),
+    "huge": lambda rng: rng.choice([2 ** 60, -(2 ** 40), 7]),
+    "bools": lambda rng: rng.choice([True, False, 3]),
+}
+# Loops vectorized code must leave alone or run the same way
+EDGES = {
+    "short lists": "let a = [1] * 300\nlet c = [0] * 50\nlet n = 300\n"
+                   "for i in range(0, n) {\n    c[i] = a[i] + 1\n}",
+    "aliased": "let a = []\nfor j in range(0, 300) {\n    let a = a + [j]\n}\nlet c = a\nlet n = 300\n"
+               "for i in range(0, n) {\n    c[i] = a[i] * 2 + 1\n    a[i] = c[i] - a[i]\n}\nprint a",
+    "negative start": "let a = [1.5] * 300\nlet n = 290\nfor i in range(-10, n) {\n    a[i] = a[i] + i\n}\nprint a",
+    "float bounds": "let a = [1] * 300\nfor i in range(0, 300.0) {\n    a[i] = a[i] + i\n}",
+    "string number": 'let a = ["x"] * 300\nlet k = "y"\nfor i in range(0, 300) {\n    a[i] = a[i] + k\n}\nprint a',
+    "undefined": "let a = [1] * 300\nfor i in range(0, 300) {\n    a[i] = a[i] + missing\n}",
+    "not a list": 'let a = "xy" * 50\nfor i in range(0, 300) {\n    a[i] = 1\n}',
+    "empty": "let a = [1] * 300\nlet i = 5\nfor i in range(7, 7) {\n    a[i] = 0\n}\nprint i",
+    "in a function": "def f(xs, k) {\n    for i in range(0, len(xs)) {\n        xs[i] = xs[i] * k + i\n    }\n"
+                     "    return i\n}\nlet a = [2] * 400\nprint f(a, 3)\nprint a",
+    "struct fields": "struct P as columns { let x  let v }\nstruct K { let dt }\nlet p = P(300)\nlet k = K(0.25)\n"
+                     "for i in range(0, len(p)) {\n    p.v[i] = i - 7\n    p.x[i] = p.x[i] + p.v[i] * k.dt\n}\nprint p",
+    "missing field": "struct K { let dt }\nlet k = K(2)\nlet a = [1] * 300\nfor i in range(0, 300) {\n"
+                     "    a[i] = a[i] + k.missing\n}",
+}
+
+
+# Origin source for a value make gives
+def literal(value):
+    if isinstance(value, list):
+        return f"[{', '.join(map(literal, value))}]"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value != value or value in (float("inf"), float("-inf")):
+        return f'float("{value}")'
+    return repr(value)
+
+
+def fill(name, n, make, rng):
+    return f"let {name} = {literal([make(rng) for _ in range(n)])}\n"
+
+
+def program(loop, make, rng, n):
+    source = fill("a", n, make, rng) + fill("b", n, make, rng)
+    # a constant true or false k would keep the loop from being vectorized
+    k = make(rng)
+    k = int(k) if isinstance(k, bool) else k
+    source += f"let c = [0] * {n}\nlet d = [0] * {n}\nlet n = {n}\nlet s = {n // 3}\nlet k = {literal(k)}\n"
+    return source + loop + "\nprint a\nprint b\nprint c\nprint d\nprint i\n"
+
+
+def cases(sizes, seed):
+    rng = random.Random(seed)
+    for loop_name, loop in LOOPS.items():
+        for value_name, make in VALUES.items():
+            for n in sizes:
+                yield f"{loop_name}/{value_name}/{n}", program(loop, make, rng, n)
+    yield from EDGES.items()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that vectorized loops print the same as -O0, with and "
+                                             "without NumPy")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    failures = 0
+    checked = 0
+    for name, source in cases(args.sizes, args.seed):
+        if "_origin_vectorized" not in translate(source, optimize=2) and name not in EDGES:
+            failures += 1
+            print(f"NOT VECTORIZED {name}", file=sys.stderr)
+        expected = run(compile_source(source, "<check>"))
+        for backend in BACKENDS:
+            code = compile_source(source, "<check>", backend=backend, optimize=2)
+            for numpy in (True, False):
+                runtime._numpy = None if numpy else False
+                got = run(code)
+                checked += 1
+                if got != expected:
+                    failures += 1
+                    print(f"MISMATCH {name} {backend}{'' if numpy else ' without numpy'}:\n"
+                          f"  expected {expected!r:.300}\n  got      {got!r:.300}", file=sys.stderr)
+        runtime._numpy = None
+    if failures:
+        print(f"{failures} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print(f"{checked} runs match -O0")
+
+
+if __name__ == "__main__":
+    main()
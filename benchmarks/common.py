@@ -0,0 +1,77 @@
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# A block of ordinary Origin code, repeated to reach the requested size.
+SAMPLE_BLOCK = """print "WELCOME TO THE CALCULATOR"
+# Handles inputs and type casting
+let x = float("3.5")
+let y = 2
+let op = "+"
+if op == "+" {
+    print x + y
+}
+elif op == "-" {
+    print x - y
+}
+else {
+    print x * y / 2
+}
+let a = 0
+let b = 1
+for i in range(0, 10) {
+    let c = a + b
+    let a = b
+    let b = c
+}
+let items = [1, 2, 3, 4, 5]
+while a > 100 {
+    let a = a - len(items)
+}
+"""
+
+
+# Whole copies of SAMPLE_BLOCK, at least n_lines long so every block closes;
+# callers report len() of the result, not n_lines
+def sample_lines(n_lines):
+    block = SAMPLE_BLOCK.splitlines()
+    lines = []
+    while len(lines) < n_lines:
+        lines.extend(block)
+    return lines
+
+
+# (stdout, type of the uncaught exception or None) of running code
+def run(code):
+    out = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(out):
+        try:
+            exec(code, {"__name__": "__main__"})
+        except Exception as exc:
+            error = type(exc).__name__
+    return out.getvalue(), error
+
+
+# Fastest of several runs, with the cyclic GC off while timing as timeit does
+def best_of(func, *args, repeat=5):
+    best = None
+    result = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
@@ -0,0 +1,135 @@
+import argparse
+import random
+import sys
+
+# Knobs for each program shape. Every generated program is a sequence of
+# units, each picked at random with the given weights:
+#   nested      - ifs and short loops nested up to `depth` levels
+#   expression  - assignments of `terms`-operand arithmetic expressions
+#   function    - a function definition followed by a few calls
+#   class       - a class with fields and an instance of it
+SHAPES = {
+    "mixed": {"depth": 6, "terms": 12, "weights": {"nested": 3, "expression": 3, "function": 3, "class": 1}},
+    "nested": {"depth": 40, "terms": 4, "weights": {"nested": 1}},
+    "expressions": {"depth": 2, "terms": 80, "weights": {"expression": 1}},
+    "functions": {"depth": 3, "terms": 6, "weights": {"function": 1}},
+    "classes": {"depth": 2, "terms": 4, "weights": {"class": 1}},
+}
+GLOBALS = 8
+# Python rejects more than 20 statically nested loops, so only this many of
+# the nesting levels in one unit are loops; the rest are ifs
+MAX_LOOPS = 3
+OPERATORS = ("+", "-", "*", "+", "-")
+
+
+class ProgramGenerator:
+    def __init__(self, shape="mixed", seed=0):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape {shape!r}, expected one of {', '.join(SHAPES)}")
+        self.shape = SHAPES[shape]
+        self.random = random.Random(seed)
+        self.lines = []
+        self.counter = 0
+        units = self.shape["weights"]
+        self.units = [getattr(self, "_unit_" + unit) for unit in units]
+        self.weights = list(units.values())
+
+    # At least n_lines lines of Origin source; always whole units, so the
+    # program parses and runs
+    def generate(self, n_lines):
+        lines = self.lines
+        for i in range(GLOBALS):
+            lines.append(f"let v{i} = {i + 1}")
+        lines.append("let acc = 0")
+        while len(lines) < n_lines:
+            self.random.choices(self.units, self.weights)[0]()
+        return lines
+
+    def _name(self, prefix):
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def _operand(self, names):
+        if self.random.random() < 0.3:
+            return str(self.random.randint(1, 9))
+        return self.random.choice(names)
+
+    def _expression(self, terms, names):
+        parts = [self._operand(names)]
+        for _ in range(terms - 1):
+            parts.append(self.random.choice(OPERATORS))
+            parts.append(self._operand(names))
+        return " ".join(parts)
+
+    def _global_names(self):
+        return [f"v{i}" for i in range(GLOBALS)]
+
+    def _assign(self, indent, names):
+        name = self._name("e")
+        self.lines.append(f"{indent}let {name} = {self._expression(self.shape['terms'], names)}")
+        self.lines.append(f"{indent}acc = acc + {name} % 7")
+
+    def _unit_nested(self):
+        depth = self.random.randint(1, self.shape["depth"])
+        loops = 0
+        names = self._global_names()
+        for level in range(depth):
+            indent = "    " * level
+            self._assign(indent, names)
+            if loops < MAX_LOOPS and self.random.random() < 0.3:
+                var = self._name("i")
+                self.lines.append(f"{indent}for {var} in range(0, 2) {{")
+                names = names + [var]
+                loops += 1
+            else:
+                self.lines.append(f"{indent}if {self.random.choice(names)} > 0 {{")
+        self._assign("    " * depth, names)
+        for level in reversed(range(depth)):
+            self.lines.append("    " * level + "}")
+
+    def _unit_expression(self):
+        self._assign("", self._global_names())
+
+    def _unit_function(self):
+        name = self._name("f")
+        params = ["a", "b", "c"]
+        self.lines.append(f"def {name}(a, b, c) {{")
+        self.lines.append(f"    let t = {self._expression(self.shape['terms'], params)}")
+        self.lines.append(f"    if t > {self.random.randint(0, 50)} {{")
+        self.lines.append(f"        let t = t - {self._expression(3, params)}")
+        self.lines.append("    }")
+        self.lines.append("    else {")
+        self.lines.append("        let t = t + 1")
+        self.lines.append("    }")
+        self.lines.append("}")
+        names = self._global_names()
+        for _ in range(self.random.randint(1, 3)):
+            args = ", ".join(self._operand(names) for _ in params)
+            self.lines.append(f"{name}({args})")
+
+    def _unit_class(self):
+        name = self._name("C")
+        fields = [f"x{i}" for i in range(self.random.randint(1, 4))]
+        self.lines.append(f"class {name} {{")
+        for field in fields:
+            self.lines.append(f"    let {field}")
+        self.lines.append("}")
+        args = ", ".join(self._operand(self._global_names()) for _ in fields)
+        self.lines.append(f"let {self._name('o')} = {name}({args})")
+
+
+def generate_program(n_lines, shape="mixed", seed=0):
+    return ProgramGenerator(shape, seed).generate(n_lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write a synthetic Origin program to stdout")
+    ap.add_argument("--lines", type=int, default=1000)
+    ap.add_argument("--shape", choices=SHAPES, default="mixed")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    sys.stdout.write("\n".join(generate_program(args.lines, args.shape, args.seed)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+
+from common import best_of
+from generate import SHAPES, generate_program
+from interpreter import Interpreter
+from lexer import lex
+from parser import Parser
+
+PHASES = ("lex", "parse", "generate", "compile", "exec")
+
+
+def run_program(code):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        exec(code, {"__name__": "__main__"})
+
+
+# Best-of-repeat seconds for each phase of one generated program
+def measure(lines, repeat):
+    times = {}
+    times["lex"], tokens = best_of(lex, lines, repeat=repeat)
+    times["parse"], program = best_of(lambda: Parser(tokens).program(), repeat=repeat)
+    times["generate"], source = best_of(lambda: Interpreter().generate(program), repeat=repeat)
+    times["compile"], code = best_of(compile, source, "<bench>", "exec", repeat=repeat)
+    times["exec"], _ = best_of(run_program, code, repeat=repeat)
+    return {"lines": len(lines), "tokens": len(tokens), "seconds": times}
+
+
+# (case, phase, baseline s, current s) for every phase that got slower by
+# more than threshold. Phases under min_seconds in the baseline are too
+# noisy to judge and are skipped.
+def regressions(results, baseline, threshold, min_seconds):
+    found = []
+    for case, result in results["cases"].items():
+        before = baseline["cases"].get(case)
+        if before is None:
+            continue
+        for phase, seconds in result["seconds"].items():
+            old = before["seconds"].get(phase)
+            if old is None or old < min_seconds:
+                continue
+            if seconds > old * (1 + threshold):
+                found.append((case, phase, old, seconds))
+    return found
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time each pipeline phase on synthetic programs")
+    ap.add_argument("--lines", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--output", metavar="FILE", help="write results as JSON")
+    ap.add_argument("--baseline", metavar="FILE", help="fail if a phase is slower than in this results file")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown against the baseline (0.10 = 10%%)")
+    ap.add_argument("--min-seconds", type=float, default=0.005,
+                    help="ignore phases that took less than this in the baseline")
+    args = ap.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "cases": {},
+    }
+    print(f"{'case':<22}" + "".join(f"{phase:>11}" for phase in PHASES) + "  (ms)")
+    for shape in args.shapes:
+        for n in args.lines:
+            case = f"{shape}/{n}"
+            result = measure(generate_program(n, shape, args.seed), args.repeat)
+            results["cases"][case] = result
+            print(f"{case:<22}" + "".join(f"{result['seconds'][phase] * 1000:11.2f}" for phase in PHASES))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        found = regressions(results, baseline, args.threshold, args.min_seconds)
+        for case, phase, old, new in found:
+            print(f"REGRESSION {case} {phase}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms "
+                  f"(+{(new / old - 1) * 100:.0f}%)", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print(f"no phase slower than baseline by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import ROOT
+
+from server import Client
+
+ORIGIN = os.path.join(ROOT, "origin.py")
+
+# Short scripts in the style of the workloads the server is for; {n} makes
+# a few distinct sources so both cache hits and misses happen
+SCRIPTS = [
+    'let total = 0\nfor i in range(0, 200) {\n    total = total + i * {n}\n}\nprint total',
+    'let name = "job {n}"\nprint name\nprint len(name)',
+    'let items = [{n}, 2, 3, 4, 5]\nlet a = items[0] * items[4]\nif a > 10 {\n    print a\n}\nelse {\n    print 0\n}',
+]
+VARIANTS = 50
+
+
+def script(i):
+    return SCRIPTS[i % len(SCRIPTS)].replace("{n}", str(i % VARIANTS))
+
+
+def wait_for_socket(path, proc, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during start-up")
+        try:
+            Client(path).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start listening")
+
+
+def client_thread(path, jobs, latencies, failures):
+    with Client(path) as client:
+        for i in jobs:
+            start = time.perf_counter()
+            result = client.run(script(i), id=i)
+            latencies.append(time.perf_counter() - start)
+            if result["status"] != 0:
+                failures.append(result)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def cold_rate(count):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(count):
+            path = os.path.join(tmp, f"job{i}.org")
+            with open(path, "w") as file:
+                file.write(script(i))
+            paths.append(path)
+        start = time.perf_counter()
+        for path in paths:
+            subprocess.run([sys.executable, ORIGIN, "run", path], stdout=subprocess.DEVNULL, check=True)
+        return count / (time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scripts per second through `origin serve`")
+    ap.add_argument("--jobs", type=int, default=2000)
+    ap.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--cold", type=int, default=50,
+                    help="also time this many `origin run` subprocesses for comparison, 0 to skip")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "origin.sock")
+        proc = subprocess.Popen([sys.executable, ORIGIN, "serve", "--socket", path, "--workers", str(args.workers),
+                                 "--cache-dir", os.path.join(tmp, "cache")], cwd=ROOT)
+        try:
+            wait_for_socket(path, proc)
+            latencies = []
+            failures = []
+            threads = [threading.Thread(target=client_thread,
+                                        args=(path, range(c, args.jobs, args.clients), latencies, failures))
+                       for c in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"{args.jobs} jobs, {args.clients} clients, {args.workers} workers")
+    print(f"served : {args.jobs / elapsed:8.1f} scripts/s  "
+          f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms  p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if args.cold:
+        print(f"cold   : {cold_rate(args.cold):8.1f} scripts/s  (one `origin run` process per script)")
+    if failures:
+        print(f"{len(failures)} jobs failed, first: {failures[0]}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+from collections import OrderedDict
+
+CACHE_DIR_NAME = "__origincache__"
+CACHE_SUFFIX = ".orc"
+# File header: format tag, then CPython's bytecode magic so a cache written by
+# another Python version is never loaded
+HEADER = b"ORGC" + importlib.util.MAGIC_NUMBER
+
+_fingerprint = None
+
+# Hash of the compiler's own sources, so entries written by any other version
+# of the lexer, parser or code generator never match
+def compiler_fingerprint():
+    global _fingerprint
+    if _fingerprint is None:
+        from compiler import COMPILER_VERSION
+        digest = hashlib.sha256(COMPILER_VERSION.encode())
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(root)):
+            if name.endswith(".py"):
+                with open(os.path.join(root, name), "rb") as file:
+                    digest.update(name.encode())
+                    digest.update(file.read())
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+# Two-tier cache of compiled Origin programs. The first tier is an in-process
+# LRU of code objects. The second is a directory of marshalled code objects,
+# one file per key. Writes go through a temp file and os.replace, so
+# concurrent processes never see a partial entry. The directory is trimmed to
+# max_bytes, dropping the least recently used files first.
+class CodeCache:
+    def __init__(self, directory=None, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_source_file(cls, path, **kwargs):
+        return cls(os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME), **kwargs)
+
+    @staticmethod
+    def key(source, filename="<origin>", options=""):
+        digest = hashlib.sha256()
+        for part in (compiler_fingerprint(), filename, options, source):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        code = self._memory.get(key)
+        if code is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return code
+        code = self._load(key)
+        if code is not None:
+            self._remember(key, code)
+            self.disk_hits += 1
+            return code
+        self.misses += 1
+        return None
+
+    def put(self, key, code):
+        self._remember(key, code)
+        if self.directory is not None:
+            self._store(key, code)
+            self._trim()
+
+    # compile_func(source, filename) is only called on a miss in both tiers
+    def load_or_compile(self, source, filename, compile_func, options=""):
+        key = self.key(source, filename, options)
+        code = self.get(key)
+        if code is None:
+            code = compile_func(source, filename)
+            self.put(key, code)
+        return code
+
+    def clear(self):
+        self._memory.clear()
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _remember(self, key, code):
+        self._memory[key] = code
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        expected = HEADER + bytes.fromhex(key)
+        if not data.startswith(expected):
+            self._remove(path)
+            return None
+        try:
+            code = marshal.loads(data[len(expected):])
+        except (EOFError, ValueError, TypeError):
+            self._remove(path)
+            return None
+        try:
+            # mtime doubles as last use time for _trim
+            os.utime(path)
+        except OSError:
+            pass
+        return code
+
+    def _store(self, key, code):
+        import tempfile
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(HEADER + bytes.fromhex(key))
+                file.write(marshal.dumps(code))
+            os.replace(tmp, self._path(key))
+        except OSError:
+            self._remove(tmp)
+
+    def _entries(self):
+        if self.directory is None:
+            return []
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _trim(self):
+        entries = self._entries()
+        total = sum(size for _, _, size in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort(key=lambda entry: entry[1])
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,8 +1,10 @@
 class ASTNode:
-    pass
+    # Origin source position, set by the parser where it knows one
+    __slots__ = ("line", "col")
 
 
 class NumberNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
@@ -10,6 +12,7 @@ class NumberNode(ASTNode):
 
 
 class StringNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
@@ -17,44 +20,70 @@ class StringNode(ASTNode):
 
 
 class VarNode(ASTNode):
+    __slots__ = ("name",)
     def __init__(self, name):
         self.name = name
     def __repr__(self):
         return f"VarNode({self.name})"
 
 class CastNode(ASTNode):
+    __slots__ = ("cast_type", "value")
     def __init__(self, cast_type, value):
         self.cast_type = cast_type
         self.value = value
 class RangeNode(ASTNode):
+    __slots__ = ("start", "end")
     def __init__(self, start, end):
         self.start = start
         self.end = end
 
 class ListNode(ASTNode):
+    __slots__ = ("elements",)
     def __init__(self, elements):
         self.elements = elements
     def __repr__(self):
         return f"ListNode({self.elements})"
     
 class IndexNode(ASTNode):
+    __slots__ = ("collection", "index")
     def __init__(self, collection, index):
         self.collection = collection
         self.index = index
 
 class IndexAssignNode(ASTNode):
+    __slots__ = ("collection", "index", "value")
     def __init__(self, collection, index, value):
         self.collection = collection
         self.index = index
         self.value = value
 
+# value.name, and value.name = ... as a statement
+class AttrNode(ASTNode):
+    __slots__ = ("value", "name")
+    def __init__(self, value, name):
+        self.value = value
+        self.name = name
+    def __repr__(self):
+        return f"AttrNode({self.value}, {self.name})"
+
+class AttrAssignNode(ASTNode):
+    __slots__ = ("target", "name", "value")
+    def __init__(self, target, name, value):
+        self.target = target
+        self.name = name
+        self.value = value
+    def __repr__(self):
+        return f"AttrAssignNode({self.target}, {self.name}, {self.value})"
+
 class BinOpNode(ASTNode):
+    __slots__ = ("left", "op", "right")
     def __init__(self, left, op, right):
         self.left, self.op, self.right = left, op, right
     def __repr__(self):
         return f"BinOpNode({self.left}, {self.op!r}, {self.right})"
     
 class CallerNode(ASTNode):
+    __slots__ = ("callee", "args")
     def __init__(self, callee, args):
         self.callee = callee
         self.args = args
@@ -62,6 +91,7 @@ class CallerNode(ASTNode):
         return f"CallerNode({self.callee}, {self.args})"
 
 class AssignNode(ASTNode):
+    __slots__ = ("name", "value")
     def __init__(self, name, value):
         self.name, self.value = name, value
     def __repr__(self):
@@ -69,6 +99,7 @@ class AssignNode(ASTNode):
 
 
 class PrintNode(ASTNode):
+    __slots__ = ("expr",)
     def __init__(self, expr):
         self.expr = expr
     def __repr__(self):
@@ -76,20 +107,34 @@ class PrintNode(ASTNode):
 
 
 class InputNode(ASTNode):
+    __slots__ = ("prompt",)
     def __init__(self, prompt=None):
         self.prompt = prompt
     def __repr__(self):
         return f"InputNode({self.prompt})"
     
 class ClassNode(ASTNode):
+    __slots__ = ("name", "fields", "methods")
     def __init__(self, name, fields, methods):
         self.name = name
         self.fields = fields
         self.methods=methods
     def __repr__(self):
         return f"ClassNode({self.name}, {self.fields},{self.methods})"
-    
+
+# struct Name { let a  let b }: a class with only fields, one slot each and
+# a positional constructor. With `as columns` it instead holds any number
+# of records as one list per field.
+class StructNode(ClassNode):
+    __slots__ = ("columns",)
+    def __init__(self, name, fields, columns=False):
+        super().__init__(name, fields, {})
+        self.columns = columns
+    def __repr__(self):
+        return f"StructNode({self.name}, {self.fields}, {self.columns})"
+
 class InstanceNode(ASTNode):
+    __slots__ = ("class_node", "fields")
     def __init__(self, class_node):
         self.class_node = class_node
         self.fields = {field: None for field in class_node.fields} 
@@ -99,32 +144,63 @@ class InstanceNode(ASTNode):
     
 
 class LenNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value 
     def __repr__(self):
         return f"LenNode({self.value})"
 class BlockNode(ASTNode):
+    __slots__ = ("statements",)
     def __init__(self, statements):
         self.statements = statements
     def __repr__(self):
         return f"BlockNode({self.statements})"
 
-class ImportNode:
+class ImportNode(ASTNode):
+    __slots__ = ("name",)
     def __init__(self, name_token):
         self.name = name_token  
 
     def __repr__(self):
         return f"ImportNode({self.name})"
     
-class FuncNode:
-    def __init__(self, name, params, body):
+class FuncNode(ASTNode):
+    __slots__ = ("name", "params", "body", "inline")
+    def __init__(self, name, params, body, inline=False):
         self.name = name
         self.params = params
         self.body = body
+        self.inline = inline
     def __repr__(self):
         return f"FuncNode({self.name},{self.params}, {self.body})"
     
+class AsyncFuncNode(FuncNode):
+    __slots__ = ()
+    def __repr__(self):
+        return f"AsyncFuncNode({self.name}, {self.params}, {self.body})"
+
+
+class AwaitNode(ASTNode):
+    __slots__ = ("value",)
+    def __init__(self, value):
+        self.value = value
+    def __repr__(self):
+        return f"AwaitNode({self.value})"
+
+
+# async { ... }: each statement runs as a concurrent task, and the block
+# ends when all of them have. A `let` directly in the block binds its name
+# once every task is done; anything else a task assigns stays in the task.
+class AsyncBlockNode(ASTNode):
+    __slots__ = ("statements",)
+    def __init__(self, statements):
+        self.statements = statements
+    def __repr__(self):
+        return f"AsyncBlockNode({self.statements})"
+
+
 class IfNode(ASTNode):
+    __slots__ = ("condition", "then_body", "elif_nodes", "else_body")
     def __init__(self, condition, then_body, elif_nodes=None, else_body=None):
         self.condition = condition
         self.then_body = then_body
@@ -134,6 +210,7 @@ class IfNode(ASTNode):
         return f"IfNode({self.condition}, {self.then_body},{self.elif_nodes} {self.else_body})"
 
 class ElifNode(ASTNode):
+    __slots__ = ("condition", "then_body", "else_body")
     def __init__(self, condition, then_body, else_body=None):
         self.condition = condition
         self.then_body = then_body
@@ -142,6 +219,7 @@ class ElifNode(ASTNode):
         return f"ElifNode({self.condition}, {self.then_body}, {self.else_body})"
 
 class WhileNode(ASTNode):
+    __slots__ = ("condition", "body")
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -150,6 +228,7 @@ class WhileNode(ASTNode):
 
 
 class ForNode(ASTNode):
+    __slots__ = ("var_name", "iterable", "body")
     def __init__(self, var_name, iterable, body):
         self.var_name = var_name
         self.iterable = iterable
@@ -157,25 +236,61 @@ class ForNode(ASTNode):
     def __repr__(self):
         return f"ForNode({self.var_name}, {self.iterable}, {self.body})"
 
+# parallel [threads] [workers N] for var in iterable [reduce op] { body }.
+# The body runs once per item as a function of var; the node's value is the
+# list of what each run returns, in input order, or those results folded
+# with op.
+class ParallelForNode(ASTNode):
+    __slots__ = ("var_name", "iterable", "body", "workers", "threads", "reduce")
+    def __init__(self, var_name, iterable, body, workers=None, threads=False, reduce=None):
+        self.var_name = var_name
+        self.iterable = iterable
+        self.body = body
+        self.workers = workers
+        self.threads = threads
+        self.reduce = reduce
+    def __repr__(self):
+        return (f"ParallelForNode({self.var_name}, {self.iterable}, {self.body}, {self.workers}, "
+                f"{self.threads}, {self.reduce!r})")
+
+# A for loop over range(start, end) whose body only sets element i of lists
+# from element i of lists, i and numbers, made by optimizer.Vectorize. spec
+# describes the body to runtime.vectorized, which runs it as whole-array
+# NumPy operations when that gives the same result; names are the lists and
+# numbers spec refers to by position, as `name` or `name.field`. loop runs
+# when NumPy cannot.
+class VectorLoopNode(ASTNode):
+    __slots__ = ("loop", "spec", "names")
+    def __init__(self, loop, spec, names):
+        self.loop = loop
+        self.spec = spec
+        self.names = names
+    def __repr__(self):
+        return f"VectorLoopNode({self.loop}, {self.spec!r}, {self.names!r})"
+
 class UnaryOpNode(ASTNode):
+    __slots__ = ("op", "node")
     def __init__(self, op, node):
         self.op, self.node = op, node
     def __repr__(self):
         return f"UnaryOpNode({self.op!r}, {self.node})"
     
 class ProgramNode(ASTNode):
+    __slots__ = ("statements",)
     def __init__(self, statements):
         self.statements = statements
     def __repr__(self):
         return f"ProgramNode({self.statements})"
 
 class BoolNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value: bool):
         self.value = value
     def __repr__(self):
         return f"BoolNode({self.value})"
 
 class CompoundAssignNode(ASTNode):
+    __slots__ = ("name", "op", "value")
     def __init__(self, name, op, value):
         self.name = name
         self.op = op
@@ -184,6 +299,7 @@ class CompoundAssignNode(ASTNode):
         return f"CompoundAssignNode({self.name}, {self.op!r}, {self.value})"
 
 class LogicOpNode(ASTNode):
+    __slots__ = ("left", "op", "right")
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -192,19 +308,41 @@ class LogicOpNode(ASTNode):
         return f"LogicOpNode({self.left}, {self.op!r}, {self.right})"
 
 class NotNode(ASTNode):
+    __slots__ = ("expr",)
     def __init__(self, expr):
         self.expr = expr
     def __repr__(self):
         return f"NotNode({self.expr})"
 
 class CallNode(ASTNode):
+    __slots__ = ("func_name", "arg")
     def __init__(self, func_name, arg):
         self.func_name = func_name
         self.arg = arg
     def __repr__(self):
         return f"CallNode({self.func_name}, {self.arg})"
 
+# source -> stage -> stage ...: a lazy pipeline. Each stage is a StageNode
+# for the built-in map/filter/take stages, or an expression the value so far
+# is passed to as first argument.
+class PipelineNode(ASTNode):
+    __slots__ = ("source", "stages")
+    def __init__(self, source, stages):
+        self.source = source
+        self.stages = stages
+    def __repr__(self):
+        return f"PipelineNode({self.source}, {self.stages})"
+
+class StageNode(ASTNode):
+    __slots__ = ("kind", "arg")
+    def __init__(self, kind, arg):
+        self.kind = kind
+        self.arg = arg
+    def __repr__(self):
+        return f"StageNode({self.kind}, {self.arg})"
+
 class SpecialOpNode(ASTNode):
+    __slots__ = ("left", "op", "right")
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -213,21 +351,53 @@ class SpecialOpNode(ASTNode):
         return f"SpecialOpNode({self.left}, {self.op!r}, {self.right})"
 
 class BreakNode(ASTNode):
+    __slots__ = ()
     def __repr__(self):
         return "BreakNode()"
 
 class ContinueNode(ASTNode):
+    __slots__ = ()
     def __repr__(self):
         return "ContinueNode()"
 
 class ReturnNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f"ReturnNode({self.value})"
 
 class YieldNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f"YieldNode({self.value})"
+
+
+_FIELDS = {}
+
+# Field names of a node class, base class slots first. The line/col
+# position slots of ASTNode are not fields.
+def node_fields(cls):
+    fields = _FIELDS.get(cls)
+    if fields is None:
+        fields = tuple(name for klass in reversed(cls.__mro__) if klass is not ASTNode
+                       for name in klass.__dict__.get("__slots__", ()))
+        _FIELDS[cls] = fields
+    return fields
+
+# Nodes directly inside node, including those held in lists and dicts
+def iter_child_nodes(node):
+    for name in node_fields(type(node)):
+        value = getattr(node, name, None)
+        if isinstance(value, ASTNode):
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, ASTNode):
+                    yield item
+        elif isinstance(value, dict):
+            for item in value.values():
+                if isinstance(item, ASTNode):
+                    yield item
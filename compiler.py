@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+
+# Bump when generated code changes in a way the source hash in cache.py
+# cannot see
+COMPILER_VERSION = "0.1"
+
+
+# compile() flag that lets generated code await at module level, and the
+# code flag a module that does so comes back with
+TOP_LEVEL_AWAIT = 0x2000  # ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+CO_COROUTINE = 0x80  # inspect.CO_COROUTINE
+
+
+def source_lines(source):
+    return [line.strip() for line in source.split("\n")]
+
+# "string" generates Python source and compiles that; "ast" builds an
+# ast.Module directly, with Origin line numbers on every node
+BACKENDS = ("string", "ast")
+
+
+# The compiler modules are imported lazily so that a run served from the
+# cache never loads them. macro_depth, here and below, limits how deeply
+# macros that use macros expand; None is macros.MAX_DEPTH.
+def parse(source, macro_depth=None):
+    from lexer import lex
+    from parser import Parser
+    return Parser(lex(source_lines(source)), macro_depth).program()
+
+# Origin source -> Python source
+def translate(source, optimize=0, inline=True, macro_depth=None):
+    from interpreter import Interpreter
+    program = parse(source, macro_depth)
+    if optimize:
+        from optimizer import optimize as optimize_program
+        program = optimize_program(program, optimize, inline)
+    return Interpreter().generate(program)
+
+# stats, a stats.PipelineStats, gets one phase per pipeline step. optimize
+# is the optimizer.LEVELS level; 0 skips the optimizer. inline=False keeps
+# the level's other passes but leaves every call as written.
+def compile_source(source, filename="<origin>", backend="string", stats=None, optimize=0, inline=True,
+                   macro_depth=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}")
+    from lexer import lex
+    from parser import Parser
+    if backend == "string":
+        from interpreter import Interpreter as Generator
+    else:
+        from astgen import ASTGenerator as Generator
+    phase = stats.phase if stats is not None else _no_phase
+    with phase("lex"):
+        tokens = lex(source_lines(source))
+    with phase("parse"):
+        program = Parser(tokens, macro_depth).program()
+    if stats is not None:
+        from stats import count_nodes
+        stats.tokens = len(tokens)
+        stats.nodes = count_nodes(program)
+    if optimize:
+        from optimizer import optimize as optimize_program
+        with phase("optimize"):
+            program = optimize_program(program, optimize, inline)
+    with phase("generate"):
+        if backend == "string":
+            generated = Generator().generate(program)
+        else:
+            generated = Generator().module(program)
+    with phase("compile"):
+        code = compile(generated, filename, "exec", flags=TOP_LEVEL_AWAIT)
+    if stats is not None and backend == "string":
+        stats.code_lines = generated.count("\n") + 1
+        stats.code_chars = len(generated)
+    return code
+
+# Code object for an Origin program, from cache when one is given
+def compile_origin(source, filename="<origin>", cache=None, backend="string", stats=None, optimize=0,
+                   inline=True, macro_depth=None):
+    if cache is None:
+        return compile_source(source, filename, backend, stats, optimize, inline, macro_depth)
+    hits, disk_hits = cache.hits, cache.disk_hits
+    options = f"{backend} -O{optimize}" + ("" if inline else " --no-inline")
+    if macro_depth is not None:
+        options += f" --macro-depth {macro_depth}"
+    code = cache.load_or_compile(source, filename,
+                                 lambda src, name: compile_source(src, name, backend, stats, optimize, inline,
+                                                                  macro_depth),
+                                 options=options)
+    if stats is not None:
+        stats.cache = "memory" if cache.hits > hits else "disk" if cache.disk_hits > disk_hits else "miss"
+    return code
+
+def run_origin(source, filename="<origin>", cache=None, namespace=None, backend="string", stats=None,
+               optimize=0, inline=True, macro_depth=None):
+    code = compile_origin(source, filename, cache, backend, stats, optimize, inline, macro_depth)
+    if namespace is None:
+        namespace = {"__name__": "__main__"}
+    if stats is None:
+        execute(code, namespace)
+    else:
+        with stats.phase("exec"):
+            execute(code, namespace)
+    return namespace
+
+# Runs compiled Origin code in namespace. A program that awaits at module
+# level compiles to a coroutine, which runs on a fresh asyncio event loop.
+def execute(code, namespace):
+    if code.co_flags & CO_COROUTINE:
+        import asyncio
+        asyncio.run(eval(code, namespace))
+    else:
+        exec(code, namespace)
+
+# (namespace, stats) for one instrumented run; the stats hooks are called
+# before returning
+def run_with_stats(source, filename="<origin>", cache=None, backend="string", track_memory=False, optimize=0,
+                   inline=True, macro_depth=None):
+    from stats import PipelineStats
+    stats = PipelineStats(track_memory)
+    try:
+        namespace = run_origin(source, filename, cache, backend=backend, stats=stats, optimize=optimize,
+                               inline=inline, macro_depth=macro_depth)
+    finally:
+        stats.finish()
+    return namespace, stats
+
+def compile_with_stats(source, filename="<origin>", cache=None, backend="string", track_memory=False,
+                       optimize=0, inline=True, macro_depth=None):
+    from stats import PipelineStats
+    stats = PipelineStats(track_memory)
+    try:
+        code = compile_origin(source, filename, cache, backend, stats, optimize, inline, macro_depth)
+    finally:
+        stats.finish()
+    return code, stats
+
+@contextmanager
+def _no_phase(name):
+    yield
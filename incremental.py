@@ -0,0 +1,257 @@
+from bisect import bisect_left, bisect_right
+
+from lexer import Token, lex_line
+from parser import Parser
+from classes import ProgramNode
+
+OPENERS = frozenset(("{", "[", "("))
+CLOSERS = frozenset(("}", "]", ")"))
+# Lines starting with these belong to the statement above them
+CONTINUATIONS = frozenset(("elif", "else", "{"))
+
+
+# Sorted line numbers kept in chunks that each carry their own base line, so
+# shifting everything below an inserted or deleted line only touches one
+# number per chunk instead of one per statement.
+class LineIndex:
+    CHUNK = 256
+
+    def __init__(self, lines=()):
+        self._rechunk(list(lines))
+
+    def _rechunk(self, lines):
+        self.chunks = []
+        for i in range(0, len(lines), self.CHUNK):
+            part = lines[i:i + self.CHUNK]
+            base = part[0]
+            self.chunks.append([base, [line - base for line in part]])
+        self._reindex()
+
+    def _reindex(self):
+        # index of each chunk's first entry, and each chunk's last line
+        self.counts = []
+        self.lasts = []
+        total = 0
+        for base, rel in self.chunks:
+            self.counts.append(total)
+            self.lasts.append(base + rel[-1])
+            total += len(rel)
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.total
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        ci = bisect_right(self.counts, index) - 1
+        base, rel = self.chunks[ci]
+        return base + rel[index - self.counts[ci]]
+
+    def __iter__(self):
+        for base, rel in self.chunks:
+            for line in rel:
+                yield base + line
+
+    def bisect_left(self, line):
+        ci = bisect_left(self.lasts, line)
+        if ci == len(self.chunks):
+            return self.total
+        base, rel = self.chunks[ci]
+        return self.counts[ci] + bisect_left(rel, line - base)
+
+    def bisect_right(self, line):
+        ci = bisect_right(self.lasts, line)
+        if ci == len(self.chunks):
+            return self.total
+        base, rel = self.chunks[ci]
+        return self.counts[ci] + bisect_right(rel, line - base)
+
+    # Replaces entries [lo, hi) with new_lines and moves every entry from hi
+    # onwards by shift
+    def replace(self, lo, hi, new_lines, shift):
+        chunks = self.chunks
+        if not chunks:
+            self._rechunk(list(new_lines))
+            return
+        first = max(bisect_right(self.counts, lo) - 1, 0)
+        last = max(bisect_right(self.counts, max(hi - 1, lo)) - 1, first)
+        start = self.counts[first]
+        lines = []
+        for base, rel in chunks[first:last + 1]:
+            lines.extend(base + line for line in rel)
+        lines[hi - start:] = [line + shift for line in lines[hi - start:]]
+        lines[lo - start:hi - start] = new_lines
+        for chunk in chunks[last + 1:]:
+            chunk[0] += shift
+        middle = []
+        for i in range(0, len(lines), self.CHUNK):
+            part = lines[i:i + self.CHUNK]
+            middle.append([part[0], [line - part[0] for line in part]])
+        chunks[first:last + 1] = middle
+        self._reindex()
+
+
+# An Origin file kept lexed and parsed between edits, for editor integration.
+# Tokens are cached per line, along with the bracket depth at the start of
+# each line. An edit re-lexes only the changed lines, then re-parses the
+# top-level statements around them and splices those into self.program.
+class IncrementalDocument:
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.line_tokens = [lex_line(line, n + 1) for n, line in enumerate(self.lines)]
+        # bracket depth at the start of each line, plus one entry for the end
+        self.depths = [0]
+        for tokens in self.line_tokens:
+            self.depths.append(self.depths[-1] + self._delta(tokens))
+        self.program = ProgramNode([])
+        # line index where each statement in self.program starts
+        self.stmt_lines = LineIndex()
+        # lines defining a macro; while there are any, an edit anywhere can
+        # change what a use elsewhere expands to, so each edit re-parses all
+        self.macro_lines = sum(1 for tokens in self.line_tokens if self._defines_macro(tokens))
+        self._stale = False
+        self.reparse()
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text.split("\n"))
+
+    def text(self):
+        return "\n".join(self.lines)
+
+    def tokens(self):
+        tokens = [tok for line in self._renumbered(0, len(self.lines)) for tok in line]
+        tokens.append(Token("EOF", "", len(self.lines) + 1, 0))
+        return tokens
+
+    # Replaces lines [start, end) (0-based) with new_text, a string or a list
+    # of lines (an empty list deletes the range), and returns the updated
+    # ProgramNode.
+    def edit(self, start, end, new_text):
+        if not 0 <= start <= end <= len(self.lines):
+            raise IndexError(f"Edit range {start}:{end} outside document of {len(self.lines)} lines")
+        new_lines = new_text.split("\n") if isinstance(new_text, str) else list(new_text)
+        new_tokens = [lex_line(line, start + n + 1) for n, line in enumerate(new_lines)]
+        shift = len(new_lines) - (end - start)
+
+        old_after = self.depths[end]
+        had_macros = self.macro_lines
+        self.macro_lines += (sum(1 for tokens in new_tokens if self._defines_macro(tokens))
+                             - sum(1 for tokens in self.line_tokens[start:end] if self._defines_macro(tokens)))
+        self.lines[start:end] = new_lines
+        self.line_tokens[start:end] = new_tokens
+        depth = self.depths[start]
+        new_depths = []
+        for tokens in new_tokens:
+            new_depths.append(depth)
+            depth += self._delta(tokens)
+        self.depths[start:end] = new_depths
+        # depths after the edit only move if the edit changed the bracket balance
+        if depth != old_after:
+            diff = depth - old_after
+            after = start + len(new_lines)
+            self.depths[after:] = [d + diff for d in self.depths[after:]]
+
+        if self._stale or had_macros or self.macro_lines:
+            return self.reparse()
+
+        # The region to re-parse covers the statements around the edit, both
+        # as they were before it and as the new bracket depths place them.
+        # If the edit changed the bracket balance, everything below moves.
+        stmt_lines = self.stmt_lines
+        before = stmt_lines.bisect_right(start) - 1
+        first = self._statement_start(start)
+        if before >= 0:
+            first = min(first, stmt_lines[before])
+        if depth != old_after:
+            last = len(self.lines)
+        else:
+            following = stmt_lines.bisect_left(end)
+            last = self._next_statement(start + len(new_lines))
+            if following < len(stmt_lines):
+                last = max(last, stmt_lines[following] + shift)
+            else:
+                last = len(self.lines)
+
+        lo = stmt_lines.bisect_left(first)
+        hi = stmt_lines.bisect_left(last - shift)
+        try:
+            statements, starts = self._parse_lines(first, last)
+        except SyntaxError:
+            self._stale = True
+            raise
+        self.program.statements[lo:hi] = statements
+        stmt_lines.replace(lo, hi, starts, shift)
+        return self.program
+
+    def reparse(self):
+        self._stale = True
+        statements, starts = self._parse_lines(0, len(self.lines))
+        self.program.statements = statements
+        self.stmt_lines = LineIndex(starts)
+        self._stale = False
+        return self.program
+
+    def _parse_lines(self, first, last):
+        tokens = [tok for line in self._renumbered(first, last) for tok in line]
+        tokens.append(Token("EOF", "", last + 1, 0))
+        parser = Parser(tokens)
+        statements = []
+        starts = []
+        parser.skip_newlines()
+        while parser.current_token().type != "EOF":
+            start = parser.current_token().line - 1
+            node = parser.statement()
+            # a macro definition is no statement; a use may be several
+            nodes = node if isinstance(node, list) else [node]
+            statements.extend(nodes)
+            starts.extend([start] * len(nodes))
+            parser.skip_newlines()
+        return statements, starts
+
+    # Line tokens for [first, last), rebuilt where inserted or deleted lines
+    # above them left their line numbers out of date
+    def _renumbered(self, first, last):
+        line_tokens = self.line_tokens
+        for n in range(first, last):
+            tokens = line_tokens[n]
+            if tokens[0].line != n + 1:
+                tokens = [Token(t.type, t.value, n + 1, t.col) for t in tokens]
+                line_tokens[n] = tokens
+            yield tokens
+
+    @staticmethod
+    def _defines_macro(tokens):
+        return any(tok.type == "KEYWORD" and tok.value == "macro" for tok in tokens)
+
+    @staticmethod
+    def _delta(tokens):
+        delta = 0
+        for tok in tokens:
+            if tok.value in OPENERS and tok.type in ("BRACKET", "SYMBOL"):
+                delta += 1
+            elif tok.value in CLOSERS and tok.type in ("BRACKET", "SYMBOL"):
+                delta -= 1
+        return delta
+
+    # True when a top-level statement begins on line n
+    def _is_head(self, n):
+        if self.depths[n] != 0:
+            return False
+        first = self.line_tokens[n][0]
+        return first.type != "NEWLINE" and first.value not in CONTINUATIONS
+
+    def _statement_start(self, n):
+        n = min(n, len(self.lines) - 1)
+        while n > 0 and not self._is_head(n):
+            n -= 1
+        return max(n, 0)
+
+    def _next_statement(self, n):
+        count = len(self.lines)
+        while n < count and not self._is_head(n):
+            n += 1
+        return n
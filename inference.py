@@ -0,0 +1,295 @@
+import operator
+
+from classes import *
+from interpreter import PYTHON_OPERATORS
+
+# Types inference tells apart, by Python type name. An instance of an Origin
+# class has the class's name as its type, and a function or class itself
+# has its FuncNode or ClassNode. None is any type.
+INT, FLOAT, STR, BOOL, LIST = "int", "float", "str", "bool", "list"
+BUILTIN_TYPES = (INT, FLOAT, STR, BOOL, LIST)
+# Stands in, while scope_types works, for a name none of whose bindings
+# have been given a type yet
+PENDING = "pending"
+
+# Python operations behind each Origin operator, after PYTHON_OPERATORS
+BINARY = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+    "//": operator.floordiv, "%": operator.mod, "**": operator.pow,
+    "&": operator.and_, "|": operator.or_, "^": operator.xor, "<<": operator.lshift, ">>": operator.rshift,
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge,
+}
+UNARY = {"-": operator.neg, "+": operator.pos, "--": lambda v: -(-v), "++": lambda v: +(+v)}
+CASTS = {"int": int, "float": float, "str": str}
+
+
+# A value of a builtin type, for asking Python what an operation does with
+# it. None of them is zero or empty, so only TypeError depends on the types
+# alone.
+def sample(type_):
+    return {INT: 3, FLOAT: 2.5, STR: "s", BOOL: True, LIST: [1]}[type_]
+
+
+# (type, error) of applying fn to samples: error is the message of the
+# TypeError every value of those types raises, else None
+def _apply(fn, *types):
+    try:
+        result = fn(*(sample(type_) for type_ in types))
+    except TypeError as exc:
+        return None, str(exc)
+    except (ValueError, IndexError, OverflowError):
+        return None, None
+    return type(result).__name__, None
+
+
+# (op, left, right) -> (type, error) for every builtin pair of operand types
+def _binary_table():
+    table = {}
+    for op, fn in BINARY.items():
+        for left in BUILTIN_TYPES:
+            for right in BUILTIN_TYPES:
+                result, error = _apply(fn, left, right)
+                if op == "**" and error is None:
+                    # 2 ** -1 is a float and (-8.0) ** 0.5 complex
+                    result = FLOAT if left == FLOAT and right in (INT, BOOL) else None
+                elif op == "%" and left == STR:
+                    # formatting, which fails or not by the string's contents
+                    result, error = STR, None
+                table[op, left, right] = result, error
+    return table
+
+
+BINARY_TYPES = _binary_table()
+
+
+# (type, error) of left op right, or (None, None) when either type is
+# unknown or not a builtin one
+def binary_type(op, left, right):
+    op = PYTHON_OPERATORS.get(op, op)
+    if PENDING in (left, right):
+        return PENDING, None
+    if op in ("and", "or"):
+        return (left if left == right else None), None
+    return BINARY_TYPES.get((op, left, right), (None, None))
+
+
+def unary_type(op, operand):
+    if operand == PENDING:
+        return PENDING, None
+    if op not in UNARY or operand not in BUILTIN_TYPES:
+        return None, None
+    return _apply(UNARY[op], operand)
+
+
+# The type node evaluates to, given the types of names, or None if it can
+# be more than one
+def type_of(node, types):
+    if isinstance(node, NumberNode):
+        return type(node.value).__name__
+    if isinstance(node, (StringNode, InputNode)):
+        return STR
+    if isinstance(node, (BoolNode, NotNode)):
+        return BOOL
+    if isinstance(node, ListNode):
+        return LIST
+    if isinstance(node, LenNode):
+        return INT
+    if isinstance(node, VarNode):
+        return types.get(node.name)
+    if isinstance(node, CastNode):
+        return node.cast_type if node.cast_type in CASTS else None
+    if isinstance(node, UnaryOpNode):
+        return unary_type(node.op, type_of(node.node, types))[0]
+    if isinstance(node, (BinOpNode, LogicOpNode)):
+        left, right = type_of(node.left, types), type_of(node.right, types)
+        if node.op == "**" and left == INT and isinstance(node.right, NumberNode) \
+                and type(node.right.value) is int and node.right.value >= 0:
+            return INT
+        return binary_type(node.op, left, right)[0]
+    if isinstance(node, SpecialOpNode) and node.op == "??":
+        # a value of a known type is never None
+        left = type_of(node.left, types)
+        return left if left in BUILTIN_TYPES or left == PENDING else None
+    if isinstance(node, IndexNode):
+        collection, index = type_of(node.collection, types), type_of(node.index, types)
+        if PENDING in (collection, index):
+            return PENDING
+        return STR if collection == STR and index in (INT, BOOL) else None
+    if isinstance(node, CallNode) and isinstance(node.func_name, VarNode):
+        callee = types.get(node.func_name.name)
+        if isinstance(callee, ClassNode):
+            return callee.name
+        return PENDING if callee == PENDING else None
+    return None
+
+
+# {name: type} for the names of a scope that are always bound to values of
+# one type, and for the names of outer scopes it reads. statements is the
+# scope's body; functions, parallel for bodies and the tasks of async
+# blocks are scopes of their own. Parameters have no type.
+def scope_types(statements, params=(), outer=None):
+    bindings = {}
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, AssignNode):
+            bindings.setdefault(node.name, []).append(("=", node.value))
+        elif isinstance(node, CompoundAssignNode):
+            bindings.setdefault(node.name, []).append((node.op[:-1], node.value))
+        elif isinstance(node, ForNode):
+            bindings.setdefault(node.var_name, []).append(("for", node.iterable))
+        elif isinstance(node, (FuncNode, ClassNode)):
+            bindings.setdefault(node.name, []).append(("def", node))
+            continue
+        elif isinstance(node, ParallelForNode):
+            stack.extend(part for part in (node.iterable, node.workers) if part is not None)
+            continue
+        elif isinstance(node, AsyncBlockNode):
+            # only a `let` directly in the block binds in this scope
+            for task in node.statements:
+                if isinstance(task, AssignNode):
+                    bindings.setdefault(task.name, []).append(("=", task.value))
+            continue
+        elif isinstance(node, ImportNode):
+            bindings.setdefault(node.name.value, []).append((None, None))
+        stack.extend(iter_child_nodes(node))
+
+    types = {name: type_ for name, type_ in (outer or {}).items() if name not in bindings and name not in params}
+    types.update((name, PENDING) for name in bindings if name not in params)
+    # every name starts with no type and takes the type of its bindings,
+    # until a binding of another type leaves it with none
+    changed = True
+    while changed:
+        changed = False
+        for name in bindings:
+            if name in params or types.get(name) is None:
+                continue
+            type_ = PENDING
+            for op, value in bindings[name]:
+                if op is None:
+                    new = None
+                elif op == "def":
+                    new = value
+                elif op == "for":
+                    new = INT if isinstance(value, RangeNode) else STR if type_of(value, types) == STR else None
+                elif op == "=":
+                    new = type_of(value, types)
+                else:
+                    new = compound_type(op, types[name], type_of(value, types))[0]
+                if new != PENDING:
+                    type_ = new if type_ in (PENDING, new) else None
+                if type_ is None:
+                    break
+            if type_ != types[name]:
+                types[name] = type_
+                changed = True
+    return {name: type_ for name, type_ in types.items() if type_ is not None and type_ != PENDING}
+
+
+# (type, error) of name op= value. A list extends itself in place with any
+# iterable, which binary + would not allow.
+def compound_type(op, left, right):
+    if left == LIST and op == "+":
+        return LIST, None
+    return binary_type(op, left, right)
+
+
+# The message of the TypeError node's own operation raises whatever values
+# its operands have, or None
+def operation_error(node, types):
+    if isinstance(node, (BinOpNode, LogicOpNode)):
+        return binary_type(node.op, type_of(node.left, types), type_of(node.right, types))[1]
+    if isinstance(node, UnaryOpNode):
+        return unary_type(node.op, type_of(node.node, types))[1]
+    if isinstance(node, CompoundAssignNode):
+        return compound_type(node.op[:-1], types.get(node.name), type_of(node.value, types))[1]
+    if isinstance(node, CastNode):
+        value = type_of(node.value, types)
+        if node.cast_type in CASTS and value in BUILTIN_TYPES:
+            return _apply(CASTS[node.cast_type], value)[1]
+    elif isinstance(node, LenNode):
+        value = type_of(node.value, types)
+        if value in BUILTIN_TYPES:
+            return _apply(len, value)[1]
+    elif isinstance(node, IndexNode):
+        return _item_error(operator.getitem, node, types)
+    elif isinstance(node, IndexAssignNode):
+        return _item_error(lambda collection, index: operator.setitem(collection, index, 0), node, types)
+    elif isinstance(node, (ForNode, ParallelForNode)):
+        iterable = type_of(node.iterable, types)
+        if iterable in BUILTIN_TYPES:
+            return _apply(iter, iterable)[1]
+    elif isinstance(node, CallNode) and isinstance(node.func_name, VarNode):
+        return _call_error(node, types.get(node.func_name.name))
+    return None
+
+
+def _item_error(fn, node, types):
+    collection, index = type_of(node.collection, types), type_of(node.index, types)
+    if collection in BUILTIN_TYPES and index in BUILTIN_TYPES:
+        return _apply(fn, collection, index)[1]
+    return None
+
+
+def _call_error(node, callee):
+    if callee in BUILTIN_TYPES:
+        return f"'{callee}' object is not callable"
+    if isinstance(callee, FuncNode):
+        expected = len(callee.params or ())
+    elif isinstance(callee, StructNode) and callee.columns:
+        # the constructor of runtime.Columns takes an optional size
+        if len(node.arg or ()) > 1:
+            return f"{callee.name}() takes at most 1 argument, got {len(node.arg)}"
+        return None
+    elif isinstance(callee, ClassNode) and not callee.methods:
+        # the __init__ codegen writes takes one argument per field
+        expected = len(callee.fields)
+    else:
+        return None
+    if len(node.arg or ()) != expected:
+        return f"{node.func_name.name}() takes {expected} arguments, got {len(node.arg or ())}"
+    return None
+
+
+# The operations of a program that raise TypeError whenever they run, as
+# sorted (line, col, message)
+def type_errors(program):
+    errors = []
+    _check_scope(program.statements, (), None, errors)
+    return sorted(set(errors), key=lambda error: (error[0] or 0, error[1] or 0, error[2]))
+
+
+def _check_scope(statements, params, outer, errors):
+    types = scope_types(statements, params, outer)
+    for stmt in statements:
+        _check(stmt, types, getattr(stmt, "line", None), getattr(stmt, "col", None), errors)
+
+
+def _check(node, types, line, col, errors):
+    if getattr(node, "line", None) is not None:
+        line, col = node.line, node.col
+    message = operation_error(node, types)
+    if message is not None:
+        errors.append((line, col, message))
+    if isinstance(node, FuncNode):
+        _check_scope(node.body.statements, node.params or (), types, errors)
+        return
+    if isinstance(node, ClassNode):
+        for method in node.methods.values():
+            _check(method, types, line, col, errors)
+        return
+    if isinstance(node, ParallelForNode):
+        for part in (node.iterable, node.workers):
+            if part is not None:
+                _check(part, types, line, col, errors)
+        _check_scope(node.body.statements, (node.var_name,), types, errors)
+        return
+    if isinstance(node, AsyncBlockNode):
+        for task in node.statements:
+            if isinstance(task, AssignNode):
+                _check(task.value, types, line, col, errors)
+            else:
+                _check_scope([task], (), types, errors)
+        return
+    for child in iter_child_nodes(node):
+        _check(child, types, line, col, errors)
@@ -1,136 +1,409 @@
-from math import e
 from classes import *
 
+# Origin operators spelled differently in Python
+PYTHON_OPERATORS = {"===": "==", "!==": "!=", "<>": "!=", "&&": "and", "||": "or"}
+
+INDENT = "    "
+
+
+# Python source generator. Statements are written line by line into one
+# shared buffer at the current indent level, and expressions are returned as
+# strings; both are looked up by node type in the tables at the bottom of the
+# class, so each node is visited once and no generated text is re-split.
+# Next to each line it records the Origin line it came from; after generate,
+# source_map[n - 1] is the Origin line of generated line n (or None).
 class Interpreter:
     def __init__(self):
         self.global_classes = set()
+        self.parallel_count = 0
+        self.task_count = 0
+        self.pipeline_count = 0
+        self.vector_count = 0
+        self.lines = []
+        self.origins = []
+        self.origin = None
+        self.indent = ""
+        self.source_map = []
 
     def generate(self, node):
-        if isinstance(node, ProgramNode):
-            return "\n".join(self.generate(stmt) for stmt in node.statements)
-
-        elif isinstance(node, BlockNode):
-            return "\n".join(self.generate(stmt) for stmt in node.statements)
-        
-        elif isinstance(node, FuncNode):
-            if hasattr(node, "params") and node.params:
-                params_code = ", ".join(node.params)
-                code = f"def {node.name}({params_code}):\n"
-            else:
-                code = f"def {node.name}():\n"
-
-            body = self.indent_block(self.generate(node.body))
-            code += body
-            return code
-        
-        elif isinstance(node, CallNode):
-            args_code = ", ".join(self.generate(a) for a in node.arg) if node.arg else ""
-            if isinstance(node.func_name, VarNode):
-                if node.func_name.name in self.global_classes:  # you can define self.global_classes = set of class names
-                    return f"{node.func_name.name}({args_code})"
-
-            return f"{self.generate(node.func_name)}({args_code})"
-
-            
-        elif isinstance(node, AssignNode):
-            return f"{node.name} = {self.generate(node.value)}"
-        elif isinstance(node, IndexAssignNode):
-            collection = self.generate(node.collection)
-            index = self.generate(node.index)
-            value = self.generate(node.value)
-            return f"{collection}[{index}] = {value}"
-
-        elif isinstance(node, PrintNode):
-            return f"print({self.generate(node.expr)})"
-
-        elif isinstance(node, NumberNode):
-            return str(node.value)
-
-        elif isinstance(node, StringNode):
-            return repr(node.value)
-        
-                
-        elif isinstance(node, VarNode):
-            return node.name
-
-        elif isinstance(node, ClassNode):
-            code = f"class {node.name}:\n"
-            self.global_classes.add(node.name)
-            # fields: create in __init__ if not already defined
-            init_node = node.methods.get("init", None)
-            if init_node is None and node.fields:
-                # create default __init__ if none
-                params_code = ", ".join(node.fields)
-                init_code = f"def __init__(self, {params_code}):\n"
-                for field in node.fields:
-                    init_code += f"    self.{field} = {field}\n"
-                code += self.indent_block(init_code)
-            else:
-                # include existing methods including init
-                for method in node.methods.values():
-                    method_code = self.generate(method)
-                    code += self.indent_block(method_code)
+        emit = self.STATEMENTS.get(type(node))
+        if emit is None:
+            return self.expr(node)
+        saved = self.lines, self.origins, self.origin, self.indent
+        self.lines, self.origins, self.origin, self.indent = [], [], None, ""
+        try:
+            emit(self, node)
+            self.source_map = self.origins
+            return "\n".join(self.lines)
+        finally:
+            self.lines, self.origins, self.origin, self.indent = saved
+
+    # Python source for each top-level statement, as soon as it is parsed
+    def generate_stream(self, statements):
+        for stmt in statements:
+            yield self.generate(stmt)
+
+    def write(self, line):
+        self.lines.append(self.indent + line)
+        self.origins.append(self.origin)
 
-            return code
+    def statement(self, node):
+        line = getattr(node, "line", None)
+        if line is not None:
+            self.origin = line
+        emit = self.STATEMENTS.get(type(node))
+        if emit is None:
+            self.write(self.expr(node))
+        else:
+            emit(self, node)
+
+    def block(self, node):
+        outer = self.indent
+        self.indent = outer + INDENT
+        count = len(self.lines)
+        for stmt in node.statements:
+            self.statement(stmt)
+        if len(self.lines) == count:
+            self.write("pass")
+        self.indent = outer
+
+    def expr(self, node):
+        try:
+            emit = self.EXPRESSIONS[type(node)]
+        except KeyError:
+            raise RuntimeError(f"Unknown node type: {node}") from None
+        return emit(self, node)
+
+    # Statements
 
-        elif isinstance(node, ListNode):
-            return f"[{', '.join(self.generate(el) for el in node.elements)}]"
-        elif isinstance(node, BinOpNode):
-            return f"({self.generate(node.left)} {node.op} {self.generate(node.right)})"
+    def _emit_statements(self, node):
+        for stmt in node.statements:
+            self.statement(stmt)
 
-        elif isinstance(node, UnaryOpNode):
-            return f"({node.op}{self.generate(node.node)})"
+    def _emit_func(self, node):
+        self.write(f"def {node.name}({', '.join(node.params or ())}):")
+        self.block(node.body)
 
-        elif isinstance(node, InputNode):
-            if node.prompt:
-                return f"input({self.generate(node.prompt)})"
+    def _emit_async_func(self, node):
+        self.write(f"async def {node.name}({', '.join(node.params or ())}):")
+        self.block(node.body)
+
+    # Each statement becomes a coroutine function, and all of them are
+    # awaited together; a `let` task returns its value, which is assigned
+    # once every task has finished
+    def _emit_async_block(self, node):
+        targets = []
+        calls = []
+        for stmt in node.statements:
+            name = f"_origin_task{self.task_count}"
+            self.task_count += 1
+            self.origin = getattr(stmt, "line", self.origin)
+            self.write(f"async def {name}():")
+            if isinstance(stmt, AssignNode):
+                value = ReturnNode(stmt.value)
+                value.line = getattr(stmt, "line", None)
+                self.block(BlockNode([value]))
+                targets.append(stmt.name)
             else:
-                return "input()"
-        
-        elif isinstance(node, IfNode):
-            code = f"if {self.generate(node.condition)}:\n"
-            code += self.indent_block(self.generate(node.then_body))
-
-            for elif_node in node.elif_nodes:
-                code += "\nelif " + self.generate(elif_node.condition) + ":\n"
-                code += self.indent_block(self.generate(elif_node.then_body))
-
-            
-            if node.else_body:
-                code += "\nelse:\n"
-                code += self.indent_block(self.generate(node.else_body))
-
-            return code
-        
-        elif isinstance(node, LenNode):
-            value = self.generate(node.value)
-            return f"len({value})"
-        elif isinstance(node, WhileNode):
-            code = f"while {self.generate(node.condition)}:\n"
-            body = self.indent_block(self.generate(node.body))
-            code += body
-            return code
-        elif isinstance(node, IndexNode):
-            return f"{self.generate(node.collection)}[{self.generate(node.index)}]"
-        elif isinstance(node, RangeNode):
-            return f"range({self.generate(node.start)}, {self.generate(node.end)})"
-        elif isinstance(node, ForNode):
-            code = f"for {node.var_name} in {self.generate(node.iterable)}:\n"
-            body = self.indent_block(self.generate(node.body))
-            code += body
-            return code
-        elif isinstance(node, CastNode):
-            return f"{node.cast_type}({self.generate(node.value)})"
-        
-        elif isinstance(node, ImportNode):
-            return f"import {node.name.value}"
-    
-        elif isinstance(node, BoolNode):
-            return "True" if node.value else "False"
+                self.block(BlockNode([stmt]))
+                targets.append("_origin_tmp")
+            calls.append(f"{name}()")
+        self.write("from runtime import run_concurrently as _origin_concurrently")
+        call = f"await _origin_concurrently({', '.join(calls)})"
+        if any(target != "_origin_tmp" for target in targets):
+            self.write(f"{', '.join(targets)}{',' if len(targets) == 1 else ''} = {call}")
+        else:
+            self.write(call)
+
+    def _emit_assign(self, node):
+        self.write(f"{node.name} = {self.expr(node.value)}")
+
+    def _emit_compound_assign(self, node):
+        self.write(f"{node.name} {node.op} {self.expr(node.value)}")
+
+    def _emit_index_assign(self, node):
+        self.write(f"{self.expr(node.collection)}[{self.expr(node.index)}] = {self.expr(node.value)}")
+
+    def _emit_attr_assign(self, node):
+        self.write(f"{self.expr(node.target)}.{node.name} = {self.expr(node.value)}")
+
+    def _emit_print(self, node):
+        self.write(f"print({self.expr(node.expr)})")
+
+    def _emit_class(self, node):
+        self.write(f"class {node.name}:")
+        self.global_classes.add(node.name)
+        outer = self.indent
+        self.indent = outer + INDENT
+        # fields: create in __init__ if not already defined
+        init_node = node.methods.get("init", None)
+        if init_node is None and node.fields:
+            self.write(f"def __init__(self, {', '.join(node.fields)}):")
+            for field in node.fields:
+                self.write(f"{INDENT}self.{field} = {field}")
+        elif node.methods:
+            for method in node.methods.values():
+                self.statement(method)
+        else:
+            self.write("pass")
+        self.indent = outer
+
+    # A struct is a class with one slot per field on top of runtime.Struct,
+    # or runtime.Columns with `as columns`, whose constructor takes a size
+    def _emit_struct(self, node):
+        base = "Columns" if node.columns else "Struct"
+        self.write(f"from runtime import {base} as _origin_{base}")
+        self.write(f"class {node.name}(_origin_{base}):")
+        self.global_classes.add(node.name)
+        outer = self.indent
+        self.indent = outer + INDENT
+        self.write(f"__slots__ = {tuple(node.fields)!r}")
+        if not node.columns:
+            self.write(f"def __init__({', '.join(['self'] + node.fields)}):")
+            for field in node.fields:
+                self.write(f"{INDENT}self.{field} = {field}")
+            if not node.fields:
+                self.write(f"{INDENT}pass")
+        self.indent = outer
+
+    def _emit_if(self, node):
+        # every condition is generated before the first line is written, so
+        # a parallel for in an elif writes its body function above the if
+        test = self.expr(node.condition)
+        elif_tests = [self.expr(elif_node.condition) for elif_node in node.elif_nodes]
+        self.write(f"if {test}:")
+        self.block(node.then_body)
+        for elif_node, elif_test in zip(node.elif_nodes, elif_tests):
+            self.origin = getattr(elif_node.condition, "line", self.origin)
+            self.write(f"elif {elif_test}:")
+            self.block(elif_node.then_body)
+        if node.else_body:
+            self.write("else:")
+            self.block(node.else_body)
+
+    def _emit_while(self, node):
+        self.write(f"while {self.expr(node.condition)}:")
+        self.block(node.body)
+
+    def _emit_for(self, node):
+        self.write(f"for {node.var_name} in {self.expr(node.iterable)}:")
+        self.block(node.body)
+
+    # The range is evaluated once; runtime.vectorized runs the whole loop on
+    # NumPy arrays when it can, leaving the loop variable where the loop
+    # would, and the loop runs as written when it cannot
+    def _emit_vector_loop(self, node):
+        loop = node.loop
+        start = f"_origin_start{self.vector_count}"
+        stop = f"_origin_stop{self.vector_count}"
+        self.vector_count += 1
+        self.write("from runtime import vectorized as _origin_vectorized")
+        self.write(f"{start}, {stop} = {self.expr(loop.iterable.start)}, {self.expr(loop.iterable.end)}")
+        values = ", ".join(node.names)
+        self.write(f"if _origin_vectorized({node.spec!r}, {start}, {stop}, lambda: ({values},)):")
+        self.write(f"{INDENT}{loop.var_name} = {stop} - 1")
+        self.write("else:")
+        outer = self.indent
+        self.indent = outer + INDENT
+        self.write(f"for {loop.var_name} in range({start}, {stop}):")
+        self.block(loop.body)
+        self.indent = outer
+
+    def _emit_import(self, node):
+        self.write(f"import {node.name.value}")
+
+    def _emit_return(self, node):
+        if node.value is None:
+            self.write("return")
         else:
-            raise RuntimeError(f"Unknown node type: {node}")
+            self.write(f"return {self.expr(node.value)}")
+
+    # A function with a yield anywhere in it is a generator, which runs
+    # lazily as its caller iterates over it
+    def _emit_yield(self, node):
+        if node.value is None:
+            self.write("yield")
+        else:
+            self.write(f"yield {self.expr(node.value)}")
+
+    def _emit_break(self, node):
+        self.write("break")
+
+    def _emit_continue(self, node):
+        self.write("continue")
+
+    # Expressions
+
+    def _expr_call(self, node):
+        args_code = ", ".join(self.expr(a) for a in node.arg) if node.arg else ""
+        return f"{self.expr(node.func_name)}({args_code})"
+
+    def _expr_number(self, node):
+        text = str(node.value)
+        # keeps a folded -5 from turning `-5 ** x` into -(5 ** x)
+        return f"({text})" if text.startswith("-") else text
+
+    def _expr_string(self, node):
+        return repr(node.value)
+
+    def _expr_var(self, node):
+        return node.name
+
+    def _expr_list(self, node):
+        return f"[{', '.join(self.expr(el) for el in node.elements)}]"
+
+    def _expr_binop(self, node):
+        op = PYTHON_OPERATORS.get(node.op, node.op)
+        return f"({self.expr(node.left)} {op} {self.expr(node.right)})"
+
+    def _expr_not(self, node):
+        return f"(not {self.expr(node.expr)})"
+
+    def _expr_special(self, node):
+        if node.op == "??":
+            left = self.expr(node.left)
+            return f"(_origin_tmp if (_origin_tmp := {left}) is not None else {self.expr(node.right)})"
+        raise RuntimeError(f"Unsupported operator {node.op!r}")
+
+    def _expr_unary(self, node):
+        return f"({node.op}{self.expr(node.node)})"
+
+    def _expr_input(self, node):
+        if node.prompt:
+            return f"input({self.expr(node.prompt)})"
+        return "input()"
+
+    def _expr_len(self, node):
+        return f"len({self.expr(node.value)})"
+
+    def _expr_index(self, node):
+        return f"{self.expr(node.collection)}[{self.expr(node.index)}]"
+
+    def _expr_attr(self, node):
+        return f"{self.expr(node.value)}.{node.name}"
+
+    def _expr_range(self, node):
+        return f"range({self.expr(node.start)}, {self.expr(node.end)})"
+
+    def _expr_cast(self, node):
+        return f"{node.cast_type}({self.expr(node.value)})"
+
+    def _expr_bool(self, node):
+        return "True" if node.value else "False"
+
+    def _expr_await(self, node):
+        return f"(await {self.expr(node.value)})"
+
+    # The body becomes a function of the loop variable, written out just
+    # before the statement the loop is part of
+    def _expr_parallel(self, node):
+        name = f"_origin_parallel{self.parallel_count}"
+        self.parallel_count += 1
+        self.write("from runtime import parallel_for as _origin_parallel_for")
+        self.write(f"def {name}({node.var_name}):")
+        self.block(node.body)
+        workers = self.expr(node.workers) if node.workers is not None else "None"
+        return f"_origin_parallel_for({name}, {self.expr(node.iterable)}, {workers}, {node.threads}, {node.reduce!r})"
+
+    # Runs of built-in stages are fused into one generator function each,
+    # written out before the statement, ending at a take; any other stage
+    # is called with the value so far as first argument
+    def _expr_pipeline(self, node):
+        value = self.expr(node.source)
+        fused = []
+        for stage in node.stages:
+            if isinstance(stage, StageNode):
+                fused.append(stage)
+                if stage.kind == "take":
+                    value = self._fuse(value, fused)
+                    fused = []
+                continue
+            if fused:
+                value = self._fuse(value, fused)
+                fused = []
+            if isinstance(stage, CallNode):
+                args = "".join(f", {self.expr(arg)}" for arg in stage.arg)
+                value = f"{self.expr(stage.func_name)}({value}{args})"
+            else:
+                value = f"{self.expr(stage)}({value})"
+        if fused:
+            value = self._fuse(value, fused)
+        return value
+
+    # One generator over items for map and filter stages, optionally ending
+    # in a take, which stops pulling items once it has passed on enough
+    def _fuse(self, items, stages):
+        name = f"_origin_pipeline{self.pipeline_count}"
+        self.pipeline_count += 1
+        params = [f"stage{i}" for i in range(len(stages))]
+        self.write(f"def {name}(items, {', '.join(params)}):")
+        outer = self.indent
+        self.indent = outer + INDENT
+        limit = params[-1] if stages[-1].kind == "take" else None
+        if limit is not None:
+            self.write(f"if {limit} <= 0:")
+            self.write(f"{INDENT}return")
+            self.write("taken = 0")
+        self.write("for item in items:")
+        self.indent += INDENT
+        for stage, param in zip(stages, params):
+            if stage.kind == "map":
+                self.write(f"item = {param}(item)")
+            elif stage.kind == "filter":
+                self.write(f"if not {param}(item):")
+                self.write(f"{INDENT}continue")
+        self.write("yield item")
+        if limit is not None:
+            self.write("taken += 1")
+            self.write(f"if taken >= {limit}:")
+            self.write(f"{INDENT}return")
+        self.indent = outer
+        args = ", ".join(self.expr(stage.arg) for stage in stages)
+        return f"{name}({items}, {args})"
+
+    STATEMENTS = {
+        ProgramNode: _emit_statements,
+        BlockNode: _emit_statements,
+        FuncNode: _emit_func,
+        AsyncFuncNode: _emit_async_func,
+        AsyncBlockNode: _emit_async_block,
+        AssignNode: _emit_assign,
+        CompoundAssignNode: _emit_compound_assign,
+        IndexAssignNode: _emit_index_assign,
+        AttrAssignNode: _emit_attr_assign,
+        PrintNode: _emit_print,
+        ClassNode: _emit_class,
+        StructNode: _emit_struct,
+        IfNode: _emit_if,
+        WhileNode: _emit_while,
+        ForNode: _emit_for,
+        VectorLoopNode: _emit_vector_loop,
+        ImportNode: _emit_import,
+        ReturnNode: _emit_return,
+        YieldNode: _emit_yield,
+        BreakNode: _emit_break,
+        ContinueNode: _emit_continue,
+    }
 
-    @staticmethod
-    def indent_block(code, indent=4):
-        spaces = " " * indent
-        return "\n".join(spaces + line if line.strip() else line for line in code.split("\n"))
+    EXPRESSIONS = {
+        CallNode: _expr_call,
+        NumberNode: _expr_number,
+        StringNode: _expr_string,
+        VarNode: _expr_var,
+        ListNode: _expr_list,
+        BinOpNode: _expr_binop,
+        LogicOpNode: _expr_binop,
+        NotNode: _expr_not,
+        SpecialOpNode: _expr_special,
+        UnaryOpNode: _expr_unary,
+        InputNode: _expr_input,
+        LenNode: _expr_len,
+        IndexNode: _expr_index,
+        AttrNode: _expr_attr,
+        RangeNode: _expr_range,
+        CastNode: _expr_cast,
+        BoolNode: _expr_bool,
+        ParallelForNode: _expr_parallel,
+        AwaitNode: _expr_await,
+        PipelineNode: _expr_pipeline,
+    }
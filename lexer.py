@@ -1,4 +1,15 @@
 import re
+from array import array
+
+KEYWORDS_LIST = (
+    "fn", "if", "elif", "else", "for", "while", "return", "int", "len", "str", "float",
+    "let", "const", "in", "print", "true", "false", "break", "input", "continue", "def",
+    "import", "from", "class", "try", "except", "raise", "pass", "yield", "with", "as",
+    "del", "assert", "global", "nonlocal", "async", "await", "match", "case", "macro",
+    "inline", "parallel", "when", "range", "unless", "loop", "until", "do", "struct",
+    "enum", "type", "interface", "pub", "priv",
+)
+KEYWORDS = frozenset(KEYWORDS_LIST)
 
 # Regex of tokens(like dictionary)
 TOKEN_REGEX = [
@@ -17,12 +28,30 @@ TOKEN_REGEX = [
     (r"\+|\-|\*\*|\*|\/\/|\/|\%|\&|\||\^|<<|>>", "ARITH"),
     (r"\[|\]|\{|\}",         "BRACKET"),
     (r"\(|\)|:|,|\.|;|\?",   "SYMBOL"),
-    (r"\b(fn|if|elif|else|for|while|return|int|len|str|float|let|const|in|print|true|false|break|input|continue|def|import|from|class|try|except|raise|pass|yield|with|as|del|assert|global|nonlocal|async|await|match|case|macro|inline|parallel|when|range|unless|loop|until|do|struct|enum|type|interface|pub|priv)\b", "KEYWORD"),
+    (r"\b(" + "|".join(KEYWORDS_LIST) + r")\b", "KEYWORD"),
     (r"[A-Za-z_][A-Za-z0-9_]*", "IDENT"),
 ]
 # Reduces redundancy and time efficiency of the regex
 TOKEN_REGEX_COMPILED = [(re.compile(r), t) for r, t in TOKEN_REGEX]
 
+# Every token pattern folded into one alternation, tried in the same order as
+# TOKEN_REGEX. Keywords are not part of it: they are IDENT matches found in
+# KEYWORDS. The trailing ERROR group matches any character left over so that
+# finditer never skips input.
+MASTER_PATTERNS = [(f"T{i}", r, t) for i, (r, t) in enumerate(TOKEN_REGEX) if t != "KEYWORD"]
+MASTER_REGEX = re.compile(
+    "|".join(f"(?P<{name}>{r})" for name, r, _ in MASTER_PATTERNS) + r"|(?P<ERROR>[\s\S])"
+)
+GROUP_TYPES = {name: t for name, _, t in MASTER_PATTERNS}
+GROUP_TYPES["ERROR"] = "ERROR"
+
+# Integer ids for TokenBuffer's type column
+TOKEN_TYPES = ("NEWLINE", "FLOAT", "INT", "STRING", "COMP", "LOGIC", "UNARY", "ASSIGN_OP",
+               "SPECIAL", "ASSIGN", "ARITH", "BRACKET", "SYMBOL", "KEYWORD", "IDENT", "EOF")
+TOKEN_TYPE_IDS = {t: i for i, t in enumerate(TOKEN_TYPES)}
+# Values of the tokens lex adds itself; they have no text in the source
+SYNTHETIC_VALUES = {TOKEN_TYPE_IDS["NEWLINE"]: "\\n", TOKEN_TYPE_IDS["EOF"]: ""}
+
 # Token class
 class Token:
     def __init__(self, type_, value, line, col):
@@ -34,6 +63,47 @@ class Token:
         return f"Token({self.type}, {self.value!r}, {self.line}:{self.col})"
 
 def lex(code_lines):
+    tokens = []
+    extend = tokens.extend
+    line_num = 1
+    for line in code_lines:
+        extend(lex_line(line, line_num))
+        line_num += 1
+    tokens.append(Token("EOF", "", line_num, 0))
+    return tokens
+
+# Tokens of a single line, ending with its NEWLINE token
+def lex_line(line, line_num):
+    tokens = []
+    append = tokens.append
+    group_types = GROUP_TYPES
+    for match in MASTER_REGEX.finditer(line):
+        t = group_types[match.lastgroup]
+        if t is not None:
+            col = match.start()
+            text = match.group()
+            if t == "IDENT":
+                # \b(...)\b only matched when the previous char was not a word char
+                if text in KEYWORDS and not (col and (line[col - 1].isalnum() or line[col - 1] == "_")):
+                    t = "KEYWORD"
+            elif t == "ERROR":
+                raise SyntaxError(f"Illegal Character {text!r} at {line_num}:{col}")
+            append(Token(t, text, line_num, col))
+    append(Token("NEWLINE", "\\n", line_num, len(line)))
+    return tokens
+
+# Same scanner as lex, as a generator over a file object (or any iterable of
+# lines). Line endings are stripped, so tokens are only built one line at a time.
+def lex_stream(file):
+    line_num = 1
+    for line in file:
+        yield from lex_line(line.rstrip("\r\n"), line_num)
+        line_num += 1
+    yield Token("EOF", "", line_num, 0)
+
+# Original scanner, one regex per token type at every column. Kept as the
+# reference implementation for benchmarks/bench_lexer.py.
+def lex_sequential(code_lines):
     tokens = []
     line_num = 1
     for line in code_lines:
@@ -56,3 +126,126 @@ def lex(code_lines):
     tokens.append(Token("EOF", "", line_num, 0))
     return tokens
 
+
+
+# Compact token list: one int per field in parallel arrays, with values sliced
+# out of the source only when a token is asked for. Indexing returns a Token,
+# so Parser works the same on a TokenBuffer or a list of Tokens.
+class TokenBuffer:
+    def __init__(self, source, line_starts):
+        self.source = source
+        self.line_starts = line_starts
+        self.types = array("i")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.lines = array("i")
+        self._last_index = -1
+        self._last_token = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if index == self._last_index:
+            return self._last_token
+        if index < 0:
+            index += len(self.types)
+        line = self.lines[index]
+        tok = Token(TOKEN_TYPES[self.types[index]], self.text_at(index), line,
+                    self.starts[index] - self.line_starts[line - 1])
+        self._last_index = index
+        self._last_token = tok
+        return tok
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
+
+    def type_at(self, index):
+        return TOKEN_TYPES[self.types[index]]
+
+    def text_at(self, index):
+        start = self.starts[index]
+        end = self.ends[index]
+        if start == end:
+            return SYNTHETIC_VALUES[self.types[index]]
+        return self.source[start:end]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.types, self.starts, self.ends, self.lines, self.line_starts))
+
+    def __repr__(self):
+        return f"TokenBuffer({len(self.types)} tokens)"
+
+def lex_buffer(code_lines):
+    code_lines = list(code_lines)
+    source = "".join(code_lines)
+    line_starts = array("i")
+    buf = TokenBuffer(source, line_starts)
+    types, starts, ends, lines = buf.types, buf.starts, buf.ends, buf.lines
+    finditer = MASTER_REGEX.finditer
+    type_ids = {name: TOKEN_TYPE_IDS.get(t, -1) if t is not None else None for name, t in GROUP_TYPES.items()}
+    ident_id = TOKEN_TYPE_IDS["IDENT"]
+    keyword_id = TOKEN_TYPE_IDS["KEYWORD"]
+    newline_id = TOKEN_TYPE_IDS["NEWLINE"]
+    keywords = KEYWORDS
+    offset = 0
+    line_num = 1
+    for line in code_lines:
+        line_starts.append(offset)
+        end = offset + len(line)
+        for match in finditer(source, offset, end):
+            t = type_ids[match.lastgroup]
+            if t is None:
+                continue
+            start, stop = match.span()
+            if t == ident_id:
+                if source[start:stop] in keywords and not (start > offset and (source[start - 1].isalnum() or source[start - 1] == "_")):
+                    t = keyword_id
+            elif t == -1:
+                raise SyntaxError(f"Illegal Character {source[start]!r} at {line_num}:{start - offset}")
+            types.append(t)
+            starts.append(start)
+            ends.append(stop)
+            lines.append(line_num)
+        types.append(newline_id)
+        starts.append(end)
+        ends.append(end)
+        lines.append(line_num)
+        offset = end
+        line_num += 1
+    line_starts.append(offset)
+    types.append(TOKEN_TYPE_IDS["EOF"])
+    starts.append(offset)
+    ends.append(offset)
+    lines.append(line_num)
+    return buf
+
+
+# Window over a token generator for streaming parses. Tokens are pulled on
+# demand and indexed by their absolute position; release() drops everything
+# before a position once the parser can no longer rewind to it.
+class TokenStream:
+    def __init__(self, tokens):
+        self._source = iter(tokens)
+        self._window = []
+        self._base = 0
+
+    def __getitem__(self, index):
+        offset = index - self._base
+        window = self._window
+        while offset >= len(window):
+            try:
+                window.append(next(self._source))
+            except StopIteration:
+                raise IndexError(index) from None
+        if offset < 0:
+            raise IndexError(f"token {index} was already released")
+        return window[offset]
+
+    def release(self, index):
+        del self._window[:index - self._base]
+        self._base = index
+
+    def __repr__(self):
+        return f"TokenStream({len(self._window)} buffered at {self._base})"
@@ -0,0 +1,326 @@
+from classes import *
+
+# Names a macro binds are renamed to this plus a per-expansion number, so
+# they never clash with names where the macro is used
+MACRO_PREFIX = "_origin_macro"
+# Macros that expand to uses of macros may nest this deep by default
+MAX_DEPTH = 32
+
+# Fields holding names a node binds, rather than child nodes
+NAME_FIELDS = {
+    AssignNode: ("name",),
+    CompoundAssignNode: ("name",),
+    ForNode: ("var_name",),
+    ParallelForNode: ("var_name",),
+    FuncNode: ("name", "params"),
+    AsyncFuncNode: ("name", "params"),
+    ClassNode: ("name",),
+    StructNode: ("name",),
+}
+
+
+# macro name(params) { statements } or macro name(params) = expression.
+# body is the list of statements or the expression, parsed once when the
+# macro is defined.
+class Macro:
+    __slots__ = ("name", "params", "body", "is_expression")
+    def __init__(self, name, params, body, is_expression):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.is_expression = is_expression
+    def __repr__(self):
+        return f"Macro({self.name}, {self.params}, {self.body}, {self.is_expression})"
+
+
+# What expanding a macro needs that does not depend on the arguments
+# themselves, worked out once per macro and argument shape. build makes one
+# expansion from an _Expansion.
+class Plan:
+    __slots__ = ("locals", "yields", "awaits", "build")
+    def __init__(self, locals, yields, awaits, build):
+        self.locals = locals
+        self.yields = yields
+        self.awaits = awaits
+        self.build = build
+
+
+# The macros a parser has seen so far and the expansions it has made.
+# Expanding builds a copy of the template with each parameter replaced by
+# its argument and each name the macro binds renamed, expanding the macro
+# uses in it on the way, up to max_depth levels deep.
+class MacroTable:
+    def __init__(self, max_depth=None):
+        self.macros = {}
+        self.max_depth = MAX_DEPTH if max_depth is None else max_depth
+        # (name, shape) -> Plan; the shape says which arguments are plain names
+        self.plans = {}
+        self.planned = 0
+        self.hits = 0
+        self.expansions = 0
+        self.depth = 0
+        self.deepest = 0
+
+    def get(self, name):
+        return self.macros.get(name)
+
+    def define(self, name, params, body, is_expression):
+        if len(set(params)) != len(params):
+            raise SyntaxError(f"Duplicate parameter in macro {name}")
+        self.macros[name] = Macro(name, params, body, is_expression)
+        # a plan resolves the macro uses in its template, which may now
+        # mean something else
+        self.plans.clear()
+
+    # Statements (a list) or the expression the use name(args) at like's
+    # position expands to. in_async and can_yield say whether the place of
+    # the use allows await and yield.
+    def expand(self, name, args, like, in_async=True, can_yield=True):
+        macro = self.macros[name]
+        if len(args) != len(macro.params):
+            raise SyntaxError(f"Macro {name} takes {len(macro.params)} arguments, got {len(args)}")
+        if self.depth >= self.max_depth:
+            raise SyntaxError(f"Macro {name} is nested more than {self.max_depth} expansions deep; "
+                              f"a macro that uses itself never stops expanding")
+        plan = self._plan(macro, args)
+        if plan.awaits and not in_async:
+            raise SyntaxError(f"Macro {name} awaits, which is not allowed here")
+        if plan.yields and not can_yield:
+            raise SyntaxError(f"Macro {name} yields, which is only allowed in a function body")
+        renamed = {local: f"{MACRO_PREFIX}{self.expansions}_{local}" for local in plan.locals}
+        self.expansions += 1
+        self.depth += 1
+        self.deepest = max(self.deepest, self.depth)
+        try:
+            return plan.build(_Expansion(self, dict(zip(macro.params, args)), renamed, like, in_async, can_yield))
+        finally:
+            self.depth -= 1
+
+    def _plan(self, macro, args):
+        shape = tuple(isinstance(arg, VarNode) for arg in args)
+        plan = self.plans.get((macro.name, shape))
+        if plan is not None:
+            self.hits += 1
+            return plan
+        bound = set()
+        yields = awaits = False
+        body = [macro.body] if macro.is_expression else macro.body
+        for stmt in body:
+            for node in _walk(stmt, bound):
+                yields = yields or isinstance(node, YieldNode)
+                awaits = awaits or isinstance(node, (AwaitNode, AsyncBlockNode))
+        for param, is_name in zip(macro.params, shape):
+            if param in bound and not is_name:
+                raise SyntaxError(f"Macro {macro.name} assigns to {param}, so its argument must be a name")
+        locals = sorted(bound - set(macro.params))
+        builder = _Builder(self, set(macro.params), set(locals))
+        build = builder.node(macro.body) if macro.is_expression else builder.statements(macro.body)
+        plan = Plan(locals, yields, awaits, build)
+        self.planned += 1
+        self.plans[(macro.name, shape)] = plan
+        return plan
+
+    def summary(self):
+        return (f"{len(self.macros)} macros, {self.expansions} expansions, {self.planned} plans built, "
+                f"{self.hits} plan cache hits, deepest {self.deepest}")
+
+
+# Nodes of a template, adding the names they bind to bound. Function bodies
+# are left out: a yield or await there belongs to that function.
+def _walk(node, bound):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        for field in NAME_FIELDS.get(type(node), ()):
+            value = getattr(node, field)
+            if isinstance(value, list):
+                bound.update(value)
+            else:
+                bound.add(value)
+        if isinstance(node, FuncNode):
+            _names(node.body, bound)
+            continue
+        stack.extend(iter_child_nodes(node))
+
+
+def _names(node, bound):
+    for _ in _walk(node, bound):
+        pass
+
+
+# What one expansion substitutes, and where it goes
+class _Expansion:
+    def __init__(self, table, args, renamed, like, in_async, can_yield):
+        self.table = table
+        self.args = args
+        self.renamed = renamed
+        self.line = getattr(like, "line", None)
+        self.col = getattr(like, "col", None)
+        self.in_async = in_async
+        self.can_yield = can_yield
+
+    # The name a binding of name in the template binds after expansion
+    def bind(self, name):
+        if name in self.args:
+            return self.args[name].name
+        return self.renamed.get(name, name)
+
+    def expand(self, name, args):
+        return self.table.expand(name, args, self, self.in_async, self.can_yield)
+
+
+# How a template field is rebuilt for each expansion
+BUILD, LIST, DICT, NAME, NAMES, SCALAR = range(6)
+
+
+# Turns a template into functions that build its expansions, so the
+# template is only looked over once per plan
+class _Builder:
+    def __init__(self, table, params, locals):
+        self.table = table
+        self.params = params
+        self.locals = locals
+
+    def statements(self, statements):
+        parts = []
+        for stmt in statements:
+            macro = self._use(stmt)
+            if macro is not None and not macro.is_expression:
+                parts.append((True, self._expansion(stmt)))
+            else:
+                parts.append((False, self.node(stmt)))
+
+        def build(expansion):
+            result = []
+            for splice, part in parts:
+                if splice:
+                    result.extend(part(expansion))
+                else:
+                    result.append(part(expansion))
+            return result
+        return build
+
+    def node(self, node):
+        cls = type(node)
+        if cls is VarNode:
+            return self._var(node.name)
+        macro = self._use(node)
+        if macro is not None:
+            if not macro.is_expression:
+                raise SyntaxError(f"Macro {macro.name} expands to statements, not a value")
+            return self._expansion(node)
+        names = NAME_FIELDS.get(cls, ())
+        fields = []
+        for field in node_fields(cls):
+            value = getattr(node, field, None)
+            if field in names:
+                fields.append((field, NAMES if isinstance(value, list) else NAME, value))
+            elif isinstance(value, ASTNode):
+                fields.append((field, BUILD, self.node(value)))
+            elif isinstance(value, list):
+                if field == "statements":
+                    fields.append((field, BUILD, self.statements(value)))
+                else:
+                    fields.append((field, LIST, [self._item(item) for item in value]))
+            elif isinstance(value, dict):
+                fields.append((field, DICT, {key: self._item(item) for key, item in value.items()}))
+            else:
+                fields.append((field, SCALAR, value))
+
+        def build(expansion):
+            new = cls.__new__(cls)
+            for field, kind, value in fields:
+                if kind is BUILD:
+                    value = value(expansion)
+                elif kind is LIST:
+                    value = [item(expansion) for item in value]
+                elif kind is DICT:
+                    value = {key: item(expansion) for key, item in value.items()}
+                elif kind is NAME:
+                    value = expansion.bind(value)
+                elif kind is NAMES:
+                    value = [expansion.bind(name) for name in value]
+                setattr(new, field, value)
+            new.line = expansion.line
+            new.col = expansion.col
+            return new
+        return build
+
+    def _var(self, name):
+        if name in self.params:
+            return lambda expansion: _clone(expansion.args[name])
+
+        def build(expansion):
+            new = VarNode(expansion.renamed[name] if name in self.locals else name)
+            new.line = expansion.line
+            new.col = expansion.col
+            return new
+        return build
+
+    def _item(self, item):
+        if isinstance(item, ASTNode):
+            return self.node(item)
+        return lambda expansion: item
+
+    # The macro node uses, if it is a call to one
+    def _use(self, node):
+        if type(node) is CallNode and type(node.func_name) is VarNode:
+            return self.table.get(node.func_name.name)
+        return None
+
+    def _expansion(self, call):
+        name = call.func_name.name
+        args = [self.node(arg) for arg in call.arg]
+        return lambda expansion: expansion.expand(name, [arg(expansion) for arg in args])
+
+
+# A deep copy of an argument; each use of a parameter gets its own
+def _clone(node):
+    cls = type(node)
+    new = cls.__new__(cls)
+    for field in node_fields(cls):
+        value = getattr(node, field, None)
+        if isinstance(value, ASTNode):
+            value = _clone(value)
+        elif isinstance(value, list):
+            value = [_clone(item) if isinstance(item, ASTNode) else item for item in value]
+        elif isinstance(value, dict):
+            value = {key: _clone(item) if isinstance(item, ASTNode) else item for key, item in value.items()}
+        setattr(new, field, value)
+    for name in ("line", "col"):
+        if hasattr(node, name):
+            setattr(new, name, getattr(node, name))
+    return new
+
+
+# The AST under node as indented text, one node per line, for looking at
+# what macros expanded to
+def dump(node, indent=0):
+    lines = []
+    _dump(node, indent, lines)
+    return "\n".join(lines)
+
+
+def _dump(node, indent, lines):
+    cls = type(node)
+    scalars = []
+    children = []
+    for field in node_fields(cls):
+        value = getattr(node, field, None)
+        if isinstance(value, ASTNode):
+            children.append((field, [value]))
+        elif isinstance(value, list) and any(isinstance(item, ASTNode) for item in value):
+            children.append((field, value))
+        elif isinstance(value, dict) and any(isinstance(item, ASTNode) for item in value.values()):
+            children.append((field, list(value.values())))
+        elif value is not None and value != [] and value is not False:
+            scalars.append(f"{field}={value!r}")
+    line = getattr(node, "line", None)
+    position = f"  @{line}" if line is not None else ""
+    lines.append(f"{'  ' * indent}{cls.__name__}({', '.join(scalars)}){position}")
+    for field, items in children:
+        lines.append(f"{'  ' * (indent + 1)}{field}:")
+        for item in items:
+            if isinstance(item, ASTNode):
+                _dump(item, indent + 2, lines)
@@ -0,0 +1,1453 @@
+import copy
+import math
+import operator
+
+from classes import *
+from inference import BUILTIN_TYPES, FLOAT, INT, STR, scope_types, type_of
+from interpreter import PYTHON_OPERATORS
+
+# Python operations behind each Origin operator, after PYTHON_OPERATORS
+FOLDABLE = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+    "//": operator.floordiv, "%": operator.mod, "**": operator.pow,
+    "&": operator.and_, "|": operator.or_, "^": operator.xor, "<<": operator.lshift, ">>": operator.rshift,
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge,
+}
+UNARY = {"-": operator.neg, "+": operator.pos, "--": lambda v: -(-v), "++": lambda v: +(+v)}
+CASTS = {"int": int, "float": float, "str": str}
+# Folded results larger than this stay as runtime arithmetic, so `2 ** 100000`
+# or `"ab" * 10 ** 6` does not bloat the generated code
+MAX_FOLDED_BITS = 256
+MAX_FOLDED_CHARS = 4096
+CONSTANTS = (NumberNode, StringNode, BoolNode)
+# Statements after one of these in the same block never run
+JUMPS = (ReturnNode, BreakNode, ContinueNode)
+# Expressions a loop pass may compute once before the loop: no calls, no
+# input and no fresh lists or ranges
+HOISTABLE = CONSTANTS + (VarNode, BinOpNode, UnaryOpNode, NotNode, LogicOpNode, SpecialOpNode,
+                         LenNode, CastNode, IndexNode)
+INT_OPS = {"+", "-", "*", "//", "%", "&", "|", "^", "<<", ">>"}
+COMPARISONS = {"==", "!=", "<", ">", "<=", ">="}
+# Operators that cannot raise when both operands are ints
+SAFE_INT_OPS = {"+", "-", "*", "&", "|", "^"} | COMPARISONS
+# Prefix for names the optimizer introduces, as codegen's _origin_tmp
+TEMP_PREFIX = "_origin_loop"
+INLINE_PREFIX = "_origin_inline"
+# Largest return expression, in nodes, of a function inlined without being
+# marked `inline def`
+INLINE_MAX_NODES = 16
+# Operators a vectorized loop body may use; runtime.vectorized gives the
+# same result as Python for each, or runs the loop instead
+VECTOR_OPS = {"+", "-", "*", "/", "//", "%"}
+# Nodes that may run other code, which can read any global
+CALLS = (CallNode, InputNode, ImportNode, AwaitNode, PipelineNode)
+# Nodes an inlined function body may not contain: they need a scope,
+# suspend, or evaluate their parts in an order other than field order
+NOT_INLINABLE = (FuncNode, ClassNode, YieldNode, AwaitNode, AsyncBlockNode, ParallelForNode, PipelineNode,
+                 WhileNode, ForNode, IfNode, IndexAssignNode, AttrAssignNode, PrintNode, BreakNode, ContinueNode)
+
+
+def is_constant(node):
+    return isinstance(node, CONSTANTS)
+
+
+def constant_node(value, like):
+    if isinstance(value, bool):
+        node = BoolNode(value)
+    elif isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        if isinstance(value, int) and value.bit_length() > MAX_FOLDED_BITS:
+            return None
+        node = NumberNode(value)
+    elif isinstance(value, str):
+        if len(value) > MAX_FOLDED_CHARS:
+            return None
+        node = StringNode(value)
+    else:
+        return None
+    return copy_position(node, like)
+
+
+def copy_position(node, like):
+    line = getattr(like, "line", None)
+    if line is not None and getattr(node, "line", None) is None:
+        node.line = line
+        node.col = like.col
+    return node
+
+
+# Gives node and everything in it like's position, so errors in code
+# inlined from a function point at the call
+def move_position(node, like):
+    line = getattr(like, "line", None)
+    if line is not None:
+        for child in walk(node):
+            child.line = line
+            child.col = like.col
+    return node
+
+
+# iterable is range(start, end) with int constants for both bounds; a float
+# bound raises TypeError when the range is made, so it never counts as empty
+def constant_range(iterable):
+    return (isinstance(iterable, RangeNode) and isinstance(iterable.start, NumberNode)
+            and isinstance(iterable.end, NumberNode)
+            and type(iterable.start.value) is int and type(iterable.end.value) is int)
+
+
+# Expressions with no side effects that, in a program that runs, cannot
+# raise, so evaluating them can be skipped
+def is_pure(node):
+    if isinstance(node, CONSTANTS) or isinstance(node, VarNode):
+        return True
+    if isinstance(node, ListNode):
+        return all(is_pure(element) for element in node.elements)
+    if isinstance(node, NotNode):
+        return is_pure(node.expr)
+    if isinstance(node, LogicOpNode):
+        return is_pure(node.left) and is_pure(node.right)
+    return False
+
+
+def names_read(node, names=None):
+    if names is None:
+        names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, VarNode):
+            names.add(node.name)
+        elif isinstance(node, CompoundAssignNode):
+            names.add(node.name)
+        stack.extend(iter_child_nodes(node))
+    return names
+
+
+def names_assigned(node, names=None):
+    if names is None:
+        names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (AssignNode, CompoundAssignNode)):
+            names.add(node.name)
+        elif isinstance(node, (ForNode, ParallelForNode)):
+            names.add(node.var_name)
+        elif isinstance(node, (FuncNode, ClassNode)):
+            names.add(node.name)
+        elif isinstance(node, ImportNode):
+            names.add(node.name.value)
+        stack.extend(iter_child_nodes(node))
+    return names
+
+
+# node and everything under it, except the insides of nodes of the stop
+# types
+def walk(node, stop=()):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, stop):
+            stack.extend(iter_child_nodes(node))
+
+
+# Hashable structure of node, for telling equal expressions apart
+def fingerprint(value):
+    if isinstance(value, ASTNode):
+        return (type(value).__name__,) + tuple(fingerprint(getattr(value, name, None))
+                                               for name in node_fields(type(value)))
+    if isinstance(value, list):
+        return tuple(fingerprint(item) for item in value)
+    if isinstance(value, dict):
+        return tuple((key, fingerprint(item)) for key, item in value.items())
+    return repr(value)
+
+
+# The weaker of two value kinds: "int" < "scalar" < None (anything)
+def weaker(a, b):
+    if a is None or b is None:
+        return None
+    return "int" if a == b == "int" else "scalar"
+
+
+def binop_kind(op, left, right):
+    op = PYTHON_OPERATORS.get(op, op)
+    if left is None or right is None:
+        return None
+    if op in COMPARISONS:
+        return "scalar"
+    if op in INT_OPS and left == right == "int":
+        return "int"
+    return "scalar"
+
+
+# "int" when node can only evaluate to an int, "scalar" when to an
+# immutable number, string or bool, None when it could be anything. kinds
+# holds the same for variables.
+def value_kind(node, kinds):
+    if isinstance(node, NumberNode):
+        return "int" if isinstance(node.value, int) else "scalar"
+    if isinstance(node, (StringNode, BoolNode, NotNode, InputNode)):
+        return "scalar"
+    if isinstance(node, VarNode):
+        return kinds.get(node.name)
+    if isinstance(node, LenNode):
+        return "int"
+    if isinstance(node, CastNode):
+        return "int" if node.cast_type == "int" else "scalar"
+    if isinstance(node, UnaryOpNode):
+        return value_kind(node.node, kinds)
+    if isinstance(node, BinOpNode):
+        return binop_kind(node.op, value_kind(node.left, kinds), value_kind(node.right, kinds))
+    if isinstance(node, LogicOpNode) or isinstance(node, SpecialOpNode) and node.op == "??":
+        return weaker(value_kind(node.left, kinds), value_kind(node.right, kinds))
+    return None
+
+
+# {name: kind} for the names a scope only ever binds to ints, or only to
+# immutable scalars. statements is the scope's body; nested functions are
+# scopes of their own. Names in unknown, such as parameters, are left out.
+def value_kinds(statements, unknown=()):
+    bindings = {}
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, AssignNode):
+            bindings.setdefault(node.name, []).append(("=", node.value))
+        elif isinstance(node, CompoundAssignNode):
+            bindings.setdefault(node.name, []).append((node.op[:-1], node.value))
+        elif isinstance(node, ForNode):
+            bindings.setdefault(node.var_name, []).append(("for", node.iterable))
+        elif isinstance(node, (FuncNode, ClassNode)):
+            bindings.setdefault(node.name, []).append((None, None))
+            continue
+        elif isinstance(node, ParallelForNode):
+            # the body is a function of its own
+            stack.extend(part for part in (node.iterable, node.workers) if part is not None)
+            continue
+        elif isinstance(node, ImportNode):
+            bindings.setdefault(node.name.value, []).append((None, None))
+        stack.extend(iter_child_nodes(node))
+
+    # start from "int" everywhere and weaken until nothing changes
+    kinds = {name: "int" for name in bindings if name not in unknown}
+    changed = True
+    while changed:
+        changed = False
+        for name in list(kinds):
+            kind = "int"
+            for op, value in bindings[name]:
+                if op is None:
+                    kind = None
+                elif op == "for":
+                    kind = weaker(kind, "int" if isinstance(value, RangeNode) else None)
+                elif op == "=":
+                    kind = weaker(kind, value_kind(value, kinds))
+                else:
+                    kind = weaker(kind, binop_kind(op, kinds.get(name), value_kind(value, kinds)))
+                if kind is None:
+                    break
+            if kind != kinds[name]:
+                changed = True
+                if kind is None:
+                    del kinds[name]
+                else:
+                    kinds[name] = kind
+    return kinds
+
+
+def contains(node, types):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, types):
+            return True
+        stack.extend(iter_child_nodes(node))
+    return False
+
+
+# Base for passes that rewrite the tree. visit() dispatches to visit_<Class>
+# and falls back to generic_visit, which visits every child and stores the
+# result back. Inside statement lists (visit_statements) a visitor may also
+# return a list of statements to splice in, or None to drop the statement.
+class Transformer:
+    def visit(self, node):
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is None:
+            return self.generic_visit(node)
+        return method(node)
+
+    def generic_visit(self, node):
+        for name in node_fields(type(node)):
+            value = getattr(node, name, None)
+            if isinstance(value, ASTNode):
+                setattr(node, name, self.visit(value))
+            elif isinstance(value, list):
+                setattr(node, name, self.visit_list(value))
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, ASTNode):
+                        value[key] = self.visit(item)
+        return node
+
+    def visit_ProgramNode(self, node):
+        node.statements = self.visit_statements(node.statements)
+        return node
+
+    visit_BlockNode = visit_ProgramNode
+
+    def visit_statements(self, statements):
+        return self.visit_list(statements)
+
+    # Each statement of an async block runs as a task of its own, so one
+    # that a visitor expands into several statements stays a single task
+    def visit_AsyncBlockNode(self, node):
+        tasks = (self.visit_task(stmt) for stmt in node.statements)
+        node.statements = [task for task in tasks if task is not None]
+        return node
+
+    def visit_task(self, stmt):
+        new = self.visit(stmt)
+        if isinstance(new, list):
+            return copy_position(BlockNode(new), stmt)
+        return new
+
+    def visit_list(self, items):
+        result = []
+        for item in items:
+            if not isinstance(item, ASTNode):
+                result.append(item)
+                continue
+            new = self.visit(item)
+            if isinstance(new, list):
+                result.extend(new)
+            elif new is not None:
+                result.append(new)
+        return result
+
+
+# Evaluates operators, casts, len and not on constant operands, and
+# simplifies and/or/?? with a constant left side the way Python would
+# evaluate them. Anything that would raise at runtime is left alone.
+class ConstantFolding(Transformer):
+    def visit_BinOpNode(self, node):
+        self.generic_visit(node)
+        if is_constant(node.left) and is_constant(node.right):
+            func = FOLDABLE.get(PYTHON_OPERATORS.get(node.op, node.op))
+            if func is not None:
+                if not self._small_result(node.op, node.left.value, node.right.value):
+                    return node
+                try:
+                    value = func(node.left.value, node.right.value)
+                except (ArithmeticError, TypeError, ValueError):
+                    return node
+                return constant_node(value, node) or node
+        return node
+
+    def visit_LogicOpNode(self, node):
+        self.generic_visit(node)
+        op = PYTHON_OPERATORS.get(node.op, node.op)
+        if not is_constant(node.left):
+            return node
+        truthy = bool(node.left.value)
+        if op == "and":
+            return node.right if truthy else node.left
+        if op == "or":
+            return node.left if truthy else node.right
+        return node
+
+    def visit_SpecialOpNode(self, node):
+        self.generic_visit(node)
+        # literals are never None
+        if node.op == "??" and is_constant(node.left):
+            return node.left
+        return node
+
+    def visit_NotNode(self, node):
+        self.generic_visit(node)
+        if is_constant(node.expr):
+            return constant_node(not node.expr.value, node)
+        return node
+
+    def visit_UnaryOpNode(self, node):
+        self.generic_visit(node)
+        func = UNARY.get(node.op)
+        if func is not None and is_constant(node.node):
+            try:
+                value = func(node.node.value)
+            except TypeError:
+                return node
+            return constant_node(value, node) or node
+        return node
+
+    def visit_CastNode(self, node):
+        self.generic_visit(node)
+        cast = CASTS.get(node.cast_type)
+        if cast is not None and is_constant(node.value):
+            try:
+                value = cast(node.value.value)
+            except (ValueError, OverflowError):
+                return node
+            return constant_node(value, node) or node
+        return node
+
+    def visit_LenNode(self, node):
+        self.generic_visit(node)
+        if isinstance(node.value, StringNode):
+            return constant_node(len(node.value.value), node)
+        if isinstance(node.value, ListNode) and all(is_constant(el) for el in node.value.elements):
+            return constant_node(len(node.value.elements), node)
+        return node
+
+    # False when computing the result at compile time could itself take a
+    # lot of time or memory
+    @staticmethod
+    def _small_result(op, left, right):
+        if op == "**" and isinstance(left, (int, float)) and isinstance(right, (int, float)):
+            return abs(right) <= MAX_FOLDED_BITS or abs(left) <= 1
+        if op == "<<" and isinstance(right, int):
+            return right <= MAX_FOLDED_BITS
+        if op == "*" and isinstance(left, str) != isinstance(right, str):
+            text, count = (left, right) if isinstance(left, str) else (right, left)
+            return isinstance(count, int) and len(text) * count <= MAX_FOLDED_CHARS
+        return True
+
+
+# Drops branches whose condition is a constant: a true if/elif replaces the
+# whole statement with its body, false ones disappear, as do `while false`
+# loops and loops over an empty constant range. Statements holding a yield
+# are kept, since removing the last one would stop a generator being one.
+class BranchPruning(Transformer):
+    def visit_IfNode(self, node):
+        self.generic_visit(node)
+        if contains(node, YieldNode):
+            return node
+        branches = [(node.condition, node.then_body)]
+        branches.extend((elif_node.condition, elif_node.then_body) for elif_node in node.elif_nodes)
+        kept = []
+        else_body = node.else_body
+        for condition, body in branches:
+            if is_constant(condition):
+                if condition.value:
+                    else_body = body
+                    break
+                continue
+            kept.append((condition, body))
+        if not kept:
+            return else_body.statements if else_body is not None else None
+        first_condition, first_body = kept[0]
+        elif_nodes = [copy_position(ElifNode(condition, body), condition) for condition, body in kept[1:]]
+        if else_body is not None and not else_body.statements:
+            else_body = None
+        return copy_position(IfNode(first_condition, first_body, elif_nodes, else_body), node)
+
+    def visit_WhileNode(self, node):
+        self.generic_visit(node)
+        if is_constant(node.condition) and not node.condition.value and not contains(node, YieldNode):
+            return None
+        return node
+
+    def visit_ForNode(self, node):
+        self.generic_visit(node)
+        iterable = node.iterable
+        if contains(node, YieldNode):
+            return node
+        if constant_range(iterable) and iterable.start.value >= iterable.end.value:
+            return None
+        return node
+
+
+# Removes statements that follow a return, break or continue in the same
+# block, unless one of them holds a yield, as BranchPruning
+class UnreachableCode(Transformer):
+    def visit_statements(self, statements):
+        items = super().visit_statements(statements)
+        for i, item in enumerate(items):
+            if isinstance(item, JUMPS):
+                if any(contains(rest, YieldNode) for rest in items[i + 1:]):
+                    return items
+                return items[:i + 1]
+        return items
+
+
+# Replaces reads of variables that hold a known constant with the constant.
+# Tracks straight-line code only: a value is forgotten when the variable is
+# assigned inside a loop, a branch or a function, and function bodies start
+# with nothing known, since they run after the surrounding code has moved on.
+class ConstantPropagation(Transformer):
+    def __init__(self):
+        self.known = {}
+
+    def visit_VarNode(self, node):
+        value = self.known.get(node.name)
+        if value is None:
+            return node
+        return constant_node(value.value, node) or node
+
+    def visit_AssignNode(self, node):
+        node.value = self.visit(node.value)
+        if is_constant(node.value):
+            self.known[node.name] = node.value
+        else:
+            self.known.pop(node.name, None)
+        return node
+
+    def visit_CompoundAssignNode(self, node):
+        node.value = self.visit(node.value)
+        self.known.pop(node.name, None)
+        return node
+
+    def visit_IfNode(self, node):
+        # conditions never assign, so every branch starts from the same state
+        node.condition = self.visit(node.condition)
+        start = self.known
+        outcomes = []
+        self.known = dict(start)
+        self.visit(node.then_body)
+        outcomes.append(self.known)
+        for elif_node in node.elif_nodes:
+            self.known = dict(start)
+            elif_node.condition = self.visit(elif_node.condition)
+            self.visit(elif_node.then_body)
+            outcomes.append(self.known)
+        self.known = dict(start)
+        if node.else_body is not None:
+            self.visit(node.else_body)
+        outcomes.append(self.known)
+        # keep only what every path agrees on
+        merged = {}
+        for name, value in outcomes[0].items():
+            if all(self._same(other.get(name), value) for other in outcomes[1:]):
+                merged[name] = value
+        self.known = merged
+        return node
+
+    def visit_WhileNode(self, node):
+        self._forget(names_assigned(node.body))
+        node.condition = self.visit(node.condition)
+        self._loop_body(node.body)
+        return node
+
+    def visit_ForNode(self, node):
+        node.iterable = self.visit(node.iterable)
+        self._forget(names_assigned(node.body))
+        self.known.pop(node.var_name, None)
+        self._loop_body(node.body)
+        self.known.pop(node.var_name, None)
+        return node
+
+    def visit_FuncNode(self, node):
+        self.known.pop(node.name, None)
+        outer = self.known
+        self.known = {}
+        self.visit(node.body)
+        self.known = outer
+        return node
+
+    visit_AsyncFuncNode = visit_FuncNode
+
+    def visit_ClassNode(self, node):
+        self.known.pop(node.name, None)
+        outer = self.known
+        self.known = {}
+        self.generic_visit(node)
+        self.known = outer
+        return node
+
+    visit_StructNode = visit_ClassNode
+
+    # The body is a function that runs during the statement, so it sees
+    # what is known now, except for the names it binds itself
+    def visit_ParallelForNode(self, node):
+        node.iterable = self.visit(node.iterable)
+        if node.workers is not None:
+            node.workers = self.visit(node.workers)
+        outer = self.known
+        self.known = dict(outer)
+        self._forget(names_assigned(node.body) | {node.var_name})
+        self.visit(node.body)
+        self.known = outer
+        return node
+
+    # Every task starts from what is known before the block, since the
+    # others may not have run yet, and the names the tasks bind are assigned
+    # only once all of them are done
+    def visit_AsyncBlockNode(self, node):
+        outer = self.known
+        statements = []
+        for stmt in node.statements:
+            self.known = dict(outer)
+            self._forget(names_assigned(stmt))
+            statements.append(self.visit_task(stmt))
+        node.statements = [stmt for stmt in statements if stmt is not None]
+        self.known = outer
+        self._forget(names_assigned(node))
+        return node
+
+    def visit_ImportNode(self, node):
+        self.known.pop(node.name.value, None)
+        return node
+
+    def _loop_body(self, body):
+        before = dict(self.known)
+        self.visit(body)
+        # the body may run any number of times, including zero
+        self.known = {name: value for name, value in before.items()
+                      if self._same(self.known.get(name), value)}
+
+    def _forget(self, names):
+        for name in names:
+            self.known.pop(name, None)
+
+    # repr tells 0.0 from -0.0 and 1 from True
+    @staticmethod
+    def _same(a, b):
+        return a is not None and b is not None and repr(a.value) == repr(b.value)
+
+
+# Removes assignments whose value is never read: stores overwritten later in
+# the same block before any read, and in functions, stores to locals the
+# function never reads at all. Only pure values are removed. At module level
+# any call may read globals, so calls end the overwritten-before-read window.
+class DeadStores(Transformer):
+    def __init__(self):
+        self.in_function = False
+
+    def visit_FuncNode(self, node):
+        outer = self.in_function
+        # a nested function or class can read this function's locals, so
+        # then calls end the window just as at module level
+        self.in_function = not contains(node.body, (FuncNode, ClassNode))
+        self.generic_visit(node)
+        if self.in_function:
+            read = names_read(node.body)
+            node.body.statements = self._drop_unread(node.body.statements, read, set(node.params or ()))
+        self.in_function = outer
+        return node
+
+    visit_AsyncFuncNode = visit_FuncNode
+
+    def _drop_unread(self, statements, read, params):
+        kept = []
+        for stmt in statements:
+            if isinstance(stmt, AssignNode) and stmt.name not in read and is_pure(stmt.value):
+                continue
+            for name in ("body", "then_body", "else_body"):
+                block = getattr(stmt, name, None)
+                if isinstance(block, BlockNode):
+                    block.statements = self._drop_unread(block.statements, read, params)
+            for elif_node in getattr(stmt, "elif_nodes", None) or ():
+                elif_node.then_body.statements = self._drop_unread(elif_node.then_body.statements, read, params)
+            kept.append(stmt)
+        return kept
+
+    def visit_statements(self, statements):
+        items = super().visit_statements(statements)
+        # names written later in this block before anything reads them
+        overwritten = set()
+        kept = []
+        for stmt in reversed(items):
+            if isinstance(stmt, AssignNode):
+                if stmt.name in overwritten and is_pure(stmt.value):
+                    continue
+                if not self.in_function and contains(stmt.value, CALLS):
+                    # the call may read any global before the name is written
+                    overwritten.clear()
+                # the value is read before the name is written
+                overwritten.add(stmt.name)
+                overwritten -= names_read(stmt.value)
+            elif contains(stmt, (BreakNode, ContinueNode)):
+                # the loop may be left here, before the later stores run
+                overwritten.clear()
+            elif not self.in_function and contains(stmt, CALLS):
+                overwritten.clear()
+            else:
+                overwritten -= names_read(stmt)
+            kept.append(stmt)
+        kept.reverse()
+        return kept
+
+
+# Base for the loop passes: tracks the value kinds of the scope being
+# visited and answers whether an expression is the same on every iteration
+# of a loop and whether it can raise.
+class LoopTransformer(Transformer):
+    def __init__(self):
+        self.kinds = {}
+
+    def visit_ProgramNode(self, node):
+        self.kinds = value_kinds(node.statements)
+        return super().visit_ProgramNode(node)
+
+    def visit_FuncNode(self, node):
+        outer = self.kinds
+        self.kinds = value_kinds(node.body.statements, node.params or ())
+        self.visit(node.body)
+        self.kinds = outer
+        return node
+
+    visit_AsyncFuncNode = visit_FuncNode
+
+    def visit_ParallelForNode(self, node):
+        node.iterable = self.visit(node.iterable)
+        outer = self.kinds
+        self.kinds = value_kinds(node.body.statements, (node.var_name,))
+        self.visit(node.body)
+        self.kinds = outer
+        return node
+
+    # True when running the loop body could change a list, or any object
+    # an expression might read. Only scalars are safe from that. Other
+    # code runs while the body awaits or yields, so those count as calls, as
+    # do pipelines, whose stages call functions.
+    def mutates(self, body):
+        for node in walk(body, (FuncNode, ClassNode)):
+            if isinstance(node, (IndexAssignNode, AttrAssignNode, CallNode, ParallelForNode, AwaitNode, AsyncBlockNode,
+                                 YieldNode, PipelineNode)):
+                return True
+            if isinstance(node, CompoundAssignNode) and self.kinds.get(node.name) is None:
+                return True
+        return False
+
+    # node gives the same value on every iteration: it reads no name the
+    # loop assigns, and reads objects only if the loop mutates none.
+    # Origin functions cannot rebind outer names, so calls only matter for
+    # objects.
+    def invariant(self, node, assigned, mutates):
+        for child in walk(node):
+            if not isinstance(child, HOISTABLE):
+                return False
+            if isinstance(child, VarNode):
+                if child.name in assigned or mutates and self.kinds.get(child.name) is None:
+                    return False
+        return True
+
+    # node's own operation, once its operands are evaluated, cannot raise
+    # and has no effect. Reading a variable is assumed not to raise, as in
+    # is_pure.
+    def safe_op(self, node):
+        if isinstance(node, CONSTANTS + (VarNode, NotNode, LogicOpNode, ListNode)):
+            return True
+        if isinstance(node, SpecialOpNode):
+            return node.op == "??"
+        if isinstance(node, BinOpNode):
+            op = PYTHON_OPERATORS.get(node.op, node.op)
+            left, right = value_kind(node.left, self.kinds), value_kind(node.right, self.kinds)
+            if op in ("==", "!="):
+                return left is not None and right is not None
+            return op in SAFE_INT_OPS and left == right == "int"
+        if isinstance(node, UnaryOpNode):
+            return node.op in UNARY and value_kind(node.node, self.kinds) == "int"
+        if isinstance(node, CastNode):
+            return node.cast_type == "int" and value_kind(node.value, self.kinds) == "int"
+        return False
+
+    def safe(self, node):
+        return all(self.safe_op(child) for child in walk(node))
+
+
+# Rewrites counted while loops into range loops:
+#     while i < n { ...; i += 1 }  =>  for i in range(i, n) { ... }
+# when i and n are ints, n is invariant, i changes only in the final
+# increment and no break or continue leaves the loop early. An `if i < n
+# { i += 1 }` after the loop leaves i where the while loop would.
+class CountedLoops(LoopTransformer):
+    def visit_WhileNode(self, node):
+        self.generic_visit(node)
+        counted = self._counter(node)
+        if counted is None:
+            return node
+        name, op, bound = counted
+        body = node.body.statements[:-1]
+        end = copy.deepcopy(bound)
+        if op == "<=":
+            if isinstance(end, NumberNode):
+                end.value += 1
+            else:
+                end = copy_position(BinOpNode(end, "+", copy_position(NumberNode(1), end)), end)
+        loop = ForNode(name, copy_position(RangeNode(copy_position(VarNode(name), node), end), node),
+                       copy_position(BlockNode(body), node.body))
+        step = copy_position(BlockNode([node.body.statements[-1]]), node.body)
+        return [copy_position(loop, node), copy_position(IfNode(node.condition, step), node)]
+
+    # (name, "<" or "<=", bound) for a counted loop, else None
+    def _counter(self, node):
+        condition = node.condition
+        if not isinstance(condition, BinOpNode):
+            return None
+        op = condition.op
+        if op in ("<", "<=") and isinstance(condition.left, VarNode):
+            name, bound = condition.left.name, condition.right
+        elif op in (">", ">=") and isinstance(condition.right, VarNode):
+            name, bound, op = condition.right.name, condition.left, "<" if op == ">" else "<="
+        else:
+            return None
+        statements = node.body.statements
+        if not statements or not self._increments(statements[-1], name):
+            return None
+        rest = BlockNode(statements[:-1])
+        if name in names_assigned(rest) or self._leaves_early(rest):
+            return None
+        if self.kinds.get(name) != "int" or value_kind(bound, self.kinds) != "int":
+            return None
+        if not self.invariant(bound, names_assigned(node.body), self.mutates(node.body)):
+            return None
+        return name, op, bound
+
+    @staticmethod
+    def _increments(stmt, name):
+        one = lambda node: isinstance(node, NumberNode) and type(node.value) is int and node.value == 1
+        if isinstance(stmt, CompoundAssignNode):
+            return stmt.name == name and stmt.op == "+=" and one(stmt.value)
+        if isinstance(stmt, AssignNode) and stmt.name == name and isinstance(stmt.value, BinOpNode):
+            value = stmt.value
+            if value.op != "+":
+                return False
+            return (isinstance(value.left, VarNode) and value.left.name == name and one(value.right)
+                    or isinstance(value.right, VarNode) and value.right.name == name and one(value.left))
+        return False
+
+    # a break or continue that belongs to this loop, not a nested one
+    @staticmethod
+    def _leaves_early(body):
+        for node in walk(body, (ForNode, WhileNode, FuncNode, ClassNode, ParallelForNode)):
+            if isinstance(node, (BreakNode, ContinueNode)):
+                return True
+        return False
+
+
+# Computes expressions that are the same on every iteration once, before
+# the loop, in a temporary. Expressions that cannot raise are hoisted from
+# anywhere in the loop. Ones that can, such as len(xs) or int(s), are
+# hoisted only when the loop would evaluate them first thing, before any
+# output, call or other operation that could raise: from a while condition,
+# or from the start of a range loop's body, in which case they are computed
+# only if the range is not empty.
+class LoopInvariants(LoopTransformer):
+    def __init__(self):
+        super().__init__()
+        self.taken = set()
+        self.counter = 0
+
+    def visit_ProgramNode(self, node):
+        self.taken = names_read(node) | names_assigned(node)
+        for func in walk(node):
+            if isinstance(func, FuncNode):
+                self.taken.update(func.params or ())
+        return super().visit_ProgramNode(node)
+
+    def visit_WhileNode(self, node):
+        self.generic_visit(node)
+        assigned = names_assigned(node.body)
+        mutates = self.mutates(node.body)
+        invariant = lambda expr: self.invariant(expr, assigned, mutates)
+        found = []
+        self._first(node.condition, invariant, found)
+        for part in (node.condition, node.body):
+            self._anywhere(part, invariant, found)
+        if not found:
+            return node
+        temps = self._temps(found, node)
+        node.condition = Substitute(temps).visit(node.condition)
+        node.body = Substitute(temps).visit(node.body)
+        return list(temps.values()) + [node]
+
+    def visit_ForNode(self, node):
+        self.generic_visit(node)
+        assigned = names_assigned(node.body) | {node.var_name}
+        mutates = self.mutates(node.body)
+        invariant = lambda expr: self.invariant(expr, assigned, mutates)
+        found = []
+        if isinstance(node.iterable, RangeNode):
+            self._first_statements(node.body.statements, invariant, found)
+        self._anywhere(node.body, invariant, found)
+        if not found:
+            return node
+        temps = self._temps(found, node)
+        node.body = Substitute(temps).visit(node.body)
+        hoisted = list(temps.values())
+        if all(self.safe(stmt.value) for stmt in hoisted) or self._runs(node.iterable):
+            return hoisted + [node]
+        # evaluate the range first, as the loop would, then the invariants
+        # only if it has at least one element
+        rng = self._temp()
+        before = copy_position(AssignNode(rng, node.iterable), node)
+        node.iterable = copy_position(VarNode(rng), node)
+        guard = copy_position(IfNode(copy_position(VarNode(rng), node), BlockNode(hoisted + [node])), node)
+        return [before, guard]
+
+    @staticmethod
+    def _runs(iterable):
+        return constant_range(iterable) and iterable.start.value < iterable.end.value
+
+    # Collects invariants in evaluation order from the first iteration of a
+    # loop body, until something that could raise or be observed runs
+    def _first_statements(self, statements, invariant, found):
+        for stmt in statements:
+            if isinstance(stmt, AssignNode):
+                if not self._first(stmt.value, invariant, found):
+                    return
+            elif isinstance(stmt, CompoundAssignNode):
+                kind = binop_kind(stmt.op[:-1], self.kinds.get(stmt.name), value_kind(stmt.value, self.kinds))
+                if not (self._first(stmt.value, invariant, found) and kind == "int"
+                        and stmt.op[:-1] in SAFE_INT_OPS):
+                    return
+            elif isinstance(stmt, PrintNode):
+                self._first(stmt.expr, invariant, found)
+                return
+            elif isinstance(stmt, IndexAssignNode):
+                for part in (stmt.value, stmt.collection, stmt.index):
+                    if not self._first(part, invariant, found):
+                        return
+                return
+            elif isinstance(stmt, (IfNode, WhileNode)):
+                self._first(stmt.condition, invariant, found)
+                return
+            elif isinstance(stmt, ForNode):
+                self._first(stmt.iterable, invariant, found)
+                return
+            elif isinstance(stmt, HOISTABLE + (CallNode, InputNode, ListNode, RangeNode)):
+                self._first(stmt, invariant, found)
+                return
+            else:
+                return
+
+    # Returns whether evaluation goes on past node without anything that
+    # could raise or be observed
+    def _first(self, node, invariant, found):
+        if invariant(node):
+            if not isinstance(node, CONSTANTS + (VarNode,)):
+                found.append(node)
+            return True
+        if isinstance(node, (LogicOpNode, SpecialOpNode)):
+            # the right side may not run at all
+            return self._first(node.left, invariant, found) and self.safe(node.right)
+        for child in iter_child_nodes(node):
+            if not self._first(child, invariant, found):
+                return False
+        return self.safe_op(node)
+
+    def _anywhere(self, node, invariant, found):
+        if isinstance(node, (FuncNode, ClassNode)):
+            return
+        if (isinstance(node, HOISTABLE) and not isinstance(node, CONSTANTS + (VarNode,))
+                and invariant(node) and self.safe(node)):
+            found.append(node)
+            return
+        for child in iter_child_nodes(node):
+            self._anywhere(child, invariant, found)
+
+    # {fingerprint: assignment to a new temporary}, first occurrence first
+    def _temps(self, found, loop):
+        temps = {}
+        for expr in found:
+            key = fingerprint(expr)
+            if key not in temps:
+                temps[key] = copy_position(AssignNode(self._temp(), copy.deepcopy(expr)), loop)
+        return temps
+
+    def _temp(self):
+        while True:
+            name = f"{TEMP_PREFIX}{self.counter}"
+            self.counter += 1
+            if name not in self.taken:
+                return name
+
+
+# Replaces expressions equal to a hoisted one with a read of its temporary,
+# outside nested functions, which may run after the temporary is stale
+class Substitute(Transformer):
+    def __init__(self, temps):
+        self.temps = temps
+
+    def visit(self, node):
+        if isinstance(node, (FuncNode, ClassNode)):
+            return node
+        if isinstance(node, HOISTABLE):
+            stmt = self.temps.get(fingerprint(node))
+            if stmt is not None:
+                return copy_position(VarNode(stmt.name), node)
+        return super().visit(node)
+
+
+# Replaces calls to module-level functions with their bodies: functions
+# marked `inline def` and, when automatic is set, functions whose body is a
+# single return of at most INLINE_MAX_NODES nodes. An inlinable body is
+# straight-line: lets, then one return. A call site is left alone when the
+# function is recursive, its name is bound more than once, or a local at the
+# call site shadows the function or a global it reads.
+#
+# A call whose arguments are all constants or variables, or are used once
+# each in argument order before anything else runs, becomes the return
+# expression with the arguments substituted. Otherwise, when the call is the
+# whole value of a statement, the body's lets go before the statement, with
+# parameters and locals renamed to fresh _origin_inline names.
+class Inlining(Transformer):
+    automatic = False
+
+    def __init__(self):
+        self.functions = {}
+        self.taken = set()
+        self.counter = 0
+        # names local to each enclosing function, innermost last
+        self.scopes = []
+
+    def visit_ProgramNode(self, node):
+        self.taken = names_read(node) | names_assigned(node)
+        bindings = {}
+        for child in walk(node, (FuncNode, ClassNode)):
+            for name in self._binds(child):
+                bindings[name] = bindings.get(name, 0) + 1
+        for stmt in node.statements:
+            if (type(stmt) is FuncNode and bindings.get(stmt.name) == 1 and self._straight_line(stmt)
+                    and (stmt.inline or self.automatic and self._small(stmt))):
+                self.functions[stmt.name] = stmt
+        self._drop_recursive()
+        # callees first, so what is inlined is already expanded
+        for func in self._callees_first():
+            self.visit_FuncNode(func)
+        return super().visit_ProgramNode(node)
+
+    def visit_FuncNode(self, node):
+        self.scopes.append(names_assigned(node.body) | set(node.params or ()))
+        self.visit(node.body)
+        self.scopes.pop()
+        return node
+
+    visit_AsyncFuncNode = visit_FuncNode
+
+    def visit_ClassNode(self, node):
+        return node
+
+    visit_StructNode = visit_ClassNode
+
+    def visit_ParallelForNode(self, node):
+        node.iterable = self.visit(node.iterable)
+        if node.workers is not None:
+            node.workers = self.visit(node.workers)
+        self.scopes.append(names_assigned(node.body) | {node.var_name})
+        self.visit(node.body)
+        self.scopes.pop()
+        return node
+
+    # Statements in a list may be split; the tasks of an async block are
+    # visited one by one instead, as their lets bind only on completion
+    def visit_statements(self, statements):
+        result = []
+        for stmt in statements:
+            new = self.visit(stmt)
+            if isinstance(new, ASTNode):
+                new = self._split(new) or new
+            if isinstance(new, list):
+                result.extend(new)
+            elif new is not None:
+                result.append(new)
+        return result
+
+    def visit_CallNode(self, node):
+        self.generic_visit(node)
+        func = self._callee(node)
+        if func is None or len(func.body.statements) != 1:
+            return node
+        params = func.params or ()
+        body = func.body.statements[0].value
+        if not self._in_order(body, params, node.arg):
+            return node
+        mapping = dict(zip(params, node.arg))
+        return move_position(Rename(mapping, {}).visit(copy.deepcopy(body)), node)
+
+    # The function node a call may be inlined from, or None
+    def _callee(self, node):
+        if not isinstance(node.func_name, VarNode):
+            return None
+        func = self.functions.get(node.func_name.name)
+        if func is None or len(node.arg or ()) != len(func.params or ()):
+            return None
+        free = names_read(func.body) - set(func.params or ()) - names_assigned(func.body)
+        for scope in self.scopes:
+            if func.name in scope or free & scope:
+                return None
+        return func
+
+    # Whether substituting args for params in expr evaluates them as the
+    # call would: args that are not constants or variables must each be used
+    # exactly once, unconditionally, in argument order, with nothing but
+    # variable reads evaluated before the last of them
+    @staticmethod
+    def _in_order(expr, params, args):
+        pending = [param for param, arg in zip(params, args) if not isinstance(arg, CONSTANTS + (VarNode,))]
+        if not pending:
+            return True
+        counts = {}
+        for child in walk(expr):
+            if isinstance(child, VarNode) and child.name in pending:
+                counts[child.name] = counts.get(child.name, 0) + 1
+        if any(counts.get(param) != 1 for param in pending):
+            return False
+        for child, conditional in Inlining._evaluation(expr, False):
+            if not pending:
+                return True
+            if isinstance(child, VarNode) and child.name in pending:
+                if conditional or child.name != pending[0]:
+                    return False
+                pending.pop(0)
+            elif not isinstance(child, CONSTANTS + (VarNode,)):
+                return False
+        return not pending
+
+    # (node, whether it might not run) for expr and everything in it, in the
+    # order Python evaluates them
+    @staticmethod
+    def _evaluation(expr, conditional):
+        if isinstance(expr, (LogicOpNode, SpecialOpNode)):
+            yield from Inlining._evaluation(expr.left, conditional)
+            yield from Inlining._evaluation(expr.right, True)
+        else:
+            for child in iter_child_nodes(expr):
+                yield from Inlining._evaluation(child, conditional)
+        yield expr, conditional
+
+    # Statements replacing stmt when it calls a function that can be
+    # inlined, with the function's lets moved before it
+    def _split(self, stmt):
+        if isinstance(stmt, (AssignNode, CompoundAssignNode, IndexAssignNode, AttrAssignNode, ReturnNode, PrintNode,
+                             CallNode)):
+            call = self._hoistable(stmt)
+        else:
+            return None
+        if call is None:
+            return None
+        func = self._callee(call)
+        assigned = names_assigned(func.body)
+        before = []
+        mapping = {}
+        renamed = {}
+        for param, arg in zip(func.params or (), call.arg):
+            if isinstance(arg, CONSTANTS + (VarNode,)) and param not in assigned:
+                mapping[param] = arg
+            else:
+                renamed[param] = self._temp(param)
+                before.append(copy_position(AssignNode(renamed[param], arg), call))
+        for name in sorted(assigned - set(renamed)):
+            renamed[name] = self._temp(name)
+        rename = Rename(mapping, renamed)
+        for body_stmt in func.body.statements[:-1]:
+            before.append(move_position(rename.visit(copy.deepcopy(body_stmt)), call))
+        value = move_position(rename.visit(copy.deepcopy(func.body.statements[-1].value)), call)
+        return before + [Replace(call, value).visit(stmt)]
+
+    # The first call in stmt to a function that can be inlined, if nothing
+    # but constants and variable reads is evaluated before it; its lets can
+    # then run first without changing what the statement computes
+    def _hoistable(self, stmt):
+        if isinstance(stmt, CallNode):
+            expr = stmt
+        else:
+            expr = stmt.expr if isinstance(stmt, PrintNode) else stmt.value
+        if expr is None:
+            return None
+        order = list(self._evaluation(expr, False))
+        for index, (node, conditional) in enumerate(order):
+            if conditional:
+                return None
+            if isinstance(node, CallNode) and self._callee(node) is not None:
+                # the call's own arguments come just before it
+                first = index + 1 - sum(1 for _ in walk(node))
+                if all(isinstance(other, CONSTANTS + (VarNode,)) for other, _ in order[:first]):
+                    return node
+                return None
+        return None
+
+    def _temp(self, name):
+        while True:
+            temp = f"{INLINE_PREFIX}{self.counter}_{name}"
+            self.counter += 1
+            if temp not in self.taken:
+                self.taken.add(temp)
+                return temp
+
+    @staticmethod
+    def _binds(node):
+        if isinstance(node, (AssignNode, CompoundAssignNode, FuncNode, ClassNode)):
+            return (node.name,)
+        if isinstance(node, (ForNode, ParallelForNode)):
+            return (node.var_name,)
+        if isinstance(node, ImportNode):
+            return (node.name.value,)
+        return ()
+
+    # lets, then a return with a value
+    @staticmethod
+    def _straight_line(func):
+        statements = func.body.statements
+        if not statements or not isinstance(statements[-1], ReturnNode) or statements[-1].value is None:
+            return False
+        if not all(isinstance(stmt, (AssignNode, CompoundAssignNode)) for stmt in statements[:-1]):
+            return False
+        return not any(isinstance(node, NOT_INLINABLE) for stmt in statements for node in walk(stmt))
+
+    @staticmethod
+    def _small(func):
+        statements = func.body.statements
+        return len(statements) == 1 and sum(1 for _ in walk(statements[0].value)) <= INLINE_MAX_NODES
+
+    def _calls(self, func):
+        return {node.func_name.name for node in walk(func.body)
+                if isinstance(node, CallNode) and isinstance(node.func_name, VarNode)
+                and node.func_name.name in self.functions}
+
+    # Drops functions that can reach a call to themselves through others
+    def _drop_recursive(self):
+        changed = True
+        while changed:
+            changed = False
+            calls = {name: self._calls(func) for name, func in self.functions.items()}
+            for name in list(self.functions):
+                seen = set()
+                stack = list(calls[name])
+                while stack:
+                    callee = stack.pop()
+                    if callee in seen:
+                        continue
+                    seen.add(callee)
+                    stack.extend(calls.get(callee, ()))
+                if name in seen:
+                    del self.functions[name]
+                    changed = True
+                    break
+
+    def _callees_first(self):
+        order = []
+        done = set()
+
+        def visit(name):
+            if name in done:
+                return
+            done.add(name)
+            for callee in sorted(self._calls(self.functions[name])):
+                visit(callee)
+            order.append(self.functions[name])
+        for name in list(self.functions):
+            visit(name)
+        return order
+
+
+class AutoInlining(Inlining):
+    automatic = True
+
+
+# Replaces reads of the names in mapping with a copy of their node, and
+# renames the names in renamed wherever they are read or assigned
+class Rename(Transformer):
+    def __init__(self, mapping, renamed):
+        self.mapping = mapping
+        self.renamed = renamed
+
+    def visit_VarNode(self, node):
+        if node.name in self.mapping:
+            return copy_position(copy.deepcopy(self.mapping[node.name]), node)
+        if node.name in self.renamed:
+            return copy_position(VarNode(self.renamed[node.name]), node)
+        return node
+
+    def visit_AssignNode(self, node):
+        node.value = self.visit(node.value)
+        node.name = self.renamed.get(node.name, node.name)
+        return node
+
+    visit_CompoundAssignNode = visit_AssignNode
+
+
+# Puts new in place of the node old
+class Replace(Transformer):
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+    def visit(self, node):
+        if node is self.old:
+            return self.new
+        return super().visit(node)
+
+
+# Uses the types inference.scope_types knows to drop casts to the type a
+# value already has, operations that give back their operand (x + 0 and
+# x * 1 on ints, x * 1 and x / 1 on floats, s + "" on strings) and `??`
+# on values that are never None, and to square ints by multiplying.
+class Specialize(Transformer):
+    def __init__(self):
+        self.types = {}
+
+    def visit_ProgramNode(self, node):
+        self.types = scope_types(node.statements)
+        return super().visit_ProgramNode(node)
+
+    def visit_FuncNode(self, node):
+        self._scope(node.body, node.params or ())
+        return node
+
+    visit_AsyncFuncNode = visit_FuncNode
+
+    def visit_ParallelForNode(self, node):
+        node.iterable = self.visit(node.iterable)
+        if node.workers is not None:
+            node.workers = self.visit(node.workers)
+        self._scope(node.body, (node.var_name,))
+        return node
+
+    # the value of a `let` runs in the block's scope, any other statement
+    # in a task function of its own
+    def visit_AsyncBlockNode(self, node):
+        for i, task in enumerate(node.statements):
+            if isinstance(task, AssignNode):
+                task.value = self.visit(task.value)
+            else:
+                block = self._scope(BlockNode([task]), ())
+                node.statements[i] = block.statements[0] if len(block.statements) == 1 else block
+        return node
+
+    def _scope(self, block, params):
+        outer = self.types
+        self.types = scope_types(block.statements, params, outer)
+        self.visit(block)
+        self.types = outer
+        return block
+
+    def visit_CastNode(self, node):
+        self.generic_visit(node)
+        if type_of(node.value, self.types) == node.cast_type:
+            return node.value
+        return node
+
+    def visit_SpecialOpNode(self, node):
+        self.generic_visit(node)
+        if node.op == "??" and type_of(node.left, self.types) in BUILTIN_TYPES:
+            return node.left
+        return node
+
+    def visit_BinOpNode(self, node):
+        self.generic_visit(node)
+        op = node.op
+        left, right = type_of(node.left, self.types), type_of(node.right, self.types)
+        if op == "**" and left == INT and isinstance(node.left, VarNode) and self._is(node.right, 2):
+            return copy_position(BinOpNode(node.left, "*", copy_position(VarNode(node.left.name), node.left)), node)
+        if self._identity(op, left, node.right):
+            return node.left
+        if op in ("+", "*") and self._identity(op, right, node.left):
+            return node.right
+        return node
+
+    # value op constant gives value back for every value of value_type
+    def _identity(self, op, value_type, constant):
+        if value_type == INT:
+            return op in ("+", "-") and self._is(constant, 0) or op in ("*", "//") and self._is(constant, 1)
+        if value_type == FLOAT:
+            return op in ("*", "/") and self._is(constant, 1)
+        if value_type == STR:
+            return op == "+" and isinstance(constant, StringNode) and constant.value == ""
+        return False
+
+    # node is the int constant value, not a float or bool
+    @staticmethod
+    def _is(node, value):
+        return isinstance(node, NumberNode) and type(node.value) is int and node.value == value
+
+
+# Rewrites loops over a range that only set element i of lists from element
+# i of lists, i and numbers, such as
+#     for i in range(0, n) { c[i] = a[i] * b[i] + 1 }
+# into a VectorLoopNode, which runs the body as whole-array NumPy operations
+# when the values allow it and as the loop otherwise. Every element read or
+# written is element i, so no iteration depends on another.
+class Vectorize(Transformer):
+    def visit_ForNode(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.iterable, RangeNode) or not node.body.statements:
+            return node
+        names = []
+        kinds = {}
+        spec = []
+        for stmt in node.body.statements:
+            if not isinstance(stmt, IndexAssignNode) or not self._element(stmt, node.var_name):
+                return node
+            target = self._operand(self._name(stmt.collection, node.var_name), "list", names, kinds)
+            expr = self._expr(stmt.value, node.var_name, names, kinds)
+            if target is None or expr is None:
+                return node
+            spec.append((target[1], expr))
+        return copy_position(VectorLoopNode(node, tuple(spec), names), node)
+
+    # node is a list indexed by the loop variable, `list[var]`
+    def _element(self, node, var):
+        return (self._name(node.collection, var) is not None
+                and isinstance(node.index, VarNode) and node.index.name == var)
+
+    # The name node reads, as `name` or `name.field` for a field of a struct
+    # or any object, or None if it reads something else or the loop variable
+    @staticmethod
+    def _name(node, var):
+        field = ""
+        if isinstance(node, AttrNode):
+            field = "." + node.name
+            node = node.value
+        if isinstance(node, VarNode) and node.name != var:
+            return node.name + field
+        return None
+
+    # The spec for an element-wise expression, or None if node is not one
+    def _expr(self, node, var, names, kinds):
+        if isinstance(node, NumberNode):
+            value = node.value
+            if type(value) not in (int, float) or not math.isfinite(value):
+                return None
+            return ("const", value)
+        if isinstance(node, VarNode) and node.name == var:
+            return ("index",)
+        if isinstance(node, (VarNode, AttrNode)):
+            name = self._name(node, var)
+            return None if name is None else self._operand(name, "number", names, kinds)
+        if isinstance(node, IndexNode):
+            if not self._element(node, var):
+                return None
+            return self._operand(self._name(node.collection, var), "list", names, kinds)
+        if isinstance(node, UnaryOpNode) and node.op == "-":
+            operand = self._expr(node.node, var, names, kinds)
+            return None if operand is None else ("neg", operand)
+        if isinstance(node, BinOpNode) and node.op in VECTOR_OPS:
+            left = self._expr(node.left, var, names, kinds)
+            right = self._expr(node.right, var, names, kinds)
+            return None if left is None or right is None else (node.op, left, right)
+        return None
+
+    # (kind, position of name in names), or None when name is used both
+    # as a list and as a number
+    @staticmethod
+    def _operand(name, kind, names, kinds):
+        if kinds.setdefault(name, kind) != kind:
+            return None
+        if name not in names:
+            names.append(name)
+        return (kind, names.index(name))
+
+
+# Passes run at each -O level, in order
+LEVELS = {
+    0: (),
+    1: (Inlining, ConstantFolding, BranchPruning, UnreachableCode),
+    2: (AutoInlining, ConstantFolding, ConstantPropagation, Specialize, ConstantFolding, BranchPruning,
+        UnreachableCode, DeadStores, CountedLoops, LoopInvariants, Vectorize),
+}
+
+
+# inline=False skips the inlining passes, for -O levels with every other
+# pass but calls left as written
+def optimize(program, level=1, inline=True):
+    if level not in LEVELS:
+        raise ValueError(f"Unknown optimization level {level!r}, expected one of {sorted(LEVELS)}")
+    for make_pass in LEVELS[level]:
+        if not inline and issubclass(make_pass, Inlining):
+            continue
+        program = make_pass().visit(program)
+    return program
@@ -0,0 +1,189 @@
+import argparse
+import sys
+
+from compiler import BACKENDS
+
+# optimizer.LEVELS, without importing the optimizer
+OPTIMIZE_LEVELS = (0, 1, 2)
+
+# Command line entry point: python origin.py run|compile|check|expand|profile
+# FILE, or python origin.py serve.
+# Only argparse and compiler are imported up front; each subcommand imports what
+# it needs, so a cached `run` never loads the lexer, parser or code
+# generators.
+
+
+def read_source(path):
+    with open(path, "r") as file:
+        return file.read()
+
+
+# Prints the type errors inference finds in program; True if there are any
+def report_type_errors(path, program):
+    from inference import type_errors
+    errors = type_errors(program)
+    for line, col, message in errors:
+        print(f"{path}:{line}:{col}: TypeError: {message}", file=sys.stderr)
+    return bool(errors)
+
+
+def cmd_run(args):
+    if args.strict:
+        from compiler import parse
+        if report_type_errors(args.path, parse(read_source(args.path), args.macro_depth)):
+            return 1
+    if args.stream:
+        from runner import run_stream
+        run_stream(args.path)
+        return 0
+    from compiler import run_origin
+    source = read_source(args.path)
+    cache = None
+    if not args.no_cache:
+        from cache import CodeCache
+        cache = CodeCache.for_source_file(args.path)
+    if args.stats or args.memory:
+        from compiler import run_with_stats
+        _, stats = run_with_stats(source, args.path, cache, args.backend, args.memory, args.optimize,
+                                  not args.no_inline, args.macro_depth)
+        print(stats.report(), file=sys.stderr)
+    else:
+        run_origin(source, args.path, cache, backend=args.backend, optimize=args.optimize,
+                   inline=not args.no_inline, macro_depth=args.macro_depth)
+    return 0
+
+
+def cmd_compile(args):
+    source = read_source(args.path)
+    if args.backend == "ast":
+        import ast
+        from astgen import ASTGenerator
+        from compiler import parse
+        program = parse(source, args.macro_depth)
+        if args.optimize:
+            from optimizer import optimize
+            program = optimize(program, args.optimize, not args.no_inline)
+        python = ast.unparse(ASTGenerator().module(program))
+    else:
+        from compiler import translate
+        python = translate(source, args.optimize, not args.no_inline, args.macro_depth)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(python + "\n")
+    else:
+        sys.stdout.write(python + "\n")
+    return 0
+
+
+# Lexes, parses and checks types without generating or running anything
+def cmd_check(args):
+    from compiler import source_lines
+    from lexer import lex
+    from parser import Parser
+    status = 0
+    for path in args.paths:
+        try:
+            tokens = lex(source_lines(read_source(path)))
+        except SyntaxError as error:
+            print(f"{path}: {error}", file=sys.stderr)
+            status = 1
+            continue
+        parser = Parser(tokens, args.macro_depth)
+        try:
+            program = parser.program()
+        except SyntaxError as error:
+            tok = parser.current_token()
+            print(f"{path}:{tok.line}:{tok.col}: {error}", file=sys.stderr)
+            status = 1
+            continue
+        if report_type_errors(path, program):
+            status = 1
+    return status
+
+
+# Prints the AST a program parses to, with every macro expanded, and what
+# the expansion took to stderr
+def cmd_expand(args):
+    from compiler import source_lines
+    from lexer import lex
+    from macros import dump
+    from parser import Parser
+    parser = Parser(lex(source_lines(read_source(args.path))), args.macro_depth)
+    try:
+        program = parser.program()
+    except SyntaxError as error:
+        tok = parser.current_token()
+        print(f"{args.path}:{tok.line}:{tok.col}: {error}", file=sys.stderr)
+        return 1
+    sys.stdout.write(dump(program) + "\n")
+    print(parser.macros.summary(), file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="origin", description="Run and compile Origin programs")
+    commands = ap.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a program")
+    run.add_argument("path")
+    run.add_argument("--backend", choices=BACKENDS, default="string", help="code generator to compile with")
+    run.add_argument("--no-cache", action="store_true", help="do not read or write __origincache__")
+    run.add_argument("--stream", action="store_true", help="lex, parse and run one statement at a time")
+    run.add_argument("--stats", action="store_true", help="print time and sizes per pipeline phase to stderr")
+    run.add_argument("--memory", action="store_true",
+                     help="with --stats, also trace peak memory per phase (slows compile and exec severalfold)")
+    run.add_argument("-O", dest="optimize", type=int, choices=OPTIMIZE_LEVELS, default=0,
+                     help="optimization level: 1 inlines `inline def` functions, folds constants and "
+                          "prunes dead branches, 2 also inlines small functions, propagates constants, "
+                          "drops casts and operations that inferred types make redundant, removes dead "
+                          "stores, turns counted while loops into range loops, hoists "
+                          "loop invariants and runs element-wise list loops on NumPy when it is installed")
+    run.add_argument("--no-inline", action="store_true", help="leave every call as written at any -O level")
+    run.add_argument("--strict", action="store_true",
+                     help="report type errors, as check does, and run only when there are none")
+    run.add_argument("--macro-depth", type=int, metavar="N",
+                     help="fail when macros that use macros nest more than N deep (default 32)")
+    run.set_defaults(func=cmd_run)
+
+    comp = commands.add_parser("compile", help="print the generated Python")
+    comp.add_argument("path")
+    comp.add_argument("-o", "--output", metavar="FILE", help="write to FILE instead of stdout")
+    comp.add_argument("--backend", choices=BACKENDS, default="string")
+    comp.add_argument("-O", dest="optimize", type=int, choices=OPTIMIZE_LEVELS, default=0,
+                      help="optimization level, as for run")
+    comp.add_argument("--no-inline", action="store_true", help="leave every call as written")
+    comp.add_argument("--macro-depth", type=int, metavar="N", help="macro nesting limit, as for run")
+    comp.set_defaults(func=cmd_compile)
+
+    check = commands.add_parser("check", help="report syntax and type errors without running")
+    check.add_argument("paths", nargs="+", metavar="path")
+    check.add_argument("--macro-depth", type=int, metavar="N", help="macro nesting limit, as for run")
+    check.set_defaults(func=cmd_check)
+
+    expand = commands.add_parser("expand", help="print the AST with every macro expanded")
+    expand.add_argument("path")
+    expand.add_argument("--macro-depth", type=int, metavar="N", help="macro nesting limit, as for run")
+    expand.set_defaults(func=cmd_expand)
+
+    # listed for --help only; main hands these straight to their own modules
+    commands.add_parser("profile", help="profile by Origin function and line")
+    commands.add_parser("serve", help="run jobs in a pool of warm workers")
+    return ap
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # serve and profile have their own argument parsers
+    if argv and argv[0] == "serve":
+        from server import main as serve_main
+        return serve_main(argv[1:])
+    if argv and argv[0] == "profile":
+        from profiler import main as profile_main
+        return profile_main(argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
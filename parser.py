@@ -1,16 +1,68 @@
-from pandas import value_counts
 from lexer import Token, lex
 from classes import *
+from macros import MacroTable
+
+# Binding power of each infix operator; higher binds tighter. Prefix
+# operators are handled in Parser.expression.
+INFIX_BINDING = {
+    "->": 10,
+    "??": 20,
+    "||": 30, "or": 30,
+    "&&": 40, "and": 40,
+    "==": 60, "!=": 60, "===": 60, "!==": 60, "<>": 60,
+    "<": 60, ">": 60, "<=": 60, ">=": 60,
+    "|": 70,
+    "^": 80,
+    "&": 90,
+    "<<": 100, ">>": 100,
+    "+": 110, "-": 110,
+    "*": 120, "/": 120, "//": 120, "%": 120,
+    "**": 140,
+}
+RIGHT_ASSOCIATIVE = frozenset(("**",))
+NOT_BINDING = 50
+PREFIX_BINDING = 130
+INFIX_NODES = {"ARITH": BinOpNode, "COMP": BinOpNode, "LOGIC": LogicOpNode, "SPECIAL": SpecialOpNode}
+# Built-in stages of a `->` pipeline, each taking one argument
+PIPELINE_STAGES = ("map", "filter", "take")
+# Operators `parallel for ... reduce <op>` accepts; runtime.REDUCERS
+# implements them
+REDUCE_OPS = ("+", "*", "&", "|", "^", "min", "max")
 
 class Parser:
-    def __init__(self, tokens):
+    # macro_depth limits how deeply macros that use macros may expand;
+    # None is macros.MAX_DEPTH
+    def __init__(self, tokens, macro_depth=None):
         self.tokens = tokens
         self.pos = 0
+        self.macros = MacroTable(macro_depth)
+        # true while parsing a macro's template, whose macro uses expand
+        # only when the macro itself is used
+        self.in_template = False
+        # whether `await` is allowed here: at module level, which runs on an
+        # event loop when it awaits, and in async functions and blocks
+        self.in_async = True
+        # whether `yield` is allowed here: directly in a function body, not
+        # in a parallel for body or async block, which are functions of their
+        # own
+        self.can_yield = False
+        # whether return, and break and continue, are allowed here: neither
+        # is directly in an async block, whose statements each run as a
+        # task, and break and continue are again inside a loop in one
+        self.can_return = True
+        self.can_break = True
 
     def current_token(self):
-        if self.pos < len(self.tokens):
+        try:
             return self.tokens[self.pos]
-        return Token("EOF", "", -1, -1)
+        except IndexError:
+            return Token("EOF", "", -1, -1)
+
+    def peek(self):
+        try:
+            return self.tokens[self.pos + 1]
+        except IndexError:
+            return Token("EOF", "", -1, -1)
 
     def eat(self, type_):
         tok = self.current_token()
@@ -21,55 +73,85 @@ class Parser:
 
 
     def factor(self):
-        self.skip_newlines()
         tok = self.current_token()
+        if tok.type == "NEWLINE":
+            self.skip_newlines()
+            tok = self.current_token()
+        node = self.primary(tok)
+        node.line = tok.line
+        node.col = tok.col
+        return node
+
+    # Operands: literals, names with their index/call suffixes, parentheses,
+    # the built-in keyword forms and prefix operators. tok is the current token.
+    def primary(self, tok):
+        if tok.type == "IDENT":
+            self.pos += 1
+            node = VarNode(tok.value)
+            name = tok
+            tok = self.current_token()
+            if tok.type == "SYMBOL" and tok.value == "(" and name.value in self.macros.macros \
+                    and not self.in_template:
+                node = self.macros.expand(name.value, self.call_args(), name, self.in_async, self.can_yield)
+                if isinstance(node, list):
+                    raise SyntaxError(f"Macro {name.value} expands to statements, not a value")
+                tok = self.current_token()
+            while True:
+                if tok.type == "BRACKET" and tok.value == "[":
+                    self.pos += 1
+                    index = self.expression()
+                    self.eat("BRACKET")
+                    node = IndexNode(node, index)
+
+                elif tok.type == "SYMBOL" and tok.value == "(":
+                    node = CallNode(node, self.call_args())
+
+                elif tok.type == "SYMBOL" and tok.value == ".":
+                    self.pos += 1
+                    node = AttrNode(node, self.eat("IDENT").value)
+
+                else:
+                    return node
+                tok = self.current_token()
 
         if tok.type == "INT":
-            self.eat("INT")
+            self.pos += 1
             return NumberNode(int(tok.value))
 
         if tok.type == "FLOAT":
-            self.eat("FLOAT")
+            self.pos += 1
             return NumberNode(float(tok.value))
 
-        
         if tok.type == "STRING":
-            self.eat("STRING")
+            self.pos += 1
             return StringNode(tok.value[1:-1] )
         
+        if tok.type == "UNARY" or (tok.type == "ARITH" and tok.value in ("-", "+")):
+            self.pos += 1
+            return UnaryOpNode(tok.value, self.expression(PREFIX_BINDING))
+
+        if tok.type == "LOGIC" and tok.value in ("not", "!"):
+            self.pos += 1
+            return NotNode(self.expression(NOT_BINDING))
+
         if tok.type == "KEYWORD" and tok.value == "range":
             self.eat("KEYWORD")          
             self.eat("SYMBOL")         
-            start = self.comparison()
+            start = self.expression()
             self.eat("SYMBOL")          
-            end = self.comparison()
+            end = self.expression()
             self.eat("SYMBOL")          
             return RangeNode(start, end)
-        if tok.type == "IDENT":
-            node = VarNode(self.eat("IDENT").value)
-            while True:
-                if self.current_token().type == "BRACKET" and self.current_token().value == "[":
-                    self.eat("BRACKET")
-                    index = self.comparison()
-                    self.eat("BRACKET")
-                    node = IndexNode(node, index)
 
-                elif self.current_token().type == "SYMBOL" and self.current_token().value == "(":
-                    self.eat("SYMBOL")  # (
-                    args = []
-                    if not (self.current_token().type == "SYMBOL" and self.current_token().value == ")"):
-                        args.append(self.comparison())
-                        while self.current_token().type == "SYMBOL" and self.current_token().value == ",":
-                            self.eat("SYMBOL")
-                            args.append(self.comparison())
-                    self.eat("SYMBOL")  # )
-                    node = CallNode(node, args)
+        if tok.type == "KEYWORD" and tok.value == "parallel":
+            return self.parallel_for()
 
-                else:
-                    break
+        if tok.type == "KEYWORD" and tok.value == "await":
+            if not self.in_async:
+                raise SyntaxError("'await' outside of an async function")
+            self.eat("KEYWORD")
+            return AwaitNode(self.expression(PREFIX_BINDING))
 
-            return node
-        
         if tok.type == "KEYWORD" and tok.value == "input":
             self.eat("KEYWORD")
             prompt = None
@@ -78,10 +160,10 @@ class Parser:
             return InputNode(prompt)
             
         
-        if tok.type == "BRACKET" and tok.value == "(":
-            self.eat("BRACKET")
-            node = self.comparison()
-            self.eat("BRACKET")
+        if tok.type == "SYMBOL" and tok.value == "(":
+            self.eat("SYMBOL")
+            node = self.expression()
+            self.eat("SYMBOL")
             return node
 
         if tok.type == "BRACKET" and tok.value == "[":
@@ -89,7 +171,7 @@ class Parser:
         if tok.type == "KEYWORD" and tok.value in ("int", "str", "float"):
             func_name = self.eat("KEYWORD").value
             self.eat("SYMBOL")  # (
-            arg = self.comparison()
+            arg = self.expression()
             self.eat("SYMBOL")  # )
             return CastNode(func_name, arg)
         
@@ -103,80 +185,144 @@ class Parser:
         if tok.type == "KEYWORD" and tok.value == "len":
             self.eat("KEYWORD") 
             self.eat("SYMBOL") 
-            expr_node = self.comparison() 
+            expr_node = self.expression() 
             self.eat("SYMBOL")  
             return LenNode(expr_node)
         raise SyntaxError(f"Unexpected token {tok}")
 
 
+    # (arg, ...) after a name, as a list of expressions
+    def call_args(self):
+        self.eat("SYMBOL")  # (
+        args = []
+        if not (self.current_token().type == "SYMBOL" and self.current_token().value == ")"):
+            args.append(self.expression())
+            while self.current_token().type == "SYMBOL" and self.current_token().value == ",":
+                self.eat("SYMBOL")
+                args.append(self.expression())
+        self.eat("SYMBOL")  # )
+        return args
+
     def list_literal(self):
         elements = []
         self.eat("BRACKET")  # [
 
         if self.current_token().value != "]":
-            elements.append(self.comparison())
+            elements.append(self.expression())
             while self.current_token().value == ",":
                 self.eat("SYMBOL")
-                elements.append(self.comparison())
+                elements.append(self.expression())
 
         self.eat("BRACKET")  # ]
         return ListNode(elements)
 
-    def term(self):
-        node = self.factor()
-        while self.current_token().type == "ARITH" and self.current_token().value in ("*", "/"):
-            op = self.eat("ARITH").value
-            node = BinOpNode(node, op, self.factor())
-        return node
-
-    def expr(self):
-        node = self.term()
-        while self.current_token().type == "ARITH" and self.current_token().value in ("+", "-"):
-            op = self.eat("ARITH").value
-            node = BinOpNode(node, op, self.term())
-        return node
+    # Pratt expression parser over INFIX_BINDING: parses an operand and every
+    # operator after it that binds tighter than min_binding. Each token is
+    # looked at once, and infix() only recurses when the next operator binds
+    # tighter than the current one.
+    def expression(self, min_binding=0):
+        return self.infix(self.factor(), min_binding)
 
-    def comparison(self):
-        node = self.expr()
-        if self.current_token().type == "COMP":
-            op = self.eat("COMP").value
-            right = self.expr()
-            return BinOpNode(node, op, right)
-        return node
+    def infix(self, left, min_binding):
+        while True:
+            tok = self.current_token()
+            binding = INFIX_BINDING.get(tok.value)
+            if binding is None or binding <= min_binding or tok.type not in INFIX_NODES:
+                return left
+            self.pos += 1
+            if tok.value in RIGHT_ASSOCIATIVE:
+                binding -= 1
+            right = self.factor()
+            after = self.current_token()
+            after_binding = INFIX_BINDING.get(after.value)
+            if after_binding is not None and after_binding > binding and after.type in INFIX_NODES:
+                right = self.infix(right, binding)
+            if tok.value == "->":
+                node = self.pipeline(left, right)
+            else:
+                node = INFIX_NODES[tok.type](left, tok.value, right)
+            node.line = left.line
+            node.col = left.col
+            left = node
+
+    # left -> right, with a pipeline on the left extended rather than nested
+    def pipeline(self, left, right):
+        if isinstance(right, CallNode) and isinstance(right.func_name, VarNode) \
+                and right.func_name.name in PIPELINE_STAGES:
+            if len(right.arg) != 1:
+                raise SyntaxError(f"Pipeline stage {right.func_name.name} takes 1 argument, got {len(right.arg)}")
+            right = StageNode(right.func_name.name, right.arg[0])
+        if isinstance(left, PipelineNode):
+            left.stages.append(right)
+            return left
+        return PipelineNode(left, [right])
 
     def assignment(self):
         self.eat("KEYWORD")
         name = self.eat("IDENT").value
         self.eat("ASSIGN")
-        value = self.comparison()
+        value = self.expression()
         return AssignNode(name, value)
 
     def print_stmt(self):
         self.eat("KEYWORD")
-        return PrintNode(self.comparison())
+        return PrintNode(self.expression())
     
     def block(self):
         statements = []
         self.eat("BRACKET")  
+        self.skip_newlines()
 
         while not (self.current_token().type == "BRACKET" and self.current_token().value == "}"):
-            statements.append(self.statement())
+            node = self.statement()
+            if isinstance(node, list):
+                statements.extend(node)
+            else:
+                statements.append(node)
             while self.current_token().type == "NEWLINE":
                 self.eat("NEWLINE")
 
         self.eat("BRACKET")  # }
         return BlockNode(statements)
+
+    # A block whose statements may await only when in_async is true, and
+    # yield only when can_yield is. The statements of a task block may not
+    # return, break or continue.
+    def scoped_block(self, in_async, can_yield, tasks=False):
+        outer = self.in_async, self.can_yield, self.can_return, self.can_break
+        self.in_async, self.can_yield = in_async, can_yield
+        self.can_return = self.can_break = not tasks
+        try:
+            return self.block()
+        finally:
+            self.in_async, self.can_yield, self.can_return, self.can_break = outer
+
+    # The body of a loop, where break and continue are allowed
+    def loop_block(self):
+        outer = self.can_break
+        self.can_break = True
+        try:
+            return self.block()
+        finally:
+            self.can_break = outer
+
+    # The value after return or yield, or None when the statement ends there
+    def optional_value(self):
+        tok = self.current_token()
+        if tok.type in ("NEWLINE", "EOF") or tok.type == "BRACKET" and tok.value == "}":
+            return None
+        return self.expression()
     
     def len_stmt(self):
         self.eat("KEYWORD")
         self.eat("SYMBOL")
-        value = self.comparison()
+        value = self.expression()
         self.eat("SYMBOL")
         return LenNode(value)
     
     def if_stmt(self):
         self.eat("KEYWORD")  # 'if'
-        condition = self.comparison()
+        condition = self.expression()
         then_body = self.block()
 
         elif_nodes = []
@@ -185,7 +331,7 @@ class Parser:
             tok = self.current_token()
             if tok.type == "KEYWORD" and tok.value == "elif":
                 self.eat("KEYWORD")
-                elif_condition = self.comparison()
+                elif_condition = self.expression()
                 elif_body = self.block()
                 elif_nodes.append(ElifNode(elif_condition, elif_body))
             else:
@@ -201,36 +347,87 @@ class Parser:
 
     def while_stmt(self):
         self.eat("KEYWORD")
-        condition = self.comparison()
-        body = self.block()
+        condition = self.expression()
+        body = self.loop_block()
         return WhileNode(condition, body)
 
     def class_stmt(self):
-        self.eat("KEYWORD")  
+        self.eat("KEYWORD")
         class_name = self.eat("IDENT").value
-        self.eat("BRACKET") 
+        self.eat("BRACKET")
 
         fields = []
         methods = {}
 
-        while not (self.current_token().type == "BRACKET" and self.current_token().value == "}"):
+        while True:
+            self.skip_newlines()
             tok = self.current_token()
+            if tok.type == "BRACKET" and tok.value == "}":
+                break
             if tok.type == "KEYWORD" and tok.value == "let":
-                self.eat("KEYWORD")
-                field_name = self.eat("IDENT").value
-                fields.append(field_name)
-                
-            if tok.type == "KEYWORD" and tok.value == "def":
+                fields.append(self.field(class_name, fields))
+            elif tok.type == "KEYWORD" and tok.value == "def":
                 method = self.func_stmt()
+                method.line = tok.line
+                method.col = tok.col
                 methods[method.name] = method
             else:
                 raise SyntaxError(f"Unexpected Token: {tok.type} in class {class_name}")
-        
-    def func_stmt(self):
+        self.eat("BRACKET")
+        return ClassNode(class_name, fields, methods)
+
+    # struct Name { let a  let b }, or struct Name as columns { ... }
+    def struct_stmt(self):
+        self.eat("KEYWORD")
+        name = self.eat("IDENT").value
+        columns = False
+        tok = self.current_token()
+        if tok.type == "KEYWORD" and tok.value == "as":
+            self.eat("KEYWORD")
+            layout = self.eat("IDENT").value
+            if layout != "columns":
+                raise SyntaxError(f"Expected 'columns' after 'as' in struct {name}, got {layout}")
+            columns = True
+        self.eat("BRACKET")
+        fields = []
+        while True:
+            self.skip_newlines()
+            tok = self.current_token()
+            if tok.type == "BRACKET" and tok.value == "}":
+                break
+            if not (tok.type == "KEYWORD" and tok.value == "let"):
+                raise SyntaxError(f"Expected 'let' in struct {name}, got {tok.type} ({tok.value})")
+            fields.append(self.field(name, fields))
+        self.eat("BRACKET")
+        return StructNode(name, fields, columns)
+
+    # let name in a class or struct body, optionally followed by , or ;
+    def field(self, owner, fields):
+        self.eat("KEYWORD")
+        name = self.eat("IDENT").value
+        if name in fields:
+            raise SyntaxError(f"Duplicate field {name} in {owner}")
+        # the generated __init__ takes self, dunder names belong to Python,
+        # and Python mangles other names that start with __ inside a class
+        if name == "self" or name.startswith("__"):
+            raise SyntaxError(f"Field {name} in {owner} clashes with a name the generated class uses")
+        tok = self.current_token()
+        if tok.type == "SYMBOL" and tok.value in (",", ";"):
+            self.eat("SYMBOL")
+        return name
+
+    def func_stmt(self, is_async=False):
         self.eat("KEYWORD")     
         name = self.eat("IDENT").value  
-        self.eat("SYMBOL")               
+        params = self.param_list()
+        body = self.scoped_block(is_async, True)
+        if is_async:
+            return AsyncFuncNode(name, params, body)
+        return FuncNode(name, params, body)
 
+    # (name, ...) after a function or macro name, as a list of names
+    def param_list(self):
+        self.eat("SYMBOL")
         params = []
         while self.current_token().type != "SYMBOL" or self.current_token().value != ")":
             tok = self.current_token()
@@ -241,32 +438,98 @@ class Parser:
                 self.eat("SYMBOL")        
             else:
                 raise SyntaxError(f"Unexpected token in parameter list: {tok.type} ({tok.value})")
+        self.eat("SYMBOL")
+        return params
+
+    # macro name(...) { ... } or macro name(...) = expression. The template
+    # is parsed once here; uses expand it in place, so the definition itself
+    # leaves no statement behind.
+    def macro_stmt(self):
+        if self.in_template:
+            raise SyntaxError("Cannot define a macro inside a macro")
+        self.eat("KEYWORD")
+        name = self.eat("IDENT").value
+        params = self.param_list()
+        self.in_template = True
+        try:
+            if self.current_token().type == "ASSIGN":
+                self.eat("ASSIGN")
+                outer = self.in_async
+                self.in_async = True
+                try:
+                    body = self.expression()
+                finally:
+                    self.in_async = outer
+                is_expression = True
+            else:
+                body = self.scoped_block(True, True).statements
+                is_expression = False
+        finally:
+            self.in_template = False
+        self.macros.define(name, params, body, is_expression)
+        return []
+
+    # A use of a statement macro: the statements it expands to
+    def macro_use(self):
+        name = self.eat("IDENT")
+        args = self.call_args()
+        tok = self.current_token()
+        if not (tok.type in ("NEWLINE", "EOF") or tok.type == "BRACKET" and tok.value == "}"):
+            raise SyntaxError(f"Macro {name.value} expands to statements, so it must be used on its own")
+        return self.macros.expand(name.value, args, name, self.in_async, self.can_yield)
 
-        self.eat("SYMBOL")              
-        body = self.block()            
-        return FuncNode(name, params, body)
+    # async def name(...) { ... } or async { ... }
+    def async_stmt(self):
+        self.eat("KEYWORD")
+        tok = self.current_token()
+        if tok.type == "KEYWORD" and tok.value == "def":
+            return self.func_stmt(is_async=True)
+        if not (tok.type == "BRACKET" and tok.value == "{"):
+            raise SyntaxError(f"Expected 'def' or '{{' after 'async', got {tok.type} ({tok.value})")
+        if not self.in_async:
+            raise SyntaxError("'async' block outside of an async function")
+        body = self.scoped_block(True, False, tasks=True)
+        for stmt in body.statements:
+            if isinstance(stmt, CompoundAssignNode):
+                raise SyntaxError(f"Cannot update {stmt.name} in an async block; bind the result with let")
+        return AsyncBlockNode(body.statements)
 
     def for_stmt(self):
         self.eat("KEYWORD")
         var_name = self.eat("IDENT").value
         self.eat("KEYWORD")  
-        iterable = self.comparison()
-        body = self.block()
+        iterable = self.expression()
+        body = self.loop_block()
         return ForNode(var_name, iterable, body)
-    def unary(self):
+
+    # parallel [threads] [workers N] for x in xs [reduce op] { ... }
+    def parallel_for(self):
+        self.eat("KEYWORD")
+        threads = False
+        workers = None
+        while self.current_token().type == "IDENT" and self.current_token().value in ("threads", "workers"):
+            if self.eat("IDENT").value == "threads":
+                threads = True
+            else:
+                workers = self.expression()
         tok = self.current_token()
-        if tok.type == "UNARY" or (tok.type == "LOGIC" and tok.value in ("not", "!")):
-            op = self.eat(tok.type).value
-            node = self.unary()
-            return UnaryOpNode(op, node)
-        return self.factor()
-    def logic(self):
-        node = self.comparison()
-        while self.current_token().type == "LOGIC":
-            op = self.eat("LOGIC").value
-            right = self.comparison()
-            node = LogicOpNode(node, op, right)
-        return node
+        if not (tok.type == "KEYWORD" and tok.value == "for"):
+            raise SyntaxError(f"Expected 'for' after 'parallel', got {tok.type} ({tok.value})")
+        self.eat("KEYWORD")
+        var_name = self.eat("IDENT").value
+        self.eat("KEYWORD")  # in
+        iterable = self.expression()
+        reduce = None
+        if self.current_token().type == "IDENT" and self.current_token().value == "reduce":
+            self.eat("IDENT")
+            tok = self.current_token()
+            if tok.value not in REDUCE_OPS:
+                raise SyntaxError(f"Cannot reduce with {tok.value!r}, expected one of {', '.join(REDUCE_OPS)}")
+            self.pos += 1
+            reduce = tok.value
+        body = self.scoped_block(False, False)
+        return ParallelForNode(var_name, iterable, body, workers, threads, reduce)
+
     def import_stmt(self):
         self.eat("KEYWORD")
         name_token = self.eat("IDENT")
@@ -276,42 +539,47 @@ class Parser:
     #     node = self.factor()
     #     while self.current_token().type == "SYMBOL" and self.current_token().value == "(":
     #         self.eat("SYMBOL")
-    #         arg = self.comparison()
+    #         arg = self.expression()
     #         self.eat("SYMBOL")
     #         node = CallNode(node.name if isinstance(node, VarNode) else node, arg)
     #     return node
         
-    def special_expr(self):
-        node = self.logic()
-        while self.current_token().type == "SPECIAL":
-            op = self.eat("SPECIAL").value
-            right = self.logic()
-            node = SpecialOpNode(node, op, right)
+    # One statement, or a list of them where a macro was defined or used
+    def statement(self):
+        self.skip_newlines()
+        tok = self.current_token()
+        node = self.simple_statement()
+        if isinstance(node, list):
+            return node
+        node.line = tok.line
+        node.col = tok.col
         return node
 
-    def statement(self):
-        self.skip_newlines() 
+    def simple_statement(self):
         if self.current_token().type == "IDENT":
-            start_pos = self.pos
-            target = self.comparison()
-
-            if self.current_token().type == "ASSIGN":
+            macro = None if self.in_template else self.macros.get(self.current_token().value)
+            if macro is not None and not macro.is_expression and self.peek().value == "(":
+                return self.macro_use()
+            # One pass over the expression; the token after it decides
+            # whether it was an assignment target
+            target = self.expression()
+            tok = self.current_token()
+            if tok.type == "ASSIGN":
                 self.eat("ASSIGN")
-                value = self.comparison()
+                value = self.expression()
                 if isinstance(target, IndexNode):
                     return IndexAssignNode(target.collection, target.index, value)
                 if isinstance(target, VarNode):
                     return AssignNode(target.name, value)
-
-            if isinstance(target, VarNode) and self.current_token().type == "ASSIGN_OP":
+                if isinstance(target, AttrNode):
+                    return AttrAssignNode(target.value, target.name, value)
+                raise SyntaxError(f"Cannot assign to {target}")
+            if tok.type == "ASSIGN_OP" and isinstance(target, VarNode):
                 op = self.eat("ASSIGN_OP").value
-                value = self.comparison()
+                value = self.expression()
                 return CompoundAssignNode(target.name, op, value)
+            return target
 
-            self.pos = start_pos
-                
-        
-        self.skip_newlines()
         tok = self.current_token()
         if tok.type == "KEYWORD":
             if tok.value in ("elif", "else"):
@@ -326,35 +594,63 @@ class Parser:
                 return self.while_stmt()
             if tok.value == "def":
                 return self.func_stmt()
+            if tok.value == "async":
+                return self.async_stmt()
+            if tok.value == "inline":
+                self.eat("KEYWORD")
+                tok = self.current_token()
+                if not (tok.type == "KEYWORD" and tok.value == "def"):
+                    raise SyntaxError(f"Expected 'def' after 'inline', got {tok.type} ({tok.value})")
+                node = self.func_stmt()
+                node.inline = True
+                return node
             if tok.value == "class":
                 return self.class_stmt()
+            if tok.value == "struct":
+                return self.struct_stmt()
+            if tok.value == "macro":
+                return self.macro_stmt()
             if tok.value == "for":
                 return self.for_stmt()
             if tok.value == "len": 
                 return self.len_stmt()
             if tok.value == "import":
                 return self.import_stmt()
-            if tok.value == "break":
-                self.eat("KEYWORD")
-                return BreakNode()
-            if tok.value == "continue":
+            if tok.value in ("break", "continue"):
+                if not self.can_break:
+                    raise SyntaxError(f"'{tok.value}' in an async block must be inside a loop in the block")
                 self.eat("KEYWORD")
-                return ContinueNode()
+                return BreakNode() if tok.value == "break" else ContinueNode()
             if tok.type == "KEYWORD" and tok.value == "return":
+                if not self.can_return:
+                    raise SyntaxError("'return' inside an async block; bind the value with let and return "
+                                      "after the block")
                 self.eat("KEYWORD")
-                return ReturnNode(self.comparison())
+                return ReturnNode(self.optional_value())
             if tok.type == "KEYWORD" and tok.value == "yield":
+                if not self.can_yield:
+                    raise SyntaxError("'yield' outside of a function")
                 self.eat("KEYWORD")
-                return YieldNode(self.comparison())
-        return self.comparison()
+                return YieldNode(self.optional_value())
+        return self.expression()
 
     def program(self):
-        statements = []
+        return ProgramNode(list(self.statements()))
+
+    # Yields top-level statements one at a time. With a TokenStream, tokens
+    # behind each finished statement are released so memory stays bounded.
+    def statements(self):
+        release = getattr(self.tokens, "release", None)
         while self.current_token().type != "EOF":
-            statements.append(self.statement())
+            node = self.statement()
+            if isinstance(node, list):
+                yield from node
+            else:
+                yield node
             while self.current_token().type == "NEWLINE":
                 self.eat("NEWLINE")
-        return ProgramNode(statements)
+            if release is not None:
+                release(self.pos)
     
     def skip_newlines(self):
         while self.current_token().type == "NEWLINE":
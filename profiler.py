@@ -0,0 +1,166 @@
+import argparse
+import cProfile
+import pstats
+import signal
+import sys
+from collections import Counter
+
+from compiler import TOP_LEVEL_AWAIT, execute, parse, source_lines
+
+MODES = ("cprofile", "sample")
+MODULE = "<module>"
+
+
+# Compiles an Origin program for profiling. The generated code is compiled
+# under the Origin filename, and source_map turns its line numbers back into
+# Origin lines.
+class ProfiledProgram:
+    def __init__(self, source, filename="<origin>"):
+        from interpreter import Interpreter
+        origin = Interpreter()
+        self.filename = filename
+        self.lines = source_lines(source)
+        self.python = origin.generate(parse(source))
+        self.source_map = origin.source_map
+        self.code = compile(self.python, filename, "exec", flags=TOP_LEVEL_AWAIT)
+
+    def origin_line(self, line):
+        if 0 < line <= len(self.source_map):
+            mapped = self.source_map[line - 1]
+            if mapped is not None:
+                return mapped
+        return line
+
+    def source_text(self, line):
+        if 0 < line <= len(self.lines):
+            return self.lines[line - 1]
+        return ""
+
+    def run(self):
+        namespace = {"__name__": "__main__"}
+        execute(self.code, namespace)
+        return namespace
+
+
+# Per-function call counts and times from cProfile, keyed by
+# (Origin function name, Origin line of its definition)
+class FunctionReport:
+    def __init__(self, program, stats):
+        self.program = program
+        self.rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            if filename != program.filename:
+                continue
+            where = 0 if name == MODULE else program.origin_line(line)
+            self.rows.append((name, where, calls, tottime, cumtime))
+        self.rows.sort(key=lambda row: row[3], reverse=True)
+
+    def table(self, limit=None):
+        out = [f"{'calls':>9}  {'self s':>9}  {'total s':>9}  function"]
+        for name, line, calls, tottime, cumtime in self.rows[:limit]:
+            where = f"{name} (line {line})" if line else name
+            out.append(f"{calls:>9}  {tottime:>9.4f}  {cumtime:>9.4f}  {where}")
+        return "\n".join(out)
+
+
+# Samples of the Origin call stack taken on SIGPROF. Each sample is a tuple
+# of (function, Origin line) frames, outermost first.
+class SampleReport:
+    def __init__(self, program, samples, interval):
+        self.program = program
+        self.samples = samples
+        self.interval = interval
+
+    def line_counts(self):
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1][1]] += count
+            for line in set(line for _, line in stack):
+                total[line] += count
+        return own, total
+
+    def table(self, limit=None):
+        own, total = self.line_counts()
+        count = sum(self.samples.values()) or 1
+        out = [f"{'self %':>7}  {'total %':>7}  {'self s':>8}  {'line':>5}  source"]
+        for line, samples in own.most_common(limit):
+            out.append(f"{100 * samples / count:>7.1f}  {100 * total[line] / count:>7.1f}  "
+                       f"{samples * self.interval:>8.3f}  {line:>5}  {self.program.source_text(line)}")
+        return "\n".join(out)
+
+    # One line per distinct stack, "frame;frame;frame count", as read by
+    # flamegraph.pl, speedscope and similar tools
+    def collapsed(self):
+        out = []
+        for stack, count in sorted(self.samples.items()):
+            out.append(";".join(f"{name}:{line}" for name, line in stack) + f" {count}")
+        return "\n".join(out)
+
+
+def profile_cprofile(program):
+    profile = cProfile.Profile()
+    profile.runcall(program.run)
+    return FunctionReport(program, pstats.Stats(profile))
+
+
+def profile_sample(program, interval=0.001):
+    if not hasattr(signal, "setitimer"):
+        raise RuntimeError("Sampling needs signal.setitimer, which this platform lacks")
+    samples = Counter()
+    filename = program.filename
+    origin_line = program.origin_line
+
+    def sample(signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename == filename:
+                stack.append((code.co_name, origin_line(frame.f_lineno)))
+            frame = frame.f_back
+        if stack:
+            samples[tuple(reversed(stack))] += 1
+
+    previous = signal.signal(signal.SIGPROF, sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        program.run()
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+    return SampleReport(program, samples, interval)
+
+
+def profile_origin(source, filename="<origin>", mode="cprofile", interval=0.001):
+    program = ProfiledProgram(source, filename)
+    if mode == "cprofile":
+        return profile_cprofile(program)
+    if mode == "sample":
+        return profile_sample(program, interval)
+    raise ValueError(f"Unknown profile mode {mode!r}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="origin profile",
+                                 description="Profile an Origin program by Origin function and line")
+    ap.add_argument("path")
+    ap.add_argument("--mode", choices=MODES, default="sample")
+    ap.add_argument("--interval", type=float, default=0.001, help="seconds between samples")
+    ap.add_argument("--limit", type=int, default=20, help="rows to print")
+    ap.add_argument("--collapsed", metavar="FILE", help="write collapsed stacks for a flamegraph (sample mode)")
+    args = ap.parse_args(argv)
+    if args.collapsed and args.mode != "sample":
+        ap.error("--collapsed needs --mode sample")
+
+    with open(args.path, "r") as file:
+        source = file.read()
+    report = profile_origin(source, args.path, args.mode, args.interval)
+    print(report.table(args.limit), file=sys.stderr)
+    if args.collapsed:
+        with open(args.collapsed, "w") as file:
+            file.write(report.collapsed() + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
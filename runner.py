@@ -1,19 +1,50 @@
-from lexer import lex
-from parser import Parser
-from interpreter import Interpreter
-# Example code as if it were in code.txt
-code_lines = []
-with open("code.txt", 'r') as file:
-        for line in file:
-            code_lines.append(line.strip())
-
-# 1. Tokenize the code
-tokens = lex(code_lines)
-
-# 2. Parse tokens into an AST
-parser = Parser(tokens)
-ast = parser.program()
-
-origin = interpreter()
-origin_code = origin.generate(ast)
-exec(origin_code)
+import argparse
+import sys
+
+from cache import CACHE_DIR_NAME, CodeCache
+from compiler import BACKENDS, TOP_LEVEL_AWAIT, execute, run_origin, run_with_stats
+
+
+def run(path, use_cache=True, backend="string", show_stats=False, track_memory=False):
+    with open(path, 'r') as file:
+        source = file.read()
+
+    # Lex, parse and generate, unless this exact source was compiled before
+    cache = CodeCache.for_source_file(path) if use_cache else None
+    if show_stats:
+        _, stats = run_with_stats(source, path, cache, backend, track_memory)
+        print(stats.report(), file=sys.stderr)
+    else:
+        run_origin(source, path, cache, backend=backend)
+
+
+# Lexes, parses, generates and runs one top-level statement at a time, so
+# memory is bounded by the largest statement instead of the whole file.
+def run_stream(path):
+    from lexer import TokenStream, lex_stream
+    from parser import Parser
+    from interpreter import Interpreter
+
+    namespace = {"__name__": "__main__"}
+    origin = Interpreter()
+    with open(path, 'r') as file:
+        parser = Parser(TokenStream(lex_stream(file)))
+        for code in origin.generate_stream(parser.statements()):
+            execute(compile(code, path, "exec", flags=TOP_LEVEL_AWAIT), namespace)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run an Origin program")
+    ap.add_argument("path", nargs="?", default="code.txt")
+    ap.add_argument("--stream", action="store_true", help="lex, parse and run one statement at a time")
+    ap.add_argument("--no-cache", action="store_true", help="do not read or write " + CACHE_DIR_NAME)
+    ap.add_argument("--backend", choices=BACKENDS, default="string", help="code generator to compile with")
+    ap.add_argument("--stats", action="store_true", help="print time and sizes per pipeline phase to stderr")
+    ap.add_argument("--memory", action="store_true",
+                    help="with --stats, also trace peak memory per phase (slows compile and exec severalfold)")
+    args = ap.parse_args()
+    if args.stream:
+        run_stream(args.path)
+    else:
+        run(args.path, use_cache=not args.no_cache, backend=args.backend, show_stats=args.stats or args.memory,
+            track_memory=args.memory)
@@ -0,0 +1,364 @@
+import functools
+import operator
+import os
+import sys
+
+# Support code that generated programs import at run time. Kept free of
+# heavy imports: the pool machinery is loaded by the first parallel loop.
+
+# Folds for `parallel for ... reduce <op>`, keyed as parser.REDUCE_OPS
+REDUCERS = {
+    "+": operator.add, "*": operator.mul, "&": operator.and_, "|": operator.or_, "^": operator.xor,
+    "min": min, "max": max,
+}
+# Chunks handed out per worker, so a slow chunk does not leave the others idle
+CHUNKS_PER_WORKER = 4
+
+# Body and items of the parallel loop a forked pool worker serves
+_body = None
+_items = None
+
+
+# Runs body(item) for every item on a pool of workers and returns the
+# results in input order, or, with reduce, the results folded left to right
+# in input order, so the value does not depend on the number of workers or
+# how the items were chunked. What the body prints is collected per chunk
+# and written out in input order too. Processes are forked, so the body and
+# items are inherited rather than pickled, and only results and output cross
+# back; threads are used when asked for or where fork is unavailable. The
+# first exception in input order is raised after the output before it.
+def parallel_for(body, iterable, workers=None, threads=False, reduce=None):
+    items = list(iterable)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError(f"parallel for needs a positive number of workers, got {workers!r}")
+    results = _map(body, items, workers, threads)
+    if reduce is None:
+        return results
+    if not results:
+        raise ValueError(f"parallel for cannot reduce with {reduce} over an empty iterable")
+    return functools.reduce(REDUCERS[reduce], results)
+
+
+def chunk_size(count, workers):
+    return max(1, -(-count // (workers * CHUNKS_PER_WORKER)))
+
+
+def _map(body, items, workers, threads):
+    if workers == 1 or len(items) <= 1:
+        return [body(item) for item in items]
+    size = chunk_size(len(items), workers)
+    chunks = [(start, min(start + size, len(items))) for start in range(0, len(items), size)]
+    workers = min(workers, len(chunks))
+    stdout = sys.stdout
+    if threads or not _can_fork():
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(workers)
+        capture = _ThreadOutput(stdout)
+        run = functools.partial(capture.run, body, items)
+        sys.stdout = capture
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # forked workers would print anything still buffered a second time
+        sys.stdout.flush()
+        sys.stderr.flush()
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"),
+                                       initializer=_install, initargs=(body, items))
+        run = _run_chunk
+    results = []
+    try:
+        futures = [executor.submit(run, start, stop) for start, stop in chunks]
+        for future in futures:
+            try:
+                chunk, output = future.result()
+            except BaseException as error:
+                stdout.write(getattr(error, "_origin_output", ""))
+                raise
+            stdout.write(output)
+            results.extend(chunk)
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        sys.stdout = stdout
+    executor.shutdown(wait=True)
+    return results
+
+
+def _can_fork():
+    import multiprocessing
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _install(body, items):
+    global _body, _items
+    _body = body
+    _items = items
+
+
+# (results, printed output) of one chunk in a forked worker
+def _run_chunk(start, stop):
+    import io
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        return _run_items(_body, _items, start, stop, sys.stdout)
+    finally:
+        sys.stdout = stdout
+
+
+def _run_items(body, items, start, stop, buffer):
+    try:
+        return [body(items[i]) for i in range(start, stop)], buffer.getvalue()
+    except BaseException as error:
+        # exceptions pickle their __dict__, so this crosses back with them
+        error._origin_output = buffer.getvalue()
+        raise
+
+
+# Stands in for sys.stdout while a thread pool runs, sending each pool
+# thread's writes to a buffer of its own chunk
+class _ThreadOutput:
+    def __init__(self, stream):
+        import threading
+        self.stream = stream
+        self.local = threading.local()
+
+    def run(self, body, items, start, stop):
+        import io
+        self.local.buffer = io.StringIO()
+        try:
+            return _run_items(body, items, start, stop, self.local.buffer)
+        finally:
+            self.local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+# Runs coroutines concurrently on the running event loop and returns their
+# results in argument order. When one fails the rest are cancelled and
+# waited for, then the failure of the earliest failed coroutine in argument
+# order is raised as is, rather than wrapped in an ExceptionGroup as
+# asyncio.TaskGroup would.
+async def run_concurrently(*coroutines):
+    import asyncio
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException as error:
+        failure = error
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if isinstance(failure, Exception):
+        failure = next((task.exception() for task in tasks if not task.cancelled() and task.exception()), failure)
+    raise failure
+
+
+# Loops shorter than this run element by element; handing them to NumPy
+# costs more than it saves
+VECTOR_MIN = 256
+# Integers up to this size add, multiply and divide the same in int64 and
+# float64 as in Python
+EXACT_INT = 2 ** 53
+# The numpy module once looked for, False when it is not installed
+_numpy = None
+
+
+def _load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy
+
+
+# Raised when a vectorized loop has to run element by element instead
+class _Scalar(Exception):
+    pass
+
+
+# Runs the loop an optimizer.Vectorize spec describes for i in
+# range(start, stop) as whole-array NumPy operations and returns True.
+# Returns False, having changed nothing, when the loop could give anything
+# other than what running it element by element would: NumPy missing, a
+# short loop, lists too short, a list whose elements are not all ints or
+# all floats, integers too big for int64 and float64 to be exact, a
+# division by zero, or an infinite or nan float in // or %. values returns
+# the lists and numbers spec refers to.
+def vectorized(spec, start, stop, values):
+    if type(start) is not int or type(stop) is not int or start < 0 or stop - start < VECTOR_MIN:
+        return False
+    np = _load_numpy()
+    if not np:
+        return False
+    try:
+        values = values()
+    except (NameError, AttributeError):
+        return False
+    try:
+        with np.errstate(all="ignore"):
+            written = _Vectors(np, start, stop, values).run(spec)
+    except (_Scalar, OverflowError):
+        return False
+    for target, array in written:
+        target[start:stop] = array.tolist()
+    return True
+
+
+# Values of a vectorized loop body, as (data, is_int, bound): data is an
+# array with one element per iteration or a number the same for all of
+# them, and bound is the largest magnitude an int value can have
+class _Vectors:
+    def __init__(self, np, start, stop, values):
+        self.np = np
+        self.start = start
+        self.stop = stop
+        self.values = values
+        # id of each list read or written -> its elements as a value
+        self.lists = {}
+
+    # [(list, array)] to write back, once every statement has been run
+    def run(self, spec):
+        written = {}
+        for target, expr in spec:
+            lst = self._list(target)
+            data, is_int, bound = self.eval(expr)
+            if not isinstance(data, self.np.ndarray):
+                data = self.np.full(self.stop - self.start, data, dtype=self.np.int64 if is_int else self.np.float64)
+            self.lists[id(lst)] = data, is_int, bound
+            written[id(lst)] = lst
+        return [(lst, self.lists[key][0]) for key, lst in written.items()]
+
+    def eval(self, expr):
+        np = self.np
+        kind = expr[0]
+        if kind == "const":
+            return self._number(expr[1])
+        if kind == "number":
+            return self._number(self.values[expr[1]])
+        if kind == "index":
+            return np.arange(self.start, self.stop, dtype=np.int64), True, max(self.stop, self.start)
+        if kind == "list":
+            return self._elements(self._list(expr[1]))
+        if kind == "neg":
+            data, is_int, bound = self.eval(expr[1])
+            return -data, is_int, bound
+        left, left_int, left_bound = self.eval(expr[1])
+        right, right_int, right_bound = self.eval(expr[2])
+        is_int = left_int and right_int
+        if kind in ("/", "//", "%") and np.any(right == 0):
+            raise _Scalar()
+        if kind in ("//", "%") and not is_int and not (np.all(np.isfinite(left)) and np.all(np.isfinite(right))):
+            raise _Scalar()
+        if kind == "+":
+            data, bound = left + right, left_bound + right_bound
+        elif kind == "-":
+            data, bound = left - right, left_bound + right_bound
+        elif kind == "*":
+            data, bound = left * right, left_bound * right_bound
+        elif kind == "/":
+            data, bound, is_int = np.true_divide(left, right), 0, False
+        elif kind == "//":
+            data, bound = np.floor_divide(left, right), left_bound
+        else:
+            data, bound = np.remainder(left, right), right_bound
+        if is_int and bound > EXACT_INT:
+            raise _Scalar()
+        return data, is_int, bound
+
+    def _number(self, value):
+        if type(value) is int:
+            if abs(value) > EXACT_INT:
+                raise _Scalar()
+            return value, True, abs(value)
+        if type(value) is float:
+            return value, False, 0
+        raise _Scalar()
+
+    def _list(self, index):
+        lst = self.values[index]
+        if type(lst) is not list or len(lst) < self.stop:
+            raise _Scalar()
+        return lst
+
+    def _elements(self, lst):
+        value = self.lists.get(id(lst))
+        if value is not None:
+            return value
+        np = self.np
+        part = lst if self.start == 0 and self.stop == len(lst) else lst[self.start:self.stop]
+        kind = type(part[0])
+        # exact types, so no bools and no mix of ints and floats
+        if kind not in (int, float) or operator.countOf(map(type, part), kind) != len(part):
+            raise _Scalar()
+        if kind is int:
+            data = np.fromiter(part, np.int64, len(part))
+            bound = max(int(data.max()), -int(data.min()))
+            if bound > EXACT_INT:
+                raise _Scalar()
+            value = data, True, bound
+        else:
+            value = np.fromiter(part, np.float64, len(part)), False, 0
+        self.lists[id(lst)] = value
+        return value
+
+
+# Base of the classes `struct` lowers to. Each struct lists its fields as
+# __slots__, so a record has no __dict__; this gives records a readable
+# repr and field-by-field ==.
+class Struct:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name, None)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+
+# Base of the classes `struct Name as columns` lowers to: Name(size) holds
+# size records as one list per field, all starting at 0. records.field is
+# that field's list, records[i] is record i as a tuple in field order and
+# records[i] = (...) sets every field of it.
+class Columns:
+    __slots__ = ()
+
+    def __init__(self, size=0):
+        for name in self.__slots__:
+            setattr(self, name, [0] * size)
+
+    def __len__(self):
+        return len(getattr(self, self.__slots__[0])) if self.__slots__ else 0
+
+    def __getitem__(self, i):
+        return tuple(getattr(self, name)[i] for name in self.__slots__)
+
+    def __setitem__(self, i, values):
+        values = tuple(values)
+        if len(values) != len(self.__slots__):
+            raise ValueError(f"{type(self).__name__} records have {len(self.__slots__)} fields, "
+                             f"got {len(values)} values")
+        for name, value in zip(self.__slots__, values):
+            getattr(self, name)[i] = value
+
+    def __iter__(self):
+        return zip(*(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name, None)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import resource
+import selectors
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Exit status reported for jobs killed at their deadline, as timeout(1) does
+TIMEOUT_STATUS = 124
+# Exit status for requests that never ran: bad JSON, missing source, bad
+# limits, or an Origin program that does not compile
+REJECTED_STATUS = 2
+
+
+# Runs Origin jobs for one warm worker process. Programs are compiled in
+# the worker, so its CodeCache stays hot across jobs, then each one runs in
+# a forked child with fresh globals, an address-space cap and a deadline.
+class JobRunner:
+    def __init__(self, cache=None, backend="string", timeout=10.0, memory_mb=512, max_output=1024 * 1024,
+                 optimize=0, inline=True):
+        # the whole compiler is imported up front; that is what makes a
+        # worker warm
+        import astgen, compiler, interpreter, lexer, parser
+        from cache import compiler_fingerprint
+        compiler_fingerprint()
+        self.cache = cache
+        self.backend = backend
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self.optimize = optimize
+        self.inline = inline
+
+    # job: {"id", "source", "filename", "timeout", "memory_mb"}; only source is
+    # required. timeout is seconds, more than 0; memory_mb is 0 for no cap.
+    # Returns {"id", "status", "stdout", "stderr", "seconds"} plus "error"
+    # when the job did not run to completion.
+    def run_job(self, job):
+        from compiler import compile_origin
+        start = time.perf_counter()
+        result = {"id": job.get("id")}
+        source = job.get("source")
+        if not isinstance(source, str):
+            return self._rejected(result, "job has no source", start)
+        timeout = job.get("timeout", self.timeout)
+        memory_mb = job.get("memory_mb", self.memory_mb)
+        if not _is_limit(timeout) or timeout == 0:
+            return self._rejected(result, f"timeout must be a number of seconds above 0, got {timeout!r}", start)
+        if not _is_limit(memory_mb):
+            return self._rejected(result, f"memory_mb must be a number of at least 0, got {memory_mb!r}", start)
+        try:
+            code = compile_origin(source, job.get("filename", "<job>"), self.cache, self.backend,
+                                  optimize=self.optimize, inline=self.inline)
+        except Exception as error:
+            # codegen errors and RecursionError on deeply nested source
+            # reject the job like syntax errors do, rather than end the worker
+            return self._rejected(result, f"{type(error).__name__}: {error}", start)
+        status, stdout, stderr, error = self.execute(code, timeout, memory_mb)
+        result.update(status=status, stdout=stdout, stderr=stderr, seconds=time.perf_counter() - start)
+        if error:
+            result["error"] = error
+        return result
+
+    def _rejected(self, result, error, start):
+        result.update(status=REJECTED_STATUS, stdout="", stderr="", error=error,
+                      seconds=time.perf_counter() - start)
+        return result
+
+    # (exit status, stdout, stderr, error) of code run in a forked child
+    def execute(self, code, timeout, memory_mb):
+        out_read, out_write = os.pipe()
+        err_read, err_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(out_read)
+            os.close(err_read)
+            _run_child(code, out_write, err_write, memory_mb)
+        os.close(out_write)
+        os.close(err_write)
+
+        deadline = time.monotonic() + timeout
+        outputs = {out_read: bytearray(), err_read: bytearray()}
+        truncated = False
+        timed_out = False
+        with selectors.DefaultSelector() as selector:
+            for fd in outputs:
+                selector.register(fd, selectors.EVENT_READ)
+            open_fds = len(outputs)
+            while open_fds:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        selector.unregister(key.fd)
+                        open_fds -= 1
+                        continue
+                    buffer = outputs[key.fd]
+                    room = self.max_output - len(buffer)
+                    if len(chunk) > room:
+                        truncated = True
+                        chunk = chunk[:max(room, 0)]
+                    buffer += chunk
+        # a child can close its output and keep running, so the deadline
+        # still applies while waiting for it to exit
+        while not timed_out:
+            done, wait_status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            if time.monotonic() >= deadline:
+                timed_out = True
+            else:
+                time.sleep(0.001)
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+            _, wait_status = os.waitpid(pid, 0)
+        for fd in outputs:
+            os.close(fd)
+
+        status = os.waitstatus_to_exitcode(wait_status)
+        error = None
+        if timed_out:
+            status = TIMEOUT_STATUS
+            error = f"timed out after {timeout}s"
+        elif truncated:
+            error = f"output truncated to {self.max_output} bytes"
+        stdout = outputs[out_read].decode(errors="replace")
+        stderr = outputs[err_read].decode(errors="replace")
+        return status, stdout, stderr, error
+
+
+# A job's timeout or memory_mb: a finite number, not a bool, of at least 0
+def _is_limit(value):
+    return type(value) in (int, float) and 0 <= value < float("inf")
+
+
+# Body of the forked child; never returns
+def _run_child(code, out_fd, err_fd, memory_mb):
+    status = 0
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+        if memory_mb:
+            limit = int(memory_mb * 1024 * 1024)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        from compiler import execute
+        try:
+            execute(code, {"__name__": "__main__"})
+        except SystemExit as exit:
+            if exit.code is None:
+                status = 0
+            elif isinstance(exit.code, int):
+                status = exit.code
+            else:
+                print(exit.code, file=sys.stderr)
+                status = 1
+        except BaseException as error:
+            # drop the frames above the job's, so the traceback starts in it
+            tb = error.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename != code.co_filename:
+                tb = tb.tb_next
+            traceback.print_exception(type(error), error, tb or error.__traceback__)
+            status = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(status)
+
+
+# Reads one JSON job per line from reader and writes one JSON result per
+# line to writer, until reader hits EOF
+def serve_stream(runner, reader, writer):
+    for line in reader:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("a job must be a JSON object")
+        except ValueError as error:
+            result = {"id": None, "status": REJECTED_STATUS, "stdout": "", "stderr": "", "error": str(error)}
+        else:
+            result = runner.run_job(job)
+        writer.write(json.dumps(result).encode() + b"\n")
+        writer.flush()
+
+
+# Pre-forked pool of warm workers sharing one listening UNIX socket. The
+# kernel hands each new connection to whichever worker accepts first; a
+# worker serves one connection at a time, so a client that keeps its
+# connection open gets a dedicated worker for as long as it holds it.
+class WorkerPool:
+    def __init__(self, path, workers, make_runner):
+        self.path = path
+        self.workers = workers
+        self.make_runner = make_runner
+        self.pids = set()
+        self.listener = None
+        self.stopping = False
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(128)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            # respawn workers that die, until told to stop
+            while not self.stopping:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                self.pids.discard(pid)
+                if not self.stopping:
+                    self._spawn()
+        finally:
+            self._shutdown()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self._worker(self.make_runner())
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        self.pids.add(pid)
+
+    def _worker(self, runner):
+        while True:
+            conn, _ = self.listener.accept()
+            with conn, conn.makefile("rb") as reader, conn.makefile("wb") as writer:
+                try:
+                    serve_stream(runner, reader, writer)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _shutdown(self):
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.pids.clear()
+        self.listener.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# Connection to a running server; one request in flight at a time
+class Client:
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile("rb")
+        self.writer = self.sock.makefile("wb")
+
+    def run(self, source, **job):
+        job["source"] = source
+        self.writer.write(json.dumps(job).encode() + b"\n")
+        self.writer.flush()
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    from compiler import BACKENDS
+    ap = argparse.ArgumentParser(prog="origin serve",
+                                 description="Run Origin jobs in a pool of warm worker processes")
+    where = ap.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", metavar="PATH", help="listen on this UNIX socket")
+    where.add_argument("--stdio", action="store_true", help="read jobs from stdin, write results to stdout")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (socket mode)")
+    ap.add_argument("--backend", choices=BACKENDS, default="string")
+    ap.add_argument("--cache-dir", default="__origincache__", help="on-disk code cache shared by the workers")
+    ap.add_argument("--no-cache-dir", action="store_true", help="keep each worker's code cache in memory only")
+    ap.add_argument("--timeout", type=float, default=10.0, help="default seconds per job")
+    ap.add_argument("--memory-mb", type=int, default=512, help="default address-space cap per job, 0 for none")
+    ap.add_argument("-O", dest="optimize", type=int, choices=(0, 1, 2), default=0, help="optimization level")
+    ap.add_argument("--no-inline", action="store_true", help="leave every call as written")
+    ap.add_argument("--max-output", type=int, default=1024 * 1024, help="bytes of stdout and of stderr kept per job")
+    args = ap.parse_args(argv)
+    if not args.timeout > 0:
+        ap.error("--timeout must be above 0")
+    if args.memory_mb < 0:
+        ap.error("--memory-mb must be at least 0")
+
+    def make_runner():
+        from cache import CodeCache
+        cache = CodeCache(None if args.no_cache_dir else args.cache_dir)
+        return JobRunner(cache, args.backend, args.timeout, args.memory_mb, args.max_output,
+                         args.optimize, not args.no_inline)
+
+    if args.stdio:
+        serve_stream(make_runner(), sys.stdin.buffer, sys.stdout.buffer)
+    else:
+        WorkerPool(args.socket, args.workers, make_runner).serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Called with the finished PipelineStats of every instrumented run, e.g. to
+# push the numbers into a metrics system
+HOOKS = []
+
+
+def add_hook(hook):
+    HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    HOOKS.remove(hook)
+
+
+class PhaseStats:
+    __slots__ = ("name", "seconds", "peak_bytes")
+
+    def __init__(self, name, seconds, peak_bytes=None):
+        self.name = name
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+
+    def __repr__(self):
+        return f"PhaseStats({self.name!r}, {self.seconds:.6f}, {self.peak_bytes})"
+
+
+# Measurements of one run through the pipeline: wall time and (with
+# track_memory) peak traced memory per phase, plus the size of what each
+# phase produced. Phases that did not run, e.g. everything before exec on a
+# cache hit, are simply absent.
+class PipelineStats:
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.phases = []
+        self.tokens = None
+        self.nodes = None
+        self.code_lines = None
+        self.code_chars = None
+        self.cache = None
+        self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        tracing = False
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            tracing = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - base if tracing else None
+            self.phases.append(PhaseStats(name, seconds, peak))
+
+    def __getitem__(self, name):
+        for phase in self.phases:
+            if phase.name == name:
+                return phase
+        raise KeyError(name)
+
+    @property
+    def total_seconds(self):
+        return sum(phase.seconds for phase in self.phases)
+
+    # Stops memory tracing if this object started it and runs the hooks
+    def finish(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        for hook in HOOKS:
+            hook(self)
+        return self
+
+    def as_dict(self):
+        return {
+            "phases": {phase.name: {"seconds": phase.seconds, "peak_bytes": phase.peak_bytes}
+                       for phase in self.phases},
+            "total_seconds": self.total_seconds,
+            "tokens": self.tokens,
+            "nodes": self.nodes,
+            "code_lines": self.code_lines,
+            "code_chars": self.code_chars,
+            "cache": self.cache,
+        }
+
+    def report(self):
+        out = [f"{'phase':<10} {'ms':>10} {'peak KiB':>10}"]
+        for phase in self.phases:
+            peak = f"{phase.peak_bytes / 1024:10.1f}" if phase.peak_bytes is not None else f"{'-':>10}"
+            out.append(f"{phase.name:<10} {phase.seconds * 1000:10.2f} {peak}")
+        out.append(f"{'total':<10} {self.total_seconds * 1000:10.2f}")
+        counts = [(label, value) for label, value in (
+            ("cache", self.cache), ("tokens", self.tokens), ("nodes", self.nodes),
+            ("code lines", self.code_lines), ("code chars", self.code_chars)) if value is not None]
+        out.extend(f"{label}: {value}" for label, value in counts)
+        return "\n".join(out)
+
+
+def count_nodes(node):
+    from classes import iter_child_nodes
+    stack = [node]
+    count = 0
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(iter_child_nodes(node))
+    return count